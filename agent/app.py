@@ -1,47 +1,138 @@
-import os, configparser
+import configparser
 
 from slack_bolt import App
 from pathlib import Path
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from agent.handler import SlackMessageHandler
+from agent.dispatcher import MentionDispatcher
+from agent.streaming import SlackStreamWriter
+from process.telemetry import telemetry
 
 BASE_DIR= Path(__file__).resolve().parent # Get the current folder
 config_path= BASE_DIR / "../.config/creds.env"
 config= configparser.ConfigParser()
 config.read(config_path)
 
-SLACK_APP_TOKEN= config["SLACK"]["APP_LEVEL_TOKEN"]
-SLACK_BOT_TOKEN= config["SLACK"]["BOT_USER_OAUTH_TOKEN"]
+# Everything with side effects (models, worker threads, the Slack connection)
+# is built in main(): extraction workers are spawned processes that re-import
+# this module, and must not start a second bot.
+def create_app() -> App:
+    app= App(token= config["SLACK"]["BOT_USER_OAUTH_TOKEN"])
+    handler= SlackMessageHandler()
+    dispatcher= MentionDispatcher(
+        handler= handler,
+        max_workers= config.getint("DISPATCH", "MAX_WORKERS", fallback= 4),
+        max_queue= config.getint("DISPATCH", "MAX_QUEUE", fallback= 16),
+        timeout= config.getfloat("DISPATCH", "TIMEOUT", fallback= 120),
+        stream_idle_timeout= config.getfloat("STREAMING", "IDLE_TIMEOUT", fallback= 30)
+    )
 
-app= App(token= SLACK_BOT_TOKEN)
-handler= SlackMessageHandler()
+    # Stream answers into the placeholder instead of waiting for the full text
+    streaming= config.getboolean("STREAMING", "ENABLED", fallback= True)
+    stream_update_interval= config.getfloat("STREAMING", "UPDATE_INTERVAL", fallback= 1.0)
+    stream_finish_timeout= config.getfloat("STREAMING", "FINISH_TIMEOUT", fallback= 30.0)
 
-@app.event("app_mention")
-def handle_message_events(body, say, logger):
-    # Ignore bot messages
-    if "bot_id" in body["event"]:
-        return
+    @app.event("app_mention")
+    def handle_message_events(body, say, client, logger):
+        # Ignore bot messages
+        if "bot_id" in body["event"]:
+            return
     
-    event = body["event"]
-    text= event.get("text", "")
-    user= event.get("user")
-    channel= event.get("channel")
+        event = body["event"]
+        text= event.get("text", "")
+        user= event.get("user")
+        channel= event.get("channel")
 
-    mentioned_user= f"<@{user}>"
+        mentioned_user= f"<@{user}>"
 
-    logger.info(f"[Agent mentioned] Message from {user}: {text}")
+        logger.info(f"[Agent mentioned] Message from {user}: {text}")
 
-    if not text or text== "":
-        say(f"Xin lỗi {mentioned_user} tôi không nhận được tin nhắn của bạn :< .")
-    else:
-        _, llm_response= handler.process(
-            text= text
-        )
+        if not text or text== "":
+            say(f"Xin lỗi {mentioned_user} tôi không nhận được tin nhắn của bạn :< .")
+        elif dispatcher.is_duplicate(key= body.get("event_id")):
+            # Slack redelivered an event we already answer, post nothing
+            return
+        else:
+            # Post a placeholder right away, the answer replaces it once ready
+            placeholder= say(f"{mentioned_user} tôi đang xử lý câu hỏi của bạn... :hourglass_flowing_sand:")
+            placeholder_ts= placeholder["ts"]
 
-        if llm_response or llm_response!= "":
-            response= f"Trả lời câu hỏi của bạn {mentioned_user}:\n-----\n{llm_response}"
-            say(response)
+            def render(freshness, llm_response):
+                return f"Trả lời câu hỏi của bạn {mentioned_user}:\n-----\n{llm_response}\n-----\n_{freshness.strip()}_"
 
-if __name__== "__main__":
+            writer= None
+            if streaming:
+                writer= SlackStreamWriter(
+                    client= client,
+                    channel= channel,
+                    ts= placeholder_ts,
+                    render= lambda partial: f"Trả lời câu hỏi của bạn {mentioned_user}:\n-----\n{partial} :writing_hand:",
+                    interval= stream_update_interval,
+                    finish_timeout= stream_finish_timeout
+                )
+
+            def on_delta(freshness, delta):
+                writer.append(delta= delta)
+
+            def on_done(freshness, llm_response):
+                if llm_response or llm_response!= "":
+                    response= render(freshness= freshness, llm_response= llm_response)
+                    if writer is not None:
+                        writer.finish(message= response)
+                    else:
+                        client.chat_update(channel= channel, ts= placeholder_ts, text= response)
+
+            def on_timeout():
+                client.chat_update(
+                    channel= channel,
+                    ts= placeholder_ts,
+                    text= f"Xin lỗi {mentioned_user}, câu hỏi của bạn mất quá nhiều thời gian để xử lý. Vui lòng thử lại sau."
+                )
+
+            accepted= dispatcher.submit(
+                text= text,
+                on_done= on_done,
+                on_timeout= on_timeout,
+                key= body.get("event_id"),
+                on_delta= on_delta if streaming else None
+            )
+
+            if not accepted:
+                client.chat_update(
+                    channel= channel,
+                    ts= placeholder_ts,
+                    text= f"Xin lỗi {mentioned_user}, hệ thống đang bận. Vui lòng thử lại sau ít phút."
+                )
+        
+            logger.info(f"[Dispatcher] {dispatcher.stats()}")
+
+    @app.event("file_shared")
+    def handle_file_shared_events(body, logger):
+        # Hand off to the background ingestion worker, never block the listener
+        handler.ingestion_worker.submit(event= body["event"])
+
+    @app.event("message")
+    def handle_channel_message_events(body, logger):
+        # Ignore bot messages (including our own answers)
+        if "bot_id" in body["event"]:
+            return
+
+        handler.ingestion_worker.submit(event= body["event"])
+
+    return app
+
+def main():
     print("Khởi động SLACK Bot")
-    SocketModeHandler(app= app, app_token= SLACK_APP_TOKEN).start()
\ No newline at end of file
+
+    # Prometheus metrics on a local port (0 disables) and optional per-request JSON traces
+    metrics_port= config.getint("TELEMETRY", "METRICS_PORT", fallback= 9464)
+    if metrics_port:
+        telemetry.serve(port= metrics_port, host= config.get("TELEMETRY", "METRICS_HOST", fallback= "127.0.0.1"))
+    if config.getboolean("TELEMETRY", "TRACE_LOG", fallback= False):
+        telemetry.configure(trace_dir= config.get("TELEMETRY", "TRACE_DIR", fallback= str(BASE_DIR / "../data/traces")))
+
+    app= create_app()
+    SocketModeHandler(app= app, app_token= config["SLACK"]["APP_LEVEL_TOKEN"]).start()
+
+if __name__== "__main__":
+    main()
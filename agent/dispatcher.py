@@ -0,0 +1,241 @@
+import logging, threading, time
+
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+from process.telemetry import telemetry
+
+# Per-request timings are in telemetry; the log line is for debugging only
+logger= logging.getLogger(__name__)
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+
+    ordered= sorted(values)
+    idx= min(len(ordered)- 1, int(round(q* (len(ordered)- 1))))
+    return ordered[idx]
+
+class MentionDispatcher:
+    """
+    Runs `SlackMessageHandler.process` on a bounded worker pool.
+
+    The Bolt listener only posts a placeholder and calls `submit`, so Slack gets
+    its ack immediately. Requests beyond `max_workers + max_queue` are rejected
+    (backpressure) and each request has a soft timeout after which the user is
+    told to retry and the late result is dropped.
+
+    With `on_delta`, the answer is streamed (`SlackMessageHandler.process_stream`)
+    and the timeout only applies until the first token arrives; after that the
+    stream times out once it has been silent for `stream_idle_timeout` seconds.
+    Time to first token and total latency are recorded per request.
+    """
+    def __init__(self, handler, max_workers= 4, max_queue= 16, timeout= 120, stream_idle_timeout= 30):
+        self.handler= handler
+        self.max_workers= max_workers
+        self.max_queue= max_queue
+        self.timeout= timeout
+        self.stream_idle_timeout= stream_idle_timeout
+
+        self.executor= ThreadPoolExecutor(
+            max_workers= max_workers,
+            thread_name_prefix= "mention-worker"
+        )
+        self._slots= threading.BoundedSemaphore(max_workers+ max_queue)
+        self._lock= threading.Lock()
+
+        # Slack redelivers events it thinks timed out, remember recent ids
+        self._seen= OrderedDict()
+        self._seen_max= 1024
+
+        # Metrics
+        self.queue_depth= 0
+        self.in_flight= 0
+        self.counters= {
+            "accepted": 0,
+            "rejected": 0,
+            "duplicate": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0
+        }
+        self.wait_times= deque(maxlen= 1000)
+        self.run_times= deque(maxlen= 1000)
+        self.ttft_times= deque(maxlen= 1000)
+
+    def is_duplicate(self, key: str) -> bool:
+        """
+        True if the event `key` was already seen (Slack redelivery); otherwise
+        remembers it. Checked before anything is posted for the event.
+        """
+        if key is None:
+            return False
+
+        with self._lock:
+            if key in self._seen:
+                self.counters["duplicate"]+= 1
+                return True
+
+            self._seen[key]= True
+            if len(self._seen)> self._seen_max:
+                self._seen.popitem(last= False)
+
+        return False
+
+    def submit(self, text: str, on_done: Callable, on_timeout: Callable, key: str= None, on_delta: Callable= None) -> bool:
+        """
+        Queue a mention for processing. Returns False if the pool is saturated.
+
+        on_done(freshness, answer) is called with the handler result,
+        on_timeout() is called once if the request exceeds `timeout` seconds,
+        on_delta(freshness, delta) is called with every streamed piece of the answer.
+        `key` (the Slack event id) names the request's trace.
+        """
+        if not self._slots.acquire(blocking= False):
+            with self._lock:
+                self.counters["rejected"]+= 1
+            return False
+
+        with self._lock:
+            self.counters["accepted"]+= 1
+            self.queue_depth+= 1
+
+        self.executor.submit(self._run, text, on_done, on_timeout, on_delta, time.monotonic(), key)
+        return True
+
+    def _run(self, text: str, on_done: Callable, on_timeout: Callable, on_delta: Callable, enqueued_at: float, key: str= None):
+        # Every span of this request (query embedding, search, LLM...) lands in one trace
+        with telemetry.trace(request_id= key, streaming= on_delta is not None) as trace:
+            self._process(text, on_done, on_timeout, on_delta, enqueued_at, trace)
+
+    def _process(self, text: str, on_done: Callable, on_timeout: Callable, on_delta: Callable, enqueued_at: float, trace: Dict):
+        started_at= time.monotonic()
+        waited= started_at- enqueued_at
+
+        with self._lock:
+            self.queue_depth-= 1
+            self.in_flight+= 1
+            self.wait_times.append(waited)
+
+        # Whoever finishes first (result or timer) gets to answer the user
+        finished= threading.Event()
+        claim_lock= threading.Lock()
+
+        def _claim() -> bool:
+            with claim_lock:
+                if finished.is_set():
+                    return False
+                finished.set()
+                return True
+
+        def _expire():
+            if _claim():
+                with self._lock:
+                    self.counters["timed_out"]+= 1
+                telemetry.count(name= "requests", outcome= "timed_out")
+                on_timeout()
+
+        # Deadline watchdog: `timeout` until the first token, then `stream_idle_timeout`
+        # since the last one (re-armed rather than restarted on every delta)
+        last_delta= None
+        timer= None
+
+        def _arm(delay: float):
+            nonlocal timer
+            timer= threading.Timer(max(0.0, delay), _watch)
+            timer.daemon= True
+            timer.start()
+
+        def _watch():
+            if finished.is_set():
+                return
+            if last_delta is not None:
+                remaining= last_delta+ self.stream_idle_timeout- time.monotonic()
+                if remaining> 0:
+                    _arm(delay= remaining)
+                    return
+            _expire()
+
+        _arm(delay= self.timeout- waited)
+
+        ttft= None
+        try:
+            if finished.is_set():
+                return
+
+            if on_delta is None:
+                freshness, answer= self.handler.process(text= text)
+            else:
+                freshness, stream= self.handler.process_stream(text= text)
+                parts= []
+                for delta in stream:
+                    last_delta= time.monotonic()
+                    if ttft is None:
+                        ttft= last_delta- started_at
+                    if finished.is_set():
+                        return
+                    parts.append(delta)
+                    on_delta(freshness, delta)
+                answer= "".join(parts)
+
+            if _claim():
+                on_done(freshness, answer)
+                with self._lock:
+                    self.counters["completed"]+= 1
+                telemetry.count(name= "requests", outcome= "completed")
+
+        except Exception as e:
+            print(f"[Dispatcher] Error while processing mention: {e}")
+            with self._lock:
+                self.counters["failed"]+= 1
+            telemetry.count(name= "requests", outcome= "failed")
+
+            if _claim():
+                on_done("", f"Error: {str(e)}")
+
+        finally:
+            timer.cancel()
+            elapsed= time.monotonic()- started_at
+
+            with self._lock:
+                self.in_flight-= 1
+                self.run_times.append(elapsed)
+                if ttft is not None:
+                    self.ttft_times.append(ttft)
+
+            self._slots.release()
+
+            trace.update(wait_s= round(waited, 3), ttft_s= round(ttft, 3) if ttft is not None else None)
+            telemetry.observe(name= "request_wait_seconds", value= waited)
+            telemetry.observe(name= "request_seconds", value= elapsed)
+            if ttft is not None:
+                telemetry.observe(name= "request_ttft_seconds", value= ttft)
+
+            ttft_log= f" ttft={ttft:.2f}s" if ttft is not None else ""
+            logger.debug(f"[Dispatcher] wait={waited:.2f}s{ttft_log} run={elapsed:.2f}s queue={self.queue_depth} in_flight={self.in_flight}")
+
+    def stats(self) -> Dict:
+        """
+        Queue depth, in-flight count, counters and latency percentiles (seconds).
+        """
+        with self._lock:
+            wait_times= list(self.wait_times)
+            run_times= list(self.run_times)
+            ttft_times= list(self.ttft_times)
+
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                **self.counters,
+                "wait_p50": _percentile(wait_times, 0.50),
+                "wait_p95": _percentile(wait_times, 0.95),
+                "run_p50": _percentile(run_times, 0.50),
+                "run_p95": _percentile(run_times, 0.95),
+                "ttft_p50": _percentile(ttft_times, 0.50),
+                "ttft_p95": _percentile(ttft_times, 0.95)
+            }
+
+    def shutdown(self, wait= True):
+        self.executor.shutdown(wait= wait)
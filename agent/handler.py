@@ -2,7 +2,9 @@ import configparser
 
 from openai import OpenAI
 from pathlib import Path
+from typing import Iterator, Tuple
 from pipelines import orchestrator, rag_pipeline
+from pipelines.ingestion_worker import IngestionWorker
 
 class SlackMessageHandler:
     def __init__(self):
@@ -18,6 +20,17 @@ class SlackMessageHandler:
         self.rag_pipeline= rag_pipeline.RAG_Pipeline()
         self.orchestrator= orchestrator.Orchestrator()
 
+        # New or deleted points in the collection make cached query vectors/answers stale
+        self.orchestrator.change_listeners.append(self.rag_pipeline.cache.invalidate)
+
+        # Ingestion runs in the background; mentions only read the index
+        self.ingestion_worker= IngestionWorker(
+            orchestrator= self.orchestrator,
+            interval= self.config.getint("INGESTION", "INTERVAL", fallback= 300),
+            debounce= self.config.getint("INGESTION", "DEBOUNCE", fallback= 5)
+        )
+        self.ingestion_worker.start()
+
     def _is_rag_query(self, text: str) -> bool:
         return text.strip().lower().startswith("$search")
     
@@ -27,9 +40,15 @@ class SlackMessageHandler:
         
         return text
 
+    def _chat_messages(self, text: str):
+        return [
+            {"role": "system", "content": "Bạn là trợ lý của một tổ chức công nghệ"},
+            {"role": "user", "content": text}
+        ]
+
     def process(self, text: str) -> str:
         try:
-            new_message_count, new_file_count= self.orchestrator.run_incremental()
+            freshness= self.ingestion_worker.freshness()
 
             # If user want to use RAG
             if self._is_rag_query(text= text):
@@ -38,26 +57,52 @@ class SlackMessageHandler:
                 answer= self.rag_pipeline.answer(query= query)
 
                 return (
-                    f"Ingestion updated: {new_message_count} messages, {new_file_count} files.\n\n",
+                    f"{freshness}\n\n",
                     f"{answer}"
                 )
             else:
                 print(">> USING CHAT PIPELINE")
                 completion= self.client.chat.completions.create(
                     model= f"{self.config['AGENT']['MODEL']}",
-                    messages= [
-                        {"role": "system", "content": "Bạn là trợ lý của một tổ chức công nghệ"},
-                        {"role": "user", "content": text}
-                    ],
+                    messages= self._chat_messages(text= text),
                 )
 
                 answer= completion.choices[0].message.content
 
                 return (
-                    f"Ingestion updated: {new_message_count} messages, {new_file_count} files.\n\n",
+                    f"{freshness}\n\n",
                     f"{answer}"
                 )
         
         except Exception as e:
-            return f"Error: {str(e)}"
-        
\ No newline at end of file
+            return "", f"Error: {str(e)}"
+
+    def _stream_chat(self, text: str) -> Iterator[str]:
+        stream= self.client.chat.completions.create(
+            model= f"{self.config['AGENT']['MODEL']}",
+            messages= self._chat_messages(text= text),
+            stream= True,
+            # Read timeout between chunks, so a stalled stream frees its worker
+            timeout= self.config.getfloat("STREAMING", "IDLE_TIMEOUT", fallback= 30)
+        )
+
+        for chunk in stream:
+            delta= chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    def process_stream(self, text: str) -> Tuple[str, Iterator[str]]:
+        """
+        Like `process`, but the answer is an iterator of pieces as they are
+        generated. Errors surface while iterating.
+        """
+        freshness= self.ingestion_worker.freshness()
+
+        if self._is_rag_query(text= text):
+            print(">> USING RAG PIPELINE (streaming)")
+            stream= self.rag_pipeline.answer_stream(query= self._extract_rag_query(text= text))
+        else:
+            print(">> USING CHAT PIPELINE (streaming)")
+            stream= self._stream_chat(text= text)
+
+        return f"{freshness}\n\n", stream
@@ -1,12 +1,22 @@
-import os, json, configparser
+import os, configparser
 
 from pathlib import Path
-from prompt_db import KB_SUMM_AGENT_PROMPT, KB_SUMM_USER_PROMPT
-from openai import OpenAI
+from typing import Dict, List, Optional, Tuple
+from agent.kb_summarizer import MapReduceSummarizer
+from transformers import AutoTokenizer
 from process.kb_builder import KBBuilder
+from process.extraction import ExtractionError
+from process.model_registry import registry
 
 class ChannelKBAgent:
-    def __init__(self, slack_client, openai_client):
+    """
+    Keeps one Knowledge Base digest per channel.
+
+    The first build map-reduces everything in the channel; later builds only
+    summarize messages newer than the digest and files it has not seen (or
+    that changed), then merge that update into the stored digest.
+    """
+    def __init__(self, slack_client, openai_client, state, extractor):
         BASE_DIR= Path(__file__).resolve().parent # Get the current folder
         config_path= BASE_DIR / "../.config/creds.env"
         self.config= configparser.ConfigParser()
@@ -14,39 +24,138 @@ class ChannelKBAgent:
 
         self.slack= slack_client
         self.openai= openai_client
+        self.state= state
+        self.extractor= extractor
         self.builder= KBBuilder()
 
-    def _summarize(self, messages, files):
-        user_input= KB_SUMM_USER_PROMPT\
-            .replace("{{conversation}}", messages)\
-            .replace("{{files_data}}", files)
-        
-        summary= self.openai.chat.completions.create(
+        # Same shared tokenizer as the chunker
+        tokenizer_name= "jinaai/jina-embeddings-v3"
+        self.tokenizer= registry.acquire(
+            key= ("tokenizer", tokenizer_name),
+            loader= lambda: AutoTokenizer.from_pretrained(
+                pretrained_model_name_or_path= tokenizer_name,
+                cache_dir= BASE_DIR / "../.cache/models"
+            )
+        )
+
+        self.summarizer= MapReduceSummarizer(
+            openai_client= openai_client,
             model= f"{self.config['AGENT']['MODEL']}",
-            messages= [
-                {"role": "system", "content": KB_SUMM_AGENT_PROMPT},
-                {"role": "user", "content": user_input}
-            ]
-        ).choices[0].message.content
+            count_tokens= self._count_tokens,
+            map_tokens= self.config.getint("KB", "MAP_TOKENS", fallback= 6000),
+            reduce_tokens= self.config.getint("KB", "REDUCE_TOKENS", fallback= 12000),
+            max_in_flight= self.config.getint("KB", "MAX_IN_FLIGHT", fallback= 4)
+        )
+
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+
+        encoded= self.tokenizer(
+            texts,
+            add_special_tokens= False,
+            return_attention_mask= False,
+            return_token_type_ids= False
+        )["input_ids"]
+
+        return [len(ids) for ids in encoded]
+
+    def _file_lines(self, files: List[Dict]) -> Tuple[List[str], List[str]]:
+        """
+        Extracted text of `files` as lines, each file under a `Tệp:` header, and
+        the ids of the files it covers. Files that fail to extract are reported
+        and left out.
+        """
+        lines, file_ids= [], []
+        by_path= {f["path"]: f for f in files}
+
+        for path, parts in self.extractor.iter_many(filepaths= list(by_path)):
+            try:
+                content= "\n".join(parts)
+            except ExtractionError as e:
+                print(f"Error: {e}")
+                continue
+
+            lines.append(f"Tệp: {by_path[path]['name']}")
+            lines.extend(content.splitlines())
+            file_ids.append(by_path[path]["id"])
+
+        return lines, file_ids
+
+    def _file_hash(self, f: Dict) -> Optional[str]:
+        """
+        The record's sha256, else the hash of the file on disk, else None.
+        """
+        if f.get("sha256"):
+            return f["sha256"]
+        if f.get("path") and os.path.exists(f["path"]):
+            return self.extractor.file_hash(filepath= f["path"])
+        return None
+
+    def _summarize(self, channel_id: str, messages: List[Dict], files: List[Dict]) -> Optional[Tuple[List[Dict], Dict]]:
+        """
+        The channel's updated KB sections and the digest to store once they
+        are published, or None when nothing is new.
+        """
+        digest= self.state.get_digest(channel_id= channel_id) or {"summary": "", "last_ts": "0", "files": {}}
+
+        new_messages= sorted(
+            (m for m in messages if m.get("text") and float(m["ts"])> float(digest["last_ts"])),
+            key= lambda m: float(m["ts"])
+        )
+        hashes= {f["id"]: self._file_hash(f= f) for f in files}
+        # A file without a hash cannot be matched against the digest, so it counts as new
+        new_files= [f for f in files if hashes[f["id"]] is None or digest["files"].get(f["id"])!= hashes[f["id"]]]
 
-        return [{
+        if not new_messages and not new_files:
+            return None
+
+        file_lines, summarized= self._file_lines(files= new_files)
+        lines= [f"Người dùng {m.get('user')}: {m['text']}" for m in new_messages]+ file_lines
+        if not lines: # Only files, and none of them could be extracted
+            return None
+
+        update= self.summarizer.summarize(lines= lines)
+        summary= self.summarizer.merge(digest= digest["summary"], update= update) if update else digest["summary"]
+
+        sections= [{
             "title": "Cơ sở Tri Thức",
             "content": summary
         }]
-    
+
+        return sections, {
+            "summary": summary,
+            "last_ts": new_messages[-1]["ts"] if new_messages else digest["last_ts"],
+            # Files that failed to extract stay new and are retried next run
+            "files": {**digest["files"], **{file_id: hashes[file_id] for file_id in summarized}}
+        }
+
     def _upload_to_SlackCanvas(self, channel_id, markdown_path):
-        self.slack.file_upload_v2(
+        self.slack.files_upload_v2(
             channel= channel_id,
             file= markdown_path,
             initial_comment= "🔄 Cập nhật Tri Thức"
         )
-    
-    def build_kb_for_channel(self, channel_id, messages, files):
-        kb_structure= self._summarize(
+
+    def build_kb_for_channel(self, channel_id: str, messages: List[Dict], files: List[Dict]):
+        """
+        `messages` are message log records and `files` file records of the
+        channel; anything already in the digest is skipped.
+        """
+        result= self._summarize(
+            channel_id= channel_id,
             messages= messages,
             files= files
         )
 
+        if result is None:
+            print(f"Knowledge base of {channel_id} is up to date")
+            return None
+
+        kb_structure, digest= result
+
+        print(f"Knowledge base of {channel_id} updated with {self.summarizer.n_calls} LLM calls so far")
+
         markdown_path= self.builder.write_md(
             filename= f"{channel_id}_kb.md",
             sections= kb_structure
@@ -55,4 +164,14 @@ class ChannelKBAgent:
         self._upload_to_SlackCanvas(
             channel_id= channel_id,
             markdown_path= markdown_path
-        )
\ No newline at end of file
+        )
+
+        # Only once published: a failed upload leaves the same messages and files new next run
+        self.state.put_digest(
+            channel_id= channel_id,
+            summary= digest["summary"],
+            last_ts= digest["last_ts"],
+            files= digest["files"]
+        )
+
+        return markdown_path
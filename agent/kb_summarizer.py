@@ -0,0 +1,130 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+from agent.prompt_db import KB_SUMM_AGENT_PROMPT, KB_MAP_USER_PROMPT, KB_REDUCE_USER_PROMPT, KB_MERGE_USER_PROMPT
+
+class MapReduceSummarizer:
+    """
+    Hierarchical summarization of inputs far larger than one LLM context.
+
+    Lines are packed into chunks of at most `map_tokens` tokens, each chunk is
+    summarized on its own (map, at most `max_in_flight` LLM calls at a time),
+    and the summaries are combined (reduce), again in groups of `reduce_tokens`
+    tokens until a single summary is left.
+    """
+    def __init__(self, openai_client, model: str, count_tokens: Callable[[List[str]], List[int]], map_tokens= 6000,
+                 reduce_tokens= 12000, max_in_flight= 4):
+        self.openai= openai_client
+        self.model= model
+        self.count_tokens= count_tokens
+        self.map_tokens= map_tokens
+        self.reduce_tokens= reduce_tokens
+        self.max_in_flight= max_in_flight
+
+        self.n_calls= 0
+        self._lock= threading.Lock()
+
+    def _complete(self, user_input: str) -> str:
+        with self._lock:
+            self.n_calls+= 1
+
+        return self.openai.chat.completions.create(
+            model= self.model,
+            messages= [
+                {"role": "system", "content": KB_SUMM_AGENT_PROMPT},
+                {"role": "user", "content": user_input}
+            ]
+        ).choices[0].message.content
+
+    def _split_long(self, line: str, n_tokens: int, max_tokens: int) -> List[str]:
+        """
+        A line over the budget, cut into word runs of roughly `max_tokens` tokens.
+        """
+        words= line.split(" ")
+        n_pieces= -(-n_tokens// max_tokens)+ 1
+        size= max(1, -(-len(words)// n_pieces))
+        return [" ".join(words[i:i+ size]) for i in range(0, len(words), size)]
+
+    def pack(self, lines: List[str], max_tokens: int) -> List[str]:
+        """
+        Consecutive lines grouped into chunks of at most `max_tokens` tokens.
+        """
+        counts= self.count_tokens(lines)
+
+        pieces= []
+        for line, n in zip(lines, counts):
+            if n> max_tokens:
+                sub= self._split_long(line= line, n_tokens= n, max_tokens= max_tokens)
+                pieces.extend(zip(sub, self.count_tokens(sub)))
+            else:
+                pieces.append((line, n))
+
+        chunks, current, used= [], [], 0
+        for line, n in pieces:
+            if current and used+ n+ 1> max_tokens:
+                chunks.append("\n".join(current))
+                current, used= [], 0
+            current.append(line)
+            used+= n+ 1 # + the newline
+
+        if current:
+            chunks.append("\n".join(current))
+
+        return chunks
+
+    def _map(self, chunks: List[str]) -> List[str]:
+        prompts= [
+            KB_MAP_USER_PROMPT
+                .replace("{{part}}", str(i+ 1))
+                .replace("{{n_parts}}", str(len(chunks)))
+                .replace("{{content}}", chunk)
+            for i, chunk in enumerate(chunks)
+        ]
+
+        # The executor's worker count caps the LLM calls in flight; map keeps order
+        with ThreadPoolExecutor(max_workers= self.max_in_flight) as pool:
+            return list(pool.map(self._complete, prompts))
+
+    def _reduce(self, summaries: List[str]) -> str:
+        while True:
+            groups= self.pack(lines= summaries, max_tokens= self.reduce_tokens)
+            if len(groups)> 1 and len(groups)>= len(summaries):
+                # Summaries too long to share a group: reduce them pairwise anyway
+                groups= ["\n".join(summaries[i:i+ 2]) for i in range(0, len(summaries), 2)]
+
+            prompts= [KB_REDUCE_USER_PROMPT.replace("{{summaries}}", group) for group in groups]
+
+            if len(prompts)== 1:
+                return self._complete(user_input= prompts[0])
+
+            with ThreadPoolExecutor(max_workers= self.max_in_flight) as pool:
+                summaries= list(pool.map(self._complete, prompts))
+
+    def summarize(self, lines: List[str]) -> str:
+        """
+        One summary of `lines` (messages, file sections, ...), in their order.
+        """
+        lines= [line for line in lines if line.strip()]
+        if not lines:
+            return ""
+
+        chunks= self.pack(lines= lines, max_tokens= self.map_tokens)
+        summaries= self._map(chunks= chunks)
+        if len(summaries)== 1:
+            return summaries[0]
+
+        return self._reduce(summaries= summaries)
+
+    def merge(self, digest: str, update: str) -> str:
+        """
+        `digest` updated with the summary of newer data.
+        """
+        if not digest:
+            return update
+
+        return self._complete(
+            user_input= KB_MERGE_USER_PROMPT
+                .replace("{{digest}}", digest)
+                .replace("{{update}}", update)
+        )
@@ -20,10 +20,13 @@ KB_SUMM_AGENT_PROMPT= """
 Bạn là một trợ lý của team, nhiệm vụ của bạn là đọc toàn bộ đoạn hội thoại giữa các người dùng và tạo thành một bản ghi chú về nội dung và điểm mấu chốt dành cho làm Knowledge Base. Hãy thực hiện theo **Hướng dẫn** sau từng bước.
 
 # Dữ liệu phân tích
-- **Hội thoại: Đoạn th
+- **Hội thoại**: Đoạn trích hội thoại trong kênh Slack, mỗi dòng là `người dùng: nội dung`.
+- **Attachment files**: Nội dung các tệp được chia sẻ trong kênh.
 
 # Hướng dẫn
-1. 
+1. Chỉ giữ lại thông tin có giá trị lâu dài: quyết định, kết luận, quy trình, số liệu, người phụ trách, việc cần làm.
+2. Bỏ qua chào hỏi, trao đổi xã giao và nội dung lặp lại.
+3. Trình bày bằng Markdown, nhóm theo chủ đề, ngắn gọn và chính xác, không bịa thêm thông tin.
 """
 
 KB_SUMM_USER_PROMPT="""
@@ -36,4 +39,40 @@ KB_SUMM_USER_PROMPT="""
 
 # Tri thức (cập nhật mới):
 
-"""
\ No newline at end of file
+"""
+
+KB_MAP_USER_PROMPT="""
+# Người dùng cung cấp
+Một phần dữ liệu của kênh (phần {{part}}/{{n_parts}}):
+{{content}}
+
+# Ghi chú tóm tắt phần này:
+
+"""
+
+KB_REDUCE_USER_PROMPT="""
+# Người dùng cung cấp
+Các ghi chú tóm tắt từng phần dữ liệu của kênh, theo thứ tự thời gian:
+{{summaries}}
+
+# Hướng dẫn
+Gộp các ghi chú trên thành một bản Tri thức duy nhất, hợp nhất các ý trùng lặp, giữ nguyên các chi tiết quan trọng.
+
+# Tri thức:
+
+"""
+
+KB_MERGE_USER_PROMPT="""
+# Người dùng cung cấp
+1. **Tri thức hiện tại**:
+{{digest}}
+
+2. **Tóm tắt dữ liệu mới**:
+{{update}}
+
+# Hướng dẫn
+Cập nhật Tri thức hiện tại với dữ liệu mới: bổ sung thông tin mới, sửa các thông tin đã thay đổi, giữ nguyên phần còn đúng.
+
+# Tri thức (cập nhật mới):
+
+"""
@@ -0,0 +1,86 @@
+import threading, time
+
+from typing import Callable
+from slack_sdk.errors import SlackApiError
+
+# Slack rejects message text above 40k characters
+MAX_TEXT= 39_000
+
+class SlackStreamWriter:
+    """
+    Progressively edits one Slack message while an answer is being generated.
+
+    Deltas are buffered and the message is `chat_update`d at most once every
+    `interval` seconds (Slack allows about one update per second per message
+    and rate limits chat.update), a 429 pushes the next update back by its
+    Retry-After, and `finish` always writes the final message: it waits out
+    rate limits for up to `finish_timeout` seconds, then posts the answer as a
+    new message rather than leave the partial one.
+
+    Progress updates are best effort: a failed one is logged and skipped so
+    the answer keeps generating. Only `finish` raises.
+    """
+    def __init__(self, client, channel: str, ts: str, render: Callable[[str], str], interval= 1.0,
+                 finish_timeout= 30.0):
+        self.client= client
+        self.channel= channel
+        self.ts= ts
+        self.render= render # render(text_so_far) -> in-progress message text
+        self.interval= interval
+        self.finish_timeout= finish_timeout
+
+        self.text= ""
+        self.pushed= ""
+        self.next_push_at= 0.0
+        self.n_updates= 0
+        self._lock= threading.Lock()
+
+    def _push(self, text: str, best_effort= False) -> bool:
+        try:
+            self.client.chat_update(channel= self.channel, ts= self.ts, text= text[:MAX_TEXT])
+        except SlackApiError as e:
+            if e.response.status_code== 429:
+                retry_after= float(e.response.headers.get("Retry-After", 1))
+                self.next_push_at= time.monotonic()+ retry_after
+                return False
+
+            if not best_effort:
+                raise
+            print(f"[SlackStreamWriter] Skipped progress update: {e}")
+            self.next_push_at= time.monotonic()+ self.interval
+            return False
+        except Exception as e: # Network errors
+            if not best_effort:
+                raise
+            print(f"[SlackStreamWriter] Skipped progress update: {e}")
+            self.next_push_at= time.monotonic()+ self.interval
+            return False
+
+        self.pushed= text
+        self.n_updates+= 1
+        self.next_push_at= time.monotonic()+ self.interval
+        return True
+
+    def append(self, delta: str):
+        with self._lock:
+            self.text+= delta
+            if time.monotonic()>= self.next_push_at:
+                text= self.render(self.text)
+                if text!= self.pushed:
+                    self._push(text= text, best_effort= True)
+
+    def finish(self, message: str):
+        """
+        Write the final message, waiting out rate limits if needed.
+        """
+        with self._lock:
+            deadline= time.monotonic()+ self.finish_timeout
+            while True:
+                time.sleep(max(0.0, self.next_push_at- time.monotonic()))
+                if self._push(text= message):
+                    return
+                if self.next_push_at> deadline:
+                    break
+
+            print(f"[SlackStreamWriter] chat.update still rate limited after {self.finish_timeout:.0f}s, posting the answer")
+            self.client.chat_postMessage(channel= self.channel, text= message[:MAX_TEXT])
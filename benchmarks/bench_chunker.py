@@ -0,0 +1,88 @@
+"""
+Speed of the prefix-sum chunking engine vs. the previous per-sentence loop,
+and a check that both produce identical chunks for the same settings.
+
+    python -m benchmarks.bench_chunker data/files/*.pdf --repeat 20
+"""
+import glob, time, argparse
+
+from pathlib import Path
+from typing import Dict, List
+from process.data_chunkning import DataChunker
+
+BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+def legacy_chunk_sentences(chunker: DataChunker, sentences: List[str], lang: str) -> List[Dict]:
+    """
+    The previous engine: one tokenizer call per sentence, and the overlap group
+    re-tokenized after every emitted chunk. Kept only as the reference.
+    """
+    all_chunks= []
+    current_group= []
+    current_token= 0
+
+    for sent in sentences:
+        sent_token_count= chunker._count_tokens(text= sent)
+
+        if current_token+ sent_token_count> chunker.max_tokens:
+            all_chunks.append(chunker._make_chunk(sentences= current_group, lang= lang))
+
+            overlap_n= int(len(current_group)* chunker.overlap_ratio)
+            current_group= current_group[-overlap_n:]
+            current_token= chunker._count_tokens(" ".join(current_group))
+
+        current_group.append(sent)
+        current_token+= sent_token_count
+
+    if current_group:
+        all_chunks.append(chunker._make_chunk(sentences= current_group, lang= lang))
+
+    return all_chunks
+
+def bench_file(chunker: DataChunker, path: str, repeat: int) -> Dict:
+    text= "\n".join([chunker.file_text_extractor(filepath= path)]* repeat)
+    lang= chunker.detect_lang(text= text)
+
+    # Segmentation is shared by both engines, time only the chunking itself
+    sections= [chunker.split_sentences(text= sec, lang= lang) for sec in chunker.heading_split(text= text)]
+    n_sentences= sum(len(s) for s in sections)
+
+    started= time.perf_counter()
+    legacy= [c for sentences in sections for c in legacy_chunk_sentences(chunker= chunker, sentences= sentences, lang= lang)]
+    legacy_s= time.perf_counter()- started
+
+    started= time.perf_counter()
+    current= [c for sentences in sections for c in chunker.iter_section_chunks(sentences= sentences, lang= lang)]
+    current_s= time.perf_counter()- started
+
+    return {
+        "file": Path(path).name,
+        "chars": len(text),
+        "sentences": n_sentences,
+        "chunks": len(current),
+        "legacy_s": round(legacy_s, 3),
+        "current_s": round(current_s, 3),
+        "speedup": round(legacy_s/ current_s, 1) if current_s> 0 else float("inf"),
+        "identical": [c["id"] for c in legacy]== [c["id"] for c in current]
+    }
+
+def main():
+    parser= argparse.ArgumentParser(description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs= "*", default= sorted(glob.glob(str(BASE_DIR / "../data/files/*.pdf"))))
+    parser.add_argument("--repeat", type= int, default= 10, help= "Concatenate each file N times to simulate large PDFs")
+    parser.add_argument("--max-tokens", type= int, default= 1024)
+    parser.add_argument("--overlap-ratio", type= float, default= 0.15)
+    args= parser.parse_args()
+
+    chunker= DataChunker(max_tokens= args.max_tokens, overlap_ratio= args.overlap_ratio)
+
+    for path in args.files:
+        row= bench_file(chunker= chunker, path= path, repeat= args.repeat)
+        print(
+            f"{row['file']}: {row['sentences']} sentences -> {row['chunks']} chunks | "
+            f"legacy {row['legacy_s']}s, current {row['current_s']}s, x{row['speedup']} | "
+            f"identical={row['identical']}"
+        )
+
+if __name__== "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Time and memory of each hot path on a synthetic corpus, fully offline: Slack,
+OpenAI and Qdrant are replaced by the fakes in benchmarks.fakes.
+
+Stages: crawl (SlackCrawler + MessageLog), extract (file_text_extractor),
+chunk (chunk_text), embed (Embedder.encode), upsert (add_documents), search,
+answer (RAG_Pipeline.answer, cold caches). Every run is appended to a JSON
+history and compared with the last run of the same settings.
+
+    python -m benchmarks.bench_components --files 30 --backend numpy --label my-change
+"""
+import gc, sys, json, time, argparse, tempfile, resource, subprocess, tracemalloc
+import numpy as np
+
+from pathlib import Path
+from typing import Callable, Dict, List
+from benchmarks import corpus
+from benchmarks.fakes import FakeSlackClient, FakeOpenAI, FakeQdrantClient
+from ingestion.slack_crawler import SlackCrawler
+from ingestion.get_data_fromSlack import Ingestion
+from ingestion.message_log import MessageLog
+from process.data_chunkning import DataChunker
+from process.embedding import Embedder
+from process.vector_store import NumpyVectorStore
+from pipelines.rag_pipeline import RAG_Pipeline
+
+BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+def measure(stage: str, fn: Callable[[], int], repeat= 3) -> Dict:
+    """
+    Best wall time of `repeat` runs of `fn` (which returns the number of items
+    it processed), then one more run under tracemalloc for peak Python memory.
+    """
+    times= []
+    for _ in range(repeat):
+        gc.collect()
+        started= time.perf_counter()
+        n_items= fn()
+        times.append(time.perf_counter()- started)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak= tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best= min(times)
+    return {
+        "stage": stage,
+        "items": n_items,
+        "seconds": round(best, 4),
+        "median_seconds": round(float(np.median(times)), 4),
+        "items_per_sec": round(n_items/ best, 1) if best> 0 else 0.0,
+        "peak_mb": round(peak/ 2** 20, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/ 1024, 1) # Linux: KB
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd= BASE_DIR, capture_output= True, text= True, check= True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def make_store(backend: str, dim: int, storage_dir: str):
+    if backend== "numpy":
+        return NumpyVectorStore(collection= "bench", dim= dim, storage_dir= storage_dir)
+
+    from process.QD_client import QDrantDB
+    store= QDrantDB(collection= "bench", client= FakeQdrantClient())
+    store.dim= dim
+    return store
+
+def run(args) -> List[Dict]:
+    work_dir= tempfile.mkdtemp(prefix= "bench_")
+    results= []
+
+    # ---- crawl ------------------------------------------------------------
+    channels, messages= corpus.slack_workspace(n_channels= args.channels, n_messages= args.messages, seed= args.seed)
+    slack= FakeSlackClient(channels= channels, messages= messages)
+    # The fake has no rate limits, only the crawler's own overhead is measured
+    crawler= SlackCrawler(client= slack, tier_rates= {"tier2": 10** 9, "tier3": 10** 9, "tier4": 10** 9})
+
+    def crawl() -> int:
+        log= MessageLog(root= tempfile.mkdtemp(dir= work_dir))
+        pairs, _, _= crawler.crawl(channels= crawler.list_channels())
+        log.append(messages= [Ingestion._to_record(ch= ch, msg= m) for ch, m in pairs])
+        return len(pairs)
+
+    results.append(measure(stage= "crawl", fn= crawl, repeat= args.repeat))
+
+    # ---- extract ----------------------------------------------------------
+    paths= corpus.write_corpus(out_dir= Path(work_dir) / "files", n_files= args.files,
+                               sentences_per_section= args.sentences, seed= args.seed)
+    chunker= DataChunker(tokenizer_name= args.tokenizer, segmenter= args.segmenter)
+
+    texts= []
+    def extract() -> int:
+        texts[:]= [chunker.file_text_extractor(filepath= p) for p in paths]
+        return len(paths)
+
+    results.append(measure(stage= "extract", fn= extract, repeat= args.repeat))
+
+    # ---- chunk ------------------------------------------------------------
+    chunks= []
+    def chunk() -> int:
+        chunks[:]= [c for text in texts for c in chunker.chunk_text(text= text)]
+        return len(chunks)
+
+    results.append(measure(stage= "chunk", fn= chunk, repeat= args.repeat))
+
+    # ---- embed ------------------------------------------------------------
+    embedder= Embedder(model_name= args.model)
+    vectors= []
+    def embed() -> int:
+        vectors[:]= [embedder.encode(texts= [c["text"] for c in chunks[i:i+ args.batch_size]])
+                     for i in range(0, len(chunks), args.batch_size)]
+        return len(chunks)
+
+    results.append(measure(stage= "embed", fn= embed, repeat= args.repeat))
+    embeddings= np.concatenate(vectors)
+
+    # ---- upsert -----------------------------------------------------------
+    store= make_store(backend= args.backend, dim= embeddings.shape[1], storage_dir= Path(work_dir) / "vectors")
+    docs= [{"id": c["id"], "text": c["text"], "meta": {"lang": c["lang"]}} for c in chunks]
+
+    def upsert() -> int:
+        for i in range(0, len(docs), args.batch_size):
+            store.add_documents(embeddings= embeddings[i:i+ args.batch_size], docs= docs[i:i+ args.batch_size])
+        return len(docs)
+
+    results.append(measure(stage= "upsert", fn= upsert, repeat= args.repeat))
+
+    # ---- search -----------------------------------------------------------
+    queries= corpus.search_queries(messages= messages)[:args.queries] or [c["text"][:200] for c in chunks[:args.queries]]
+    query_vecs= embedder.encode(texts= queries)
+
+    def search() -> int:
+        for q in query_vecs:
+            store.search(query_vec= q, top_k= 20, with_vectors= True)
+        return len(query_vecs)
+
+    results.append(measure(stage= "search", fn= search, repeat= args.repeat))
+
+    # ---- answer -----------------------------------------------------------
+    pipeline= RAG_Pipeline(openai_client= FakeOpenAI(), embedder= embedder, store= store, tokenizer= chunker.tokenizer)
+    pipeline.config.read_dict({"AGENT": {"MODEL": "fake"}})
+
+    def answer() -> int:
+        for q in queries:
+            pipeline.cache.invalidate() # Cold path: embed, retrieve, pack, complete
+            pipeline.answer(query= q)
+        return len(queries)
+
+    results.append(measure(stage= "answer", fn= answer, repeat= args.repeat))
+
+    return results
+
+def load_history(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path, encoding= "utf-8") as f:
+        return json.load(f)
+
+def compare(results: List[Dict], previous: Dict, threshold: float) -> List[str]:
+    """
+    Stages more than `threshold` slower (or using more memory) than `previous`.
+    """
+    before= {r["stage"]: r for r in previous["results"]}
+    regressions= []
+
+    for r in results:
+        old= before.get(r["stage"])
+        if old is None:
+            continue
+
+        for key in ("seconds", "peak_mb"):
+            if old[key]> 0 and (r[key]- old[key])/ old[key]> threshold:
+                regressions.append(f"{r['stage']}.{key}: {old[key]} -> {r[key]} (+{(r[key]/ old[key]- 1)* 100:.0f}%)")
+
+    return regressions
+
+def main():
+    parser= argparse.ArgumentParser(description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type= int, default= 30)
+    parser.add_argument("--sentences", type= int, default= 40, help= "Sentences per document section")
+    parser.add_argument("--channels", type= int, default= 4)
+    parser.add_argument("--messages", type= int, default= 2000)
+    parser.add_argument("--queries", type= int, default= 50)
+    parser.add_argument("--batch-size", type= int, default= 64)
+    parser.add_argument("--backend", choices= ["numpy", "qdrant"], default= "numpy", help= "qdrant = QDrantDB on FakeQdrantClient")
+    parser.add_argument("--model", default= "sentence-transformers/all-MiniLM-L6-v2", help= "Small local embedding model")
+    parser.add_argument("--tokenizer", default= "jinaai/jina-embeddings-v3")
+    parser.add_argument("--segmenter", default= "fast")
+    parser.add_argument("--repeat", type= int, default= 3)
+    parser.add_argument("--seed", type= int, default= 0)
+    parser.add_argument("--label", default= None, help= "Free-form name for this run in the history")
+    parser.add_argument("--history", default= str(BASE_DIR / "../data/benchmarks/history.json"))
+    parser.add_argument("--threshold", type= float, default= 0.1, help= "Relative slowdown reported as a regression")
+    args= parser.parse_args()
+
+    results= run(args= args)
+    for r in results:
+        print(
+            f"{r['stage']:>8}: {r['items']:>6} items in {r['seconds']:.3f}s ({r['items_per_sec']:.1f}/s) | "
+            f"peak {r['peak_mb']} MB | max RSS {r['max_rss_mb']} MB"
+        )
+
+    params= {k: v for k, v in vars(args).items() if k not in ("label", "history", "threshold", "repeat")}
+    entry= {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "label": args.label,
+        "python": sys.version.split()[0],
+        "params": params,
+        "results": results
+    }
+
+    history_path= Path(args.history)
+    history= load_history(path= history_path)
+
+    previous= next((h for h in reversed(history) if h["params"]== params), None)
+    if previous is not None:
+        regressions= compare(results= results, previous= previous, threshold= args.threshold)
+        print(f"Compared with {previous['commit']} ({previous['timestamp']}): "+ ("; ".join(regressions) or "no regressions"))
+
+    history.append(entry)
+    history_path.parent.mkdir(parents= True, exist_ok= True)
+    with open(history_path, "w", encoding= "utf-8") as f:
+        json.dump(history, f, indent= 4, ensure_ascii= False)
+
+if __name__== "__main__":
+    main()
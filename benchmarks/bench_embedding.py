@@ -0,0 +1,152 @@
+"""
+Accuracy vs. throughput of the ONNX Runtime embedding backend (fp32 and int8,
+with and without length bucketing, per thread count) against the current
+sentence-transformers backend, on our own chunks and queries.
+
+Accuracy is the cosine between each backend's vector and the reference one,
+and recall@k of the reference top-k when searching with the backend's vectors.
+
+    python -m benchmarks.bench_embedding --threads 1 4 --k 5
+"""
+import os, glob, json, time, argparse, tempfile
+import numpy as np
+
+from pathlib import Path
+from typing import Callable, Dict, List
+from benchmarks import corpus
+from benchmarks.bench_quantization import load_chunks, load_queries, top_k, recall
+from process.embedding import Embedder
+from process.onnx_embedding import OnnxEncoder
+
+BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+def encode_unbucketed(encoder: OnnxEncoder, texts: List[str], batch_size: int) -> np.ndarray:
+    """
+    Fixed-size batches in input order, each padded to its longest text.
+    """
+    vectors= np.concatenate([
+        encoder._embed_batch(texts= texts[i:i+ batch_size]) for i in range(0, len(texts), batch_size)
+    ])
+    return vectors/ np.maximum(np.linalg.norm(vectors, axis= 1, keepdims= True), 1e-12)
+
+def padding_ratio(encoder: OnnxEncoder, texts: List[str], batch_size: int, bucketed: bool) -> float:
+    """
+    Padded tokens fed to the model per real token.
+    """
+    lengths= [len(ids) for ids in encoder.tokenizer(texts, truncation= True, max_length= encoder.max_length)["input_ids"]]
+    if bucketed:
+        batches= encoder._buckets(lengths= lengths, batch_size= batch_size)
+    else:
+        batches= [range(i, min(i+ batch_size, len(texts))) for i in range(0, len(texts), batch_size)]
+
+    padded= sum(len(b)* max(lengths[i] for i in b) for b in batches)
+    return padded/ max(sum(lengths), 1)
+
+def timed(fn: Callable[[], np.ndarray], repeat: int):
+    """
+    Result and best wall time of `repeat` runs.
+    """
+    times= []
+    for _ in range(repeat):
+        started= time.perf_counter()
+        vectors= fn()
+        times.append(time.perf_counter()- started)
+    return vectors, min(times)
+
+def evaluate(name: str, vectors: np.ndarray, seconds: float, reference: np.ndarray, n_docs: int,
+             truth: np.ndarray, k: int) -> Dict:
+    cosine= (vectors* reference).sum(axis= 1)
+    docs, queries= vectors[:n_docs], vectors[n_docs:]
+
+    return {
+        "backend": name,
+        "texts_per_sec": round(len(vectors)/ seconds, 1),
+        "seconds": round(seconds, 3),
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "min_cosine": round(float(cosine.min()), 5),
+        f"recall@{k}": round(recall(found= top_k(queries@ docs.T, k= k), truth= truth), 4)
+    }
+
+def load_texts(args):
+    chunks= []
+    if glob.glob(os.path.join(args.files, "*")):
+        chunks= load_chunks(file_dir= args.files)
+
+    if not chunks: # No local documents, use the synthetic benchmark corpus
+        out_dir= Path(tempfile.mkdtemp(prefix= "bench_embedding_"))
+        corpus.write_corpus(out_dir= out_dir, n_files= args.n_files, seed= args.seed)
+        chunks= load_chunks(file_dir= out_dir)
+
+    return chunks, load_queries(message_dir= args.messages, chunks= chunks, n_synthetic= args.queries, seed= args.seed)
+
+def main():
+    parser= argparse.ArgumentParser(description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default= "jinaai/jina-embeddings-v3")
+    parser.add_argument("--files", default= str(BASE_DIR / "../data/files"))
+    parser.add_argument("--messages", default= str(BASE_DIR / "../data/messages"))
+    parser.add_argument("--n-files", type= int, default= 12, help= "Synthetic documents when --files is empty")
+    parser.add_argument("--queries", type= int, default= 50)
+    parser.add_argument("--threads", type= int, nargs= "+", default= [1, os.cpu_count()])
+    parser.add_argument("--batch-size", type= int, default= 32)
+    parser.add_argument("--max-batch-tokens", type= int, default= 8192)
+    parser.add_argument("--k", type= int, default= 5)
+    parser.add_argument("--repeat", type= int, default= 2)
+    parser.add_argument("--seed", type= int, default= 0)
+    parser.add_argument("--output", default= None, help= "Optional JSON file for the results")
+    args= parser.parse_args()
+
+    chunks, queries= load_texts(args= args)
+    texts= chunks+ queries
+    print(f"{len(chunks)} chunks, {len(queries)} queries")
+
+    # Reference: the current backend, full precision
+    embedder= Embedder(model_name= args.model, backend= "sentence_transformers")
+    reference, seconds= timed(
+        fn= lambda: embedder.model.encode(sentences= texts, batch_size= args.batch_size, normalize_embeddings= True,
+                                          convert_to_numpy= True, show_progress_bar= False,
+                                          **({"task": embedder.task} if embedder.task else {})),
+        repeat= args.repeat
+    )
+    truth= top_k(reference[len(chunks):]@ reference[:len(chunks)].T, k= args.k)
+    results= [evaluate(name= "sentence_transformers", vectors= reference, seconds= seconds, reference= reference,
+                       n_docs= len(chunks), truth= truth, k= args.k)]
+
+    for quantize in (False, True):
+        for threads in args.threads:
+            encoder= OnnxEncoder(
+                model_name= args.model,
+                cache_dir= BASE_DIR / "../.cache/models",
+                threads= threads,
+                quantize= quantize,
+                task= embedder.task,
+                max_batch_tokens= args.max_batch_tokens
+            )
+            name= f"onnx-{'int8' if quantize else 'fp32'}-t{threads}"
+
+            runs= {
+                "bucketed": lambda: encoder.encode(sentences= texts, batch_size= args.batch_size, normalize_embeddings= True),
+                "unbucketed": lambda: encode_unbucketed(encoder= encoder, texts= texts, batch_size= args.batch_size)
+            }
+            for mode, fn in runs.items():
+                vectors, seconds= timed(fn= fn, repeat= args.repeat)
+                row= evaluate(name= f"{name}-{mode}", vectors= vectors, seconds= seconds, reference= reference,
+                              n_docs= len(chunks), truth= truth, k= args.k)
+                row["padding_ratio"]= round(padding_ratio(encoder= encoder, texts= texts, batch_size= args.batch_size,
+                                                          bucketed= mode== "bucketed"), 3)
+                results.append(row)
+
+    for row in results:
+        print(
+            f"{row['backend']:>32}: {row['texts_per_sec']:>8.1f} texts/s "
+            f"({row['texts_per_sec']/ results[0]['texts_per_sec']:.2f}x) | "
+            f"cosine mean {row['mean_cosine']:.4f} min {row['min_cosine']:.4f} | "
+            f"recall@{args.k} {row[f'recall@{args.k}']:.3f}"
+            + (f" | padding x{row['padding_ratio']}" if "padding_ratio" in row else "")
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding= "utf-8") as f:
+            json.dump(results, f, indent= 4)
+
+if __name__== "__main__":
+    main()
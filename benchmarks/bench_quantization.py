@@ -0,0 +1,158 @@
+"""
+Recall@k vs. memory vs. latency for Matryoshka truncation and int8/binary
+quantization (with oversampling + full-precision rescoring), measured on our
+own chunks.
+
+    python -m benchmarks.bench_quantization --k 5 --dims 1024 512 256 128
+"""
+import os, json, glob, time, argparse
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List
+from process.data_chunkning import DataChunker
+from process.embedding import Embedder
+from ingestion.message_log import MessageLog
+
+BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+# Popcount of every byte value, for Hamming distances on packed bits
+_POPCOUNT= np.array([bin(i).count("1") for i in range(256)], dtype= np.uint8)
+
+def load_chunks(file_dir) -> List[str]:
+    chunker= DataChunker()
+    texts= []
+    for path in sorted(glob.glob(os.path.join(file_dir, "*"))):
+        if not path.endswith((".pdf", ".docx", ".txt", ".md")):
+            continue
+        raw_text= chunker.file_text_extractor(filepath= path)
+        texts.extend(c["text"] for c in chunker.chunk_text(text= raw_text))
+
+    return texts
+
+def load_queries(message_dir, chunks: List[str], n_synthetic= 50, seed= 0) -> List[str]:
+    """
+    Real `$search` questions from the message log, plus the opening of
+    randomly picked chunks so there are enough queries to measure recall.
+    """
+    queries= []
+    if os.path.exists(message_dir):
+        for message in MessageLog(root= message_dir).scan():
+            text= message.get("text") or ""
+            if text.strip().lower().startswith("$search"):
+                queries.append(text.strip()[len("$search"):].strip())
+
+    rng= np.random.default_rng(seed)
+    for i in rng.choice(len(chunks), size= min(n_synthetic, len(chunks)), replace= False):
+        queries.append(chunks[i][:200])
+
+    return queries
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k= min(k, scores.shape[1])
+    idx= np.argpartition(-scores, k- 1, axis= 1)[:, :k]
+    order= np.argsort(-np.take_along_axis(scores, idx, axis= 1), axis= 1)
+    return np.take_along_axis(idx, order, axis= 1)
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits= [len(set(f)& set(t))/ len(t) for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+def quantize_int8(vectors: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(vectors* 127.0), -127, 127).astype(np.int8)
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    return np.packbits(vectors> 0, axis= 1)
+
+def hamming_scores(db_bits: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    # Negative Hamming distance, so larger is better like cosine
+    return np.stack([
+        -_POPCOUNT[np.bitwise_xor(db_bits, bits)].sum(axis= 1, dtype= np.int32)
+        for bits in query_bits
+    ]).astype(np.float32)
+
+def evaluate(docs: np.ndarray, queries: np.ndarray, truth: np.ndarray, dim: int, storage: str,
+             k: int, oversampling: float) -> Dict:
+    d= Embedder.truncate(vectors= docs, dim= dim)
+    q= Embedder.truncate(vectors= queries, dim= dim)
+
+    started= time.perf_counter()
+    if storage== "float32":
+        found= top_k(q@ d.T, k= k)
+        bytes_per_vector= dim* 4
+    else:
+        if storage== "int8":
+            stored= quantize_int8(vectors= d)
+            scores= q@ stored.T.astype(np.float32)
+            bytes_per_vector= dim
+        else:
+            stored= quantize_binary(vectors= d)
+            scores= hamming_scores(db_bits= stored, query_bits= quantize_binary(vectors= q))
+            bytes_per_vector= int(np.ceil(dim/ 8))
+
+        # Oversample on the quantized index, rescore candidates at full precision
+        candidates= top_k(scores, k= int(np.ceil(k* oversampling)))
+        rescored= np.einsum("qd,qcd->qc", q, d[candidates])
+        found= np.take_along_axis(candidates, top_k(rescored, k= k), axis= 1)
+
+    latency_ms= (time.perf_counter()- started)* 1000/ len(q)
+
+    return {
+        "dim": dim,
+        "storage": storage,
+        "oversampling": oversampling if storage!= "float32" else 1.0,
+        f"recall@{k}": round(recall(found= found, truth= truth), 4),
+        "bytes_per_vector": bytes_per_vector,
+        "index_mb_per_1M": round(bytes_per_vector* 1_000_000/ 2** 20, 1),
+        "latency_ms_per_query": round(latency_ms, 3)
+    }
+
+def main():
+    parser= argparse.ArgumentParser(description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", default= str(BASE_DIR / "../data/files"))
+    parser.add_argument("--messages", default= str(BASE_DIR / "../data/messages"))
+    parser.add_argument("--dims", type= int, nargs= "+", default= [1024, 768, 512, 256, 128])
+    parser.add_argument("--storage", nargs= "+", default= ["float32", "int8", "binary"])
+    parser.add_argument("--k", type= int, default= 5)
+    parser.add_argument("--oversampling", type= float, default= 2.0)
+    parser.add_argument("--output", default= None, help= "Optional JSON file for the results")
+    args= parser.parse_args()
+
+    chunks= load_chunks(file_dir= args.files)
+    queries= load_queries(message_dir= args.messages, chunks= chunks)
+    print(f"{len(chunks)} chunks, {len(queries)} queries")
+
+    embedder= Embedder()
+    doc_vecs= embedder.encode(texts= chunks)
+    query_vecs= embedder.encode(texts= queries)
+
+    # Ground truth: full-dimension float32 exact search
+    truth= top_k(query_vecs@ doc_vecs.T, k= args.k)
+
+    results= []
+    for dim in args.dims:
+        for storage in args.storage:
+            row= evaluate(
+                docs= doc_vecs,
+                queries= query_vecs,
+                truth= truth,
+                dim= dim,
+                storage= storage,
+                k= args.k,
+                oversampling= args.oversampling
+            )
+            results.append(row)
+            print(
+                f"dim={row['dim']:>5} {row['storage']:>7} "
+                f"recall@{args.k}={row[f'recall@{args.k}']:.3f} "
+                f"bytes/vec={row['bytes_per_vector']:>5} "
+                f"MB/1M={row['index_mb_per_1M']:>8} "
+                f"latency={row['latency_ms_per_query']:.3f}ms"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding= "utf-8") as f:
+            json.dump(results, f, indent= 4)
+
+if __name__== "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Synthetic Vietnamese + English corpus for benchmarks: documents with
+markdown headings (TXT/MD/DOCX) and Slack channels with threads and
+`$search` questions. The same seed always gives the same corpus.
+"""
+import os
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+from docx import Document
+
+VI_WORDS= (
+    "hệ thống dữ liệu khách hàng báo cáo triển khai máy chủ cấu hình quy trình dự án nhóm "
+    "kiểm thử phiên bản cập nhật tài liệu hướng dẫn yêu cầu hiệu năng bảo mật người dùng "
+    "ứng dụng giao diện kết quả phân tích mô hình đánh giá chi phí thời gian tuần này "
+    "cần được đã sẽ đang trong cho với của và các những một không có thể để khi"
+).split()
+
+EN_WORDS= (
+    "system data customer report deployment server configuration process project team "
+    "testing release update document guide requirement performance security user "
+    "application interface result analysis model evaluation cost time this week "
+    "should be has will is in for with of and the a not can to when"
+).split()
+
+def sentence(rng: np.random.Generator, lang: str, min_words= 6, max_words= 24) -> str:
+    words= VI_WORDS if lang== "vi" else EN_WORDS
+    n= int(rng.integers(min_words, max_words+ 1))
+    text= " ".join(rng.choice(words, size= n))
+    return text[0].upper()+ text[1:]+ "."
+
+def document(rng: np.random.Generator, lang: str, n_sections= 4, sentences_per_section= 40) -> str:
+    """
+    `lang` is "vi", "en" or "mixed" (sections alternate languages).
+    """
+    sections= []
+    for i in range(n_sections):
+        sec_lang= (["vi", "en"][i% 2]) if lang== "mixed" else lang
+        title= sentence(rng= rng, lang= sec_lang, min_words= 2, max_words= 5).rstrip(".")
+        body= " ".join(sentence(rng= rng, lang= sec_lang) for _ in range(sentences_per_section))
+        sections.append(f"# {title}\n{body}")
+
+    return "\n".join(sections)
+
+def write_corpus(out_dir, n_files= 20, n_sections= 4, sentences_per_section= 40, seed= 0) -> List[str]:
+    """
+    Write `n_files` documents (cycling .txt, .md, .docx and vi/en/mixed) and
+    return their paths.
+    """
+    rng= np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok= True)
+
+    paths= []
+    for i in range(n_files):
+        lang= ("vi", "en", "mixed")[i% 3]
+        ext= (".txt", ".md", ".docx")[i% 3]
+        text= document(rng= rng, lang= lang, n_sections= n_sections, sentences_per_section= sentences_per_section)
+        path= str(Path(out_dir) / f"doc_{i:04d}_{lang}{ext}")
+
+        if ext== ".docx":
+            doc= Document()
+            for line in text.split("\n"):
+                doc.add_paragraph(line)
+            doc.save(path)
+        else:
+            with open(path, "w", encoding= "utf-8") as f:
+                f.write(text)
+
+        paths.append(path)
+
+    return paths
+
+def slack_workspace(n_channels= 4, n_messages= 500, thread_ratio= 0.2, replies= 4, search_ratio= 0.05,
+                    start_ts= 1_700_000_000.0, seed= 0) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    """
+    Channels and their messages as the Slack API returns them: top-level
+    messages every few minutes, some with reply threads, some `$search` questions.
+    """
+    rng= np.random.default_rng(seed)
+    channels= [{"id": f"C{i:04d}", "name": f"channel-{i}"} for i in range(n_channels)]
+
+    messages= {}
+    for ch in channels:
+        ts= start_ts
+        history= []
+        for _ in range(n_messages// n_channels):
+            ts+= float(rng.integers(30, 3600))
+            lang= "vi" if rng.random()< 0.6 else "en"
+            text= sentence(rng= rng, lang= lang)
+            if rng.random()< search_ratio:
+                text= f"$search {text}"
+
+            parent= {"ts": f"{ts:.6f}", "user": f"U{int(rng.integers(0, 20)):03d}", "text": text}
+            history.append(parent)
+
+            if rng.random()< thread_ratio:
+                parent["reply_count"]= replies
+                for j in range(replies):
+                    history.append({
+                        "ts": f"{ts+ j+ 1:.6f}",
+                        "thread_ts": parent["ts"],
+                        "user": f"U{int(rng.integers(0, 20)):03d}",
+                        "text": sentence(rng= rng, lang= lang)
+                    })
+                ts+= replies
+
+        messages[ch["id"]]= history
+
+    return channels, messages
+
+def search_queries(messages: Dict[str, List[Dict]]) -> List[str]:
+    return [
+        m["text"][len("$search"):].strip()
+        for history in messages.values() for m in history
+        if m["text"].startswith("$search")
+    ]
@@ -0,0 +1,197 @@
+"""
+Deterministic, in-memory stand-ins for the Slack WebClient, the OpenAI client
+and the Qdrant client, so benchmarks run offline and measure our own code.
+
+Each fake answers only the calls this project makes, with the response shapes
+our code reads, and can add a fixed `latency` per call to model the network.
+"""
+import time, hashlib, threading
+import numpy as np
+
+from types import SimpleNamespace
+from typing import Dict, List
+from process.vector_store import SearchHit
+
+class FakeSlackClient:
+    """
+    `WebClient` over a fixed workspace: channels, messages by channel (thread
+    replies carry `thread_ts`) and file listings, paginated like Slack.
+    """
+    def __init__(self, channels: List[Dict], messages: Dict[str, List[Dict]], files: List[Dict]= None, latency= 0.0):
+        self.channels= channels
+        self.messages= messages
+        self.files= files or []
+        self.latency= latency
+
+        self.calls= {}
+        self.updates= []
+        self._lock= threading.Lock()
+
+    def _record(self, method: str):
+        with self._lock:
+            self.calls[method]= self.calls.get(method, 0)+ 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _page(items: List, cursor: str, limit: int, key: str) -> Dict:
+        start= int(cursor or 0)
+        end= start+ (limit or 100)
+        return {
+            "ok": True,
+            key: items[start:end],
+            "response_metadata": {"next_cursor": str(end) if end< len(items) else ""}
+        }
+
+    def conversations_list(self, limit= 100, cursor= None, **kwargs) -> Dict:
+        self._record(method= "conversations_list")
+        return self._page(items= self.channels, cursor= cursor, limit= limit, key= "channels")
+
+    def conversations_history(self, channel: str, oldest= "0", limit= 100, cursor= None, **kwargs) -> Dict:
+        self._record(method= "conversations_history")
+        top= [
+            m for m in self.messages.get(channel, [])
+            if float(m["ts"])> float(oldest) and m.get("thread_ts") in (None, m["ts"])
+        ]
+        top.sort(key= lambda m: -float(m["ts"])) # Newest first, like Slack
+        return self._page(items= top, cursor= cursor, limit= limit, key= "messages")
+
+    def conversations_replies(self, channel: str, ts: str, oldest= "0", limit= 100, cursor= None, **kwargs) -> Dict:
+        self._record(method= "conversations_replies")
+        thread= [
+            m for m in self.messages.get(channel, [])
+            if (m["ts"]== ts or m.get("thread_ts")== ts) and (m["ts"]== ts or float(m["ts"])> float(oldest))
+        ]
+        thread.sort(key= lambda m: float(m["ts"]))
+        return self._page(items= thread, cursor= cursor, limit= limit, key= "messages")
+
+    def files_list(self, count= 100, page= 1, **kwargs) -> Dict:
+        self._record(method= "files_list")
+        start= (page- 1)* count
+        return {
+            "ok": True,
+            "files": self.files[start:start+ count],
+            "paging": {"page": page, "pages": max(1, -(-len(self.files)// count))}
+        }
+
+    def chat_postMessage(self, channel: str, text: str, **kwargs) -> Dict:
+        self._record(method= "chat_postMessage")
+        return {"ok": True, "channel": channel, "ts": f"{time.time():.6f}"}
+
+    def chat_update(self, channel: str, ts: str, text: str, **kwargs) -> Dict:
+        self._record(method= "chat_update")
+        self.updates.append((channel, ts, text))
+        return {"ok": True, "channel": channel, "ts": ts}
+
+    def files_upload_v2(self, channel: str, file: str, **kwargs) -> Dict:
+        self._record(method= "files_upload_v2")
+        return {"ok": True}
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self.owner= owner
+
+    def _answer(self, messages: List[Dict]) -> str:
+        prompt= messages[-1]["content"]
+        digest= hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        words= prompt.split()
+        return f"[{digest}] "+ " ".join(words[:self.owner.answer_words])
+
+    def create(self, model: str, messages: List[Dict], stream= False, **kwargs):
+        self.owner._record()
+        answer= self._answer(messages= messages)
+
+        if not stream:
+            choice= SimpleNamespace(message= SimpleNamespace(content= answer))
+            return SimpleNamespace(choices= [choice])
+
+        def chunks():
+            for i, word in enumerate(answer.split(" ")):
+                delta= SimpleNamespace(content= word if i== 0 else " "+ word)
+                yield SimpleNamespace(choices= [SimpleNamespace(delta= delta)])
+
+        return chunks()
+
+class FakeOpenAI:
+    """
+    OpenAI client whose chat completions echo a hash and the first
+    `answer_words` words of the prompt, streamed word by word with `stream=True`.
+    """
+    def __init__(self, latency= 0.0, answer_words= 64):
+        self.latency= latency
+        self.answer_words= answer_words
+        self.n_calls= 0
+        self._lock= threading.Lock()
+        self.chat= SimpleNamespace(completions= _FakeCompletions(owner= self))
+
+    def _record(self):
+        with self._lock:
+            self.n_calls+= 1
+        if self.latency:
+            time.sleep(self.latency)
+
+class FakeQdrantClient:
+    """
+    `QdrantClient` keeping one collection per name in memory, with exact
+    cosine search. Enough for QDrantDB's create, upsert, search, delete (by
+    id) and count paths.
+    """
+    def __init__(self, latency= 0.0):
+        self.latency= latency
+        self.collections= {}
+        self._lock= threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_collections(self):
+        return SimpleNamespace(collections= [SimpleNamespace(name= name) for name in self.collections])
+
+    def recreate_collection(self, collection_name: str, vectors_config, **kwargs):
+        self.collections[collection_name]= {}
+
+    def update_collection(self, collection_name: str, **kwargs):
+        pass
+
+    def upsert(self, collection_name: str, points, wait= True):
+        self._wait()
+        with self._lock:
+            collection= self.collections.setdefault(collection_name, {})
+            for pid, vector, payload in zip(points.ids, points.vectors, points.payloads):
+                vector= np.asarray(vector, dtype= np.float32)
+                collection[pid]= (vector/ max(np.linalg.norm(vector), 1e-12), payload)
+
+        return SimpleNamespace(status= "completed")
+
+    def search(self, collection_name: str, query_vector, limit= 5, with_vectors= False, **kwargs) -> List[SearchHit]:
+        self._wait()
+        with self._lock:
+            items= list(self.collections.get(collection_name, {}).items())
+        if not items:
+            return []
+
+        query= np.asarray(query_vector, dtype= np.float32)
+        query= query/ max(np.linalg.norm(query), 1e-12)
+        scores= np.stack([v for _, (v, _) in items])@ query
+        top= np.argsort(-scores)[:limit]
+
+        return [
+            SearchHit(
+                id= items[i][0],
+                score= float(scores[i]),
+                payload= items[i][1][1],
+                vector= items[i][1][0].tolist() if with_vectors else None
+            )
+            for i in top
+        ]
+
+    def delete(self, collection_name: str, points_selector, wait= True):
+        self._wait()
+        with self._lock:
+            collection= self.collections.get(collection_name, {})
+            for pid in getattr(points_selector, "points", []):
+                collection.pop(pid, None)
+
+    def count(self, collection_name: str, exact= True):
+        return SimpleNamespace(count= len(self.collections.get(collection_name, {})))
@@ -0,0 +1,147 @@
+import os, time, hashlib, requests
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+from requests.adapters import HTTPAdapter
+from process.telemetry import telemetry
+
+class DownloadError(Exception):
+    pass
+
+class Downloader:
+    """
+    Streaming, pooled, resumable downloads of Slack attachments.
+
+    One `requests.Session` keeps connections alive across files. Bodies are
+    streamed in chunks to `<dest>.part` and renamed into place only once
+    complete, hashed on the way. A failed transfer resumes from the partial
+    file with an HTTP Range request; files over `max_bytes` are refused.
+    """
+    def __init__(self, token: str, max_workers= 4, chunk_size= 1 << 20, connect_timeout= 10,
+                 read_timeout= 60, max_bytes= 200* 2** 20, max_retries= 3):
+        self.max_workers= max_workers
+        self.chunk_size= chunk_size
+        self.timeout= (connect_timeout, read_timeout)
+        self.max_bytes= max_bytes
+        self.max_retries= max_retries
+
+        self.session= requests.Session()
+        self.session.headers["Authorization"]= f"Bearer {token}"
+        adapter= HTTPAdapter(pool_connections= max_workers, pool_maxsize= max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @staticmethod
+    def _hash_into(filepath: str, h):
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+
+    @classmethod
+    def file_hash(cls, filepath: str) -> str:
+        h= hashlib.sha256()
+        cls._hash_into(filepath= filepath, h= h)
+        return h.hexdigest()
+
+    def _transfer(self, url: str, part_path: str, h) -> int:
+        """
+        Stream `url` into `part_path`, continuing an existing partial file.
+        Returns the final size; `h` is fed every byte of the file.
+        """
+        offset= os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers= {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(url, headers= headers, stream= True, timeout= self.timeout) as response:
+            if response.status_code== 416: # Partial file is already complete
+                self._hash_into(filepath= part_path, h= h)
+                return offset
+            response.raise_for_status()
+
+            if offset and response.status_code!= 206:
+                # Server ignored the Range header, start over
+                offset= 0
+
+            length= response.headers.get("Content-Length")
+            if length is not None and offset+ int(length)> self.max_bytes:
+                raise DownloadError(f"{url} is larger than {self.max_bytes} bytes")
+
+            if offset:
+                self._hash_into(filepath= part_path, h= h)
+
+            size= offset
+            with open(part_path, "ab" if offset else "wb") as out:
+                for block in response.iter_content(chunk_size= self.chunk_size):
+                    size+= len(block)
+                    if size> self.max_bytes:
+                        raise DownloadError(f"{url} is larger than {self.max_bytes} bytes")
+                    out.write(block)
+                    h.update(block)
+
+            return size
+
+    def download(self, url: str, dest: str, expected_size: int= None) -> Dict:
+        """
+        Download `url` to `dest` atomically. Returns {"path", "size", "sha256"}.
+        """
+        with telemetry.span(stage= "download"):
+            result= self._download(url= url, dest= dest, expected_size= expected_size)
+
+        telemetry.count(name= "files_downloaded")
+        telemetry.count(name= "bytes_downloaded", value= result["size"])
+        return result
+
+    def _download(self, url: str, dest: str, expected_size: int= None) -> Dict:
+        if expected_size and expected_size> self.max_bytes:
+            raise DownloadError(f"{url} is larger than {self.max_bytes} bytes")
+
+        part_path= f"{dest}.part"
+
+        for attempt in range(self.max_retries+ 1):
+            h= hashlib.sha256()
+            try:
+                size= self._transfer(url= url, part_path= part_path, h= h)
+                if expected_size is not None and size!= expected_size:
+                    # Truncated or changed upstream, a partial file is useless here
+                    os.remove(part_path)
+                    raise requests.ConnectionError(f"Expected {expected_size} bytes from {url}, got {size}")
+                break
+            except DownloadError:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+            except requests.RequestException as e:
+                status= getattr(e.response, "status_code", None)
+                if attempt== self.max_retries or (status is not None and 400<= status< 500 and status!= 429):
+                    raise DownloadError(f"Cannot download {url}: {e}")
+
+                delay= 0.5* (2** attempt)
+                print(f"Download of {url} failed ({e}), resuming in {delay:.1f}s")
+                time.sleep(delay)
+
+        os.replace(part_path, dest)
+        return {"path": dest, "size": size, "sha256": h.hexdigest()}
+
+    def download_many(self, items: List[Tuple[str, str, int]]) -> Iterator[Tuple[int, Dict, Exception]]:
+        """
+        Download (url, dest, expected_size) items, at most `max_workers` at once.
+        Yields (index, result, error) as downloads finish. Items whose `dest`
+        an earlier item already writes to fail with DownloadError.
+        """
+        with ThreadPoolExecutor(max_workers= self.max_workers) as pool:
+            futures= {}
+            dests= set()
+            for i, (url, dest, size) in enumerate(items):
+                if os.path.abspath(dest) in dests:
+                    yield i, None, DownloadError(f"{url}: another download already writes to {dest}")
+                    continue
+                dests.add(os.path.abspath(dest))
+                futures[pool.submit(self.download, url, dest, size)]= i
+
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except DownloadError as e:
+                    yield futures[future], None, e
+
+    def close(self):
+        self.session.close()
@@ -1,16 +1,21 @@
-import os, json, configparser, requests
+import os, configparser
 
 from pathlib import Path
 from slack_sdk import WebClient
-from typing import List, Dict, Any
+from typing import List, Dict
+from ingestion.slack_crawler import SlackCrawler
+from ingestion.downloader import Downloader
+from ingestion.state_store import StateStore
+from ingestion.message_log import MessageLog
+
+# Slack file types that get downloaded and indexed, on incremental and full runs
+FILE_TYPES= ("pdf", "docx", "txt", "md")
 
 class Ingestion:
     def __init__(self):
         BASE_DIR= Path(__file__).resolve().parent # Get the current folder
         config_path= BASE_DIR / "../.config/creds.env"
-        self.message_path= BASE_DIR / "../data/conversation.jsonl"
         self.file_dir= BASE_DIR / "../data/files"
-        self.manifest_path= BASE_DIR / "../data/manifest.json"
 
         os.makedirs(self.file_dir, exist_ok= True)
         
@@ -18,187 +23,177 @@ class Ingestion:
         self.config.read(config_path)
 
         self.client= WebClient(token= self.config["SLACK"]["BOT_USER_OAUTH_TOKEN"])
-
-        self.manifest= self._load_manifest()
-
-    def _load_manifest(self) -> Dict[str, Any]:
-        if os.path.exists(self.manifest_path):
-            with open(self.manifest_path, "r", encoding= "utf-8") as f:
-                return json.load(f)
-            
+        self.crawler= SlackCrawler(
+            client= self.client,
+            max_workers= self.config.getint("CRAWLER", "MAX_WORKERS", fallback= 8),
+            page_limit= self.config.getint("CRAWLER", "PAGE_LIMIT", fallback= 200),
+            max_retries= self.config.getint("CRAWLER", "MAX_RETRIES", fallback= 5),
+            thread_active_days= self.config.getint("CRAWLER", "THREAD_ACTIVE_DAYS", fallback= 30),
+            tier_rates= {
+                "tier2": self.config.getint("CRAWLER", "TIER2_PER_MIN", fallback= 20),
+                "tier3": self.config.getint("CRAWLER", "TIER3_PER_MIN", fallback= 50)
+            }
+        )
+        self.downloader= Downloader(
+            token= self.config["SLACK"]["BOT_USER_OAUTH_TOKEN"],
+            max_workers= self.config.getint("DOWNLOAD", "MAX_WORKERS", fallback= 4),
+            read_timeout= self.config.getfloat("DOWNLOAD", "READ_TIMEOUT", fallback= 60),
+            max_bytes= self.config.getint("DOWNLOAD", "MAX_MB", fallback= 200)* 2** 20,
+            max_retries= self.config.getint("DOWNLOAD", "MAX_RETRIES", fallback= 3)
+        )
+
+        # High-water marks and file records (imports data/manifest.json once)
+        self.state= StateStore()
+
+        # Messages by channel and month (imports data/conversation.jsonl once)
+        self.message_log= MessageLog(
+            compact_ratio= self.config.getfloat("MESSAGE_LOG", "COMPACT_RATIO", fallback= 0.3)
+        )
+        self.message_log.start_compactor(
+            interval= self.config.getint("MESSAGE_LOG", "COMPACT_INTERVAL", fallback= 600)
+        )
+
+    @staticmethod
+    def _to_record(ch: Dict, msg: Dict) -> Dict:
         return {
-            "last_message_ts": "0",
-            "processed_file_ids": [],
-            "files": {}
+            "channel_id": ch["id"],
+            "channel_name": ch["name"],
+            "channel_type": True if ch.get("is_private") else False,
+            "user": msg.get("user"),
+            "text": msg.get("text"),
+            "ts": msg.get("ts"),
+            "thread_ts": msg.get("thread_ts")
         }
-    
-    def _save_manifest(self):
-        with open(self.manifest_path, "w", encoding= "utf-8") as f:
-            json.dump(self.manifest, f, indent= 4, ensure_ascii= False)
 
     def ingest_messages_incremental(self) -> List[Dict]:
         """
-        Incremental: fetch messages newer than manifest["last_message_ts"].
-        Append to conversations.jsonl and return new message list.
+        Incremental: fetch messages newer than each channel's high-water mark,
+        thread replies included.
+        Append to the message log and return new message list.
         """
 
-        last_ts= float(self.manifest["last_message_ts"])
-        channels= self.client.conversations_list(types= "private_channel")["channels"]
-
-        new_messages= []
-
-        for ch in channels:
-            history= self.client.conversations_history(
-                channel= ch["id"],
-                oldest= str(last_ts),
-                limit= 1000
-            )
+        channels= self.crawler.list_channels(types= "private_channel")
 
-            for msg in history["messages"]:
-                ts= float(msg["ts"])
-                if ts<= last_ts:
-                    continue
-
-                new_messages.append({
-                    "channel_id": ch["id"],
-                    "channel_name": ch["name"],
-                    "channel_type": True if ch["is_private"] else False,
-                    "user": msg.get("user"),
-                    "text": msg.get("text"),
-                    "ts": msg.get("ts"),
-                    "thread_ts": msg.get("thread_ts")
-                })
-
-                if ts> last_ts:
-                    last_ts= ts
+        # Channels without a mark yet start from the old global watermark
+        # Known threads too: a new reply on an old thread brings no new parent
+        pairs, channel_ts, threads= self.crawler.crawl(
+            channels= channels,
+            high_water= self.state.channel_marks(),
+            default_oldest= self.state.last_message_ts(),
+            threads= self.state.threads()
+        )
+        new_messages= [self._to_record(ch= ch, msg= msg) for ch, msg in pairs]
 
         if new_messages:
-            with open(self.message_path, "a", encoding= "utf-8") as f:
-                for m in new_messages:
-                    f.write(json.dumps(m, ensure_ascii= False)+ "\n")
+            self.message_log.append(messages= new_messages)
 
-        self.manifest["last_message_ts"]= str(last_ts)
-        self._save_manifest()
+        self.state.update_threads(threads= threads)
+        self.state.update_channel_marks(marks= channel_ts)
 
         return new_messages
 
     def ingest_messages_full(self) -> List[Dict]:
         """
-        Full ingestion: load ALL messages again.
-        Overwrites conversation.jsonl.
+        Full ingestion: load ALL messages again, thread replies included.
+        Unchanged messages are skipped by the message log, edited ones updated.
         """
 
-        channels= self.client.conversations_list(types= "private_channel")["channels"]
+        channels= self.crawler.list_channels(types= "private_channel")
+        pairs, channel_ts, threads= self.crawler.crawl(channels= channels)
 
-        all_messages= []
-        for ch in channels:
-            history= self.client.conversations_history(channel= ch["id"], limit= 3000)
-            for msg in history["messages"]:
-                all_messages.append({
-                    "channel_id": ch["id"],
-                    "channel_name": ch["name"],
-                    "channel_type": True if ch["is_private"] else False,
-                    "user": msg.get("user"),
-                    "text": msg.get("text"),
-                    "ts": msg.get("ts")
-                })
+        all_messages= [self._to_record(ch= ch, msg= msg) for ch, msg in pairs]
 
+        self.message_log.append(messages= all_messages)
 
-        with open(self.message_path, "w", encoding= "utf-8") as f:
-            for m in all_messages:
-                f.write(json.dumps(m, ensure_ascii= False)+ "\n")
+        self.state.update_threads(threads= threads)
+        self.state.update_channel_marks(marks= channel_ts)
 
-        if all_messages:
-            latest_ts= max(float(m["ts"]) for m in all_messages)
-            self.manifest["last_message_ts"]= str(latest_ts)
+        return all_messages
 
-        self._save_manifest()
+    @staticmethod
+    def _is_unchanged(known: Dict, f: Dict) -> bool:
+        """
+        Slack's `updated` (edits) and `size` tell whether the local copy is current.
+        """
+        return bool(known) and os.path.exists(known.get("path", "")) \
+            and known.get("updated")== f.get("updated") \
+            and known.get("size") in (None, f.get("size"))
 
-        return all_messages
+    def _download_files(self, files: List[Dict]) -> Dict[str, Dict]:
+        """
+        Download `files` in parallel and return their file records by file id.
+        Failed downloads are reported and left out.
+        """
+        # Names are not unique in a workspace, the file id is
+        items= [
+            (f["url_private_download"], os.path.join(self.file_dir, f"{f['id']}_{os.path.basename(f['name'])}"), f.get("size"))
+            for f in files
+        ]
+
+        records= {}
+        for i, result, error in self.downloader.download_many(items= items):
+            f= files[i]
+            if error is not None:
+                print(f"Error: {error}")
+                continue
+
+            records[f["id"]]= {
+                "id": f["id"],
+                "name": f["name"],
+                "path": result["path"],
+                "timestamp": f.get("timestamp"),
+                "updated": f.get("updated"),
+                "size": result["size"],
+                "sha256": result["sha256"],
+                "user": f.get("user"),
+                "mimetype": f.get("mimetype"),
+                "filetype": f.get("filetype"),
+                "channels": f.get("channels", [])
+            }
+
+        return records
 
     def ingest_files_incremental(self) -> List[Dict]:
         """
-        Only download and register NEW files not in the manifest.
+        Only download and register NEW files not in the state store, or files
+        edited since they were downloaded.
         """
 
-        processed_ids= set(self.manifest["processed_file_ids"])
-        files= self.client.files_list(count= 200)["files"]
+        files= self.crawler.list_files()
 
-        new_files= []
+        to_download= [
+            f for f in files
+            if f["filetype"] in FILE_TYPES
+            and not self._is_unchanged(known= self.state.get_file(file_id= f["id"]), f= f)
+        ]
 
-        for f in files:
-            file_id= f["id"]
-            if file_id in processed_ids:
-                continue
+        # Keep Slack's listing order for the returned files
+        records= self._download_files(files= to_download)
+        new_files= [records[f["id"]] for f in to_download if f["id"] in records]
 
-            if f["filetype"] in ["pdf", "docx", "txt", "md"]:
-                url= f["url_private_download"]
-                fname= f["name"]
-                output_path= os.path.join(self.file_dir, fname)
-                
-                headers = {
-                    "Authorization": f"Bearer {self.config['SLACK']['BOT_USER_OAUTH_TOKEN']}"
-                }
-                
-                content= requests.get(
-                    url= url,
-                    headers= headers
-                ).content
-
-                with open(output_path, "wb") as out:
-                    out.write(content)
-
-                self.manifest["processed_file_ids"].append(file_id)
-                self.manifest["files"][file_id]= {
-                    "name": fname,
-                    "path": output_path,
-                    "timestamp": f.get("timestamp"),
-                    "user": f.get("user"),
-                    "mimetype": f.get("mimetype"),
-                    "filetype": f.get("filetype"),
-                }
-
-                new_files.append(self.manifest["files"][file_id])
-
-        self._save_manifest()
+        self.state.put_files(records= new_files)
         return new_files
 
     def ingest_files_full(self) -> List[Dict]:
         """
-        Re-download ALL files and rebuild manifest.
-        WARNING: expensive. Use only for first-time initialization.
+        Rebuild the file records from ALL files, downloading only those that are
+        missing locally or changed since their last download.
         """
 
-        files= self.client.files_list(count= 200)["files"]
-        manifest_files = {}
+        files= [f for f in self.crawler.list_files() if f["filetype"] in FILE_TYPES]
 
+        records= {}
+        to_download= []
         for f in files:
-            if f["filetype"] in ["pdf", "docx"]:
-                url= f["url_private_download"]
-                fname= f["name"]
-                headers= {"Authorization": f"Bearer {self.config['SLACK']['BOT_USER_OAUTH_TOKEN']}"}
-                content= requests.get(
-                    url= url,
-                    headers= headers
-                ).content
-                output_path= os.path.join(self.file_dir, fname)
-
-                with open(output_path, "wb") as out:
-                    out.write(content)
-
-                manifest_files[f["id"]]={
-                    "name": fname,
-                    "path": output_path,
-                    "timestamp": f.get("timestamp"),
-                    "user": f.get("user"),
-                    "mimetype": f.get("mimetype"),
-                    "filetype": f.get("filetype"),
-                }
-
-        self.manifest["processed_file_ids"]= list(manifest_files.keys())
-        self.manifest["files"]= manifest_files
-        self._save_manifest()
-
-        return list(manifest_files.values())
-
-
+            known= self.state.get_file(file_id= f["id"])
+            if self._is_unchanged(known= known, f= f):
+                # Files get shared to more channels without being edited
+                records[f["id"]]= {**known, "channels": f.get("channels", [])}
+            else:
+                to_download.append(f)
+
+        records.update(self._download_files(files= to_download))
+        all_files= [records[f["id"]] for f in files if f["id"] in records]
+
+        self.state.replace_files(records= all_files)
+        return all_files
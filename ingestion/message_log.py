@@ -0,0 +1,329 @@
+import os, json, mmap, time, zlib, sqlite3, threading
+
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+SCHEMA= """
+CREATE TABLE IF NOT EXISTS messages (
+    channel_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    ts_num REAL NOT NULL,
+    thread_ts TEXT,
+    user TEXT,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    crc INTEGER NOT NULL,
+    PRIMARY KEY (channel_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_time ON messages (channel_id, ts_num);
+CREATE INDEX IF NOT EXISTS messages_thread ON messages (channel_id, thread_ts);
+CREATE INDEX IF NOT EXISTS messages_segment ON messages (segment, offset);
+CREATE TABLE IF NOT EXISTS segments (
+    segment TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    live_bytes INTEGER NOT NULL DEFAULT 0,
+    retired_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+class MessageLog:
+    """
+    Slack messages in append-only JSONL segments, one per channel and month.
+
+    A SQLite index maps (channel, ts) and (channel, thread_ts) to the segment,
+    byte offset and length of each message, and reads slice memory-mapped
+    segments, so a channel range or a thread costs O(result) instead of a scan
+    of the whole history. Re-ingested messages are skipped when unchanged;
+    edited ones are appended again and the old bytes become garbage that the
+    compactor rewrites away.
+    """
+    def __init__(self, root= None, compact_ratio= 0.3, retire_grace= 60, busy_timeout= 30):
+        BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+        self.root= Path(root) if root else BASE_DIR / "../data/messages"
+        os.makedirs(self.root, exist_ok= True)
+
+        self.compact_ratio= compact_ratio # Garbage share that triggers a rewrite
+        self.retire_grace= retire_grace # Seconds a compacted segment stays readable
+        self.busy_timeout= busy_timeout
+
+        self._local= threading.local() # sqlite3 connections are per thread
+        self._stop_event= threading.Event()
+        self._compactor= None
+
+        self.db.executescript(SCHEMA)
+        self._migrate(legacy_path= self.root.parent / "conversation.jsonl")
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        db= getattr(self._local, "db", None)
+        if db is None:
+            db= sqlite3.connect(self.root / "index.db", timeout= self.busy_timeout, isolation_level= None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db= db
+        return db
+
+    def _migrate(self, legacy_path: Path):
+        if self.db.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+            return
+
+        try:
+            with open(legacy_path, "r", encoding= "utf-8") as f:
+                self.append(messages= [json.loads(line) for line in f if line.strip()])
+            os.replace(legacy_path, f"{legacy_path}.migrated")
+        except FileNotFoundError: # Nothing to import, or another process already did
+            pass
+
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('migrated', ?)", (str(time.time()),))
+
+    # ---- writes --------------------------------------------------------------
+    @staticmethod
+    def _period(ts: str) -> str:
+        return datetime.fromtimestamp(float(ts), tz= timezone.utc).strftime("%Y-%m")
+
+    def _active_segment(self, db: sqlite3.Connection, channel_id: str, period: str) -> str:
+        row= db.execute(
+            "SELECT segment FROM segments WHERE channel_id = ? AND period = ? AND retired_at IS NULL",
+            (channel_id, period)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        segment= f"{channel_id}/{period}.g0.jsonl"
+        os.makedirs(self.root / channel_id, exist_ok= True)
+        db.execute(
+            "INSERT INTO segments (segment, channel_id, period, generation) VALUES (?, ?, ?, 0)",
+            (segment, channel_id, period)
+        )
+        return segment
+
+    def append(self, messages: List[Dict]) -> int:
+        """
+        Add or update messages (dicts with channel_id, ts, thread_ts, user, text).
+        Returns how many were written; unchanged messages are skipped.
+        """
+        key= lambda m: (m["channel_id"], self._period(ts= m["ts"]))
+        written= 0
+
+        db= self.db
+        # The write lock also serializes appends to the segment files across processes
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for (channel_id, period), group in groupby(sorted(messages, key= key), key= key):
+                segment= self._active_segment(db= db, channel_id= channel_id, period= period)
+                rows= []
+
+                with open(self.root / segment, "ab") as out:
+                    offset= out.seek(0, os.SEEK_END)
+                    # Last copy wins when a message appears twice in one batch
+                    for m in {m["ts"]: m for m in group}.values():
+                        line= json.dumps(m, ensure_ascii= False).encode("utf-8")+ b"\n"
+                        crc= zlib.crc32(line)
+
+                        old= db.execute(
+                            "SELECT segment, length, crc FROM messages WHERE channel_id = ? AND ts = ?",
+                            (channel_id, m["ts"])
+                        ).fetchone()
+                        if old and old[2]== crc:
+                            continue
+                        if old:
+                            db.execute(
+                                "UPDATE segments SET live_bytes = live_bytes - ? WHERE segment = ?",
+                                (old[1], old[0])
+                            )
+
+                        out.write(line)
+                        rows.append((
+                            channel_id, m["ts"], float(m["ts"]), m.get("thread_ts"), m.get("user"),
+                            segment, offset, len(line), crc
+                        ))
+                        offset+= len(line)
+
+                if rows:
+                    n_bytes= sum(r[7] for r in rows)
+                    db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    db.execute(
+                        "UPDATE segments SET total_bytes = total_bytes + ?, live_bytes = live_bytes + ? WHERE segment = ?",
+                        (n_bytes, n_bytes, segment)
+                    )
+                    written+= len(rows)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+        return written
+
+    # ---- reads ---------------------------------------------------------------
+    def _read(self, rows: List[Tuple[str, int, int]]) -> Iterator[Dict]:
+        """
+        Yield the messages at (segment, offset, length), in the order given.
+        """
+        for segment, group in groupby(rows, key= lambda r: r[0]):
+            with open(self.root / segment, "rb") as f, \
+                 mmap.mmap(f.fileno(), 0, access= mmap.ACCESS_READ) as mm:
+                for _, offset, length in group:
+                    yield json.loads(mm[offset:offset+ length])
+
+    def range(self, channel_id: str, since: str= None, until: str= None, limit: int= None, descending= False) -> List[Dict]:
+        """
+        Messages of a channel with since < ts <= until, oldest first (or newest
+        first with `descending`, e.g. to page backwards from `until`).
+        """
+        rows= self.db.execute(
+            "SELECT segment, offset, length FROM messages "
+            "WHERE channel_id = ? AND ts_num > ? AND ts_num <= ? "
+            f"ORDER BY ts_num {'DESC' if descending else 'ASC'} LIMIT ?",
+            (
+                channel_id,
+                float(since) if since else float("-inf"),
+                float(until) if until else float("inf"),
+                limit if limit else -1
+            )
+        ).fetchall()
+        return list(self._read(rows= rows))
+
+    def thread(self, channel_id: str, thread_ts: str) -> List[Dict]:
+        """
+        The parent message and every reply of a thread, oldest first.
+        """
+        rows= self.db.execute(
+            "SELECT segment, offset, length FROM messages "
+            "WHERE channel_id = ? AND (thread_ts = ? OR ts = ?) ORDER BY ts_num",
+            (channel_id, thread_ts, thread_ts)
+        ).fetchall()
+        return list(self._read(rows= rows))
+
+    def thread_roots(self, channel_id: str) -> set:
+        """
+        ts of every message in the channel that has replies.
+        """
+        return {t for t, in self.db.execute(
+            "SELECT DISTINCT thread_ts FROM messages WHERE channel_id = ? AND thread_ts IS NOT NULL", (channel_id,)
+        ).fetchall()}
+
+    def scan(self, channel_id: str= None) -> Iterator[Dict]:
+        """
+        Every live message, read segment by segment in file order.
+        """
+        if channel_id is None:
+            cursor= self.db.execute("SELECT segment, offset, length FROM messages ORDER BY segment, offset")
+        else:
+            cursor= self.db.execute(
+                "SELECT segment, offset, length FROM messages WHERE channel_id = ? ORDER BY segment, offset",
+                (channel_id,)
+            )
+        yield from self._read(rows= cursor.fetchall())
+
+    def channels(self) -> List[str]:
+        return [c for c, in self.db.execute("SELECT DISTINCT channel_id FROM segments").fetchall()]
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    # ---- compaction ----------------------------------------------------------
+    def compact_segment(self, segment: str) -> int:
+        """
+        Rewrite a segment with only its live messages, in ts order, as the next
+        generation. Returns the bytes reclaimed.
+        """
+        db= self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            info= db.execute(
+                "SELECT channel_id, period, generation, total_bytes, live_bytes FROM segments "
+                "WHERE segment = ? AND retired_at IS NULL",
+                (segment,)
+            ).fetchone()
+            if info is None:
+                db.execute("ROLLBACK")
+                return 0
+
+            channel_id, period, generation, total_bytes, live_bytes= info
+            rows= db.execute(
+                "SELECT ts, offset, length FROM messages WHERE segment = ? ORDER BY ts_num",
+                (segment,)
+            ).fetchall()
+
+            new_segment= f"{channel_id}/{period}.g{generation+ 1}.jsonl"
+            updates= []
+            offset= 0
+            with open(self.root / segment, "rb") as src, \
+                 open(self.root / new_segment, "wb") as out:
+                mm= mmap.mmap(src.fileno(), 0, access= mmap.ACCESS_READ) if total_bytes else None
+                for ts, old_offset, length in rows:
+                    out.write(mm[old_offset:old_offset+ length])
+                    updates.append((new_segment, offset, channel_id, ts))
+                    offset+= length
+                if mm is not None:
+                    mm.close()
+                out.flush()
+                os.fsync(out.fileno())
+
+            db.executemany("UPDATE messages SET segment = ?, offset = ? WHERE channel_id = ? AND ts = ?", updates)
+            db.execute("UPDATE segments SET retired_at = ? WHERE segment = ?", (time.time(), segment))
+            db.execute(
+                "INSERT INTO segments VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (new_segment, channel_id, period, generation+ 1, offset, offset)
+            )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+        return total_bytes- offset
+
+    def _drop_retired(self):
+        # Readers that looked up offsets just before a compaction still find the
+        # old generation on disk for `retire_grace` seconds
+        cutoff= time.time()- self.retire_grace
+        for segment, in self.db.execute(
+            "SELECT segment FROM segments WHERE retired_at IS NOT NULL AND retired_at < ?", (cutoff,)
+        ).fetchall():
+            try:
+                os.remove(self.root / segment)
+            except FileNotFoundError:
+                pass
+            self.db.execute("DELETE FROM segments WHERE segment = ?", (segment,))
+
+    def compact(self) -> int:
+        """
+        Compact every segment whose garbage share exceeds `compact_ratio`.
+        """
+        candidates= self.db.execute(
+            "SELECT segment FROM segments "
+            "WHERE retired_at IS NULL AND total_bytes > 0 AND live_bytes < total_bytes * (1 - ?)",
+            (self.compact_ratio,)
+        ).fetchall()
+
+        reclaimed= sum(self.compact_segment(segment= s) for s, in candidates)
+        self._drop_retired()
+        return reclaimed
+
+    def start_compactor(self, interval= 600):
+        if self._compactor and self._compactor.is_alive():
+            return
+
+        def _run():
+            while not self._stop_event.wait(timeout= interval):
+                try:
+                    reclaimed= self.compact()
+                    if reclaimed:
+                        print(f"[MessageLog] Compaction reclaimed {reclaimed} bytes")
+                except Exception as e:
+                    print(f"[MessageLog] Compaction error: {e}")
+
+        self._stop_event.clear()
+        self._compactor= threading.Thread(target= _run, name= "message-log-compactor", daemon= True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        self._stop_event.set()
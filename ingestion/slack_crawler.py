@@ -0,0 +1,210 @@
+import time, threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+# Requests per minute of the Slack Web API tiers
+TIER_RATES= {
+    "tier2": 20,
+    "tier3": 50,
+    "tier4": 100
+}
+
+METHOD_TIERS= {
+    "conversations_list": "tier2",
+    "conversations_history": "tier3",
+    "conversations_replies": "tier3",
+    "files_list": "tier3"
+}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`.
+    """
+    def __init__(self, rate: float, capacity: float= None):
+        self.rate= rate
+        self.capacity= capacity or max(1.0, rate)
+        self.tokens= self.capacity
+        self.updated= time.monotonic()
+        self.blocked_until= 0.0
+        self._lock= threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now= time.monotonic()
+                self.tokens= min(self.capacity, self.tokens+ (now- self.updated)* self.rate)
+                self.updated= now
+
+                if now>= self.blocked_until and self.tokens>= 1:
+                    self.tokens-= 1
+                    return
+
+                wait= max(self.blocked_until- now, (1- self.tokens)/ self.rate)
+
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Stop handing out tokens for `seconds` (Slack's Retry-After) and drop the burst.
+        """
+        with self._lock:
+            self.blocked_until= max(self.blocked_until, time.monotonic()+ seconds)
+            self.tokens= 0.0
+
+class SlackCrawler:
+    """
+    Cursor-paginated, concurrent Slack crawler.
+
+    Every listing call follows `response_metadata.next_cursor` to the end.
+    Channels, and the thread replies inside them, are fetched on a thread pool
+    while one token bucket per API method keeps its request rate under the
+    limit of the method's Slack tier; a 429 pauses the method for Retry-After.
+
+    History from a high-water mark only returns new parents, so the known
+    thread roots are passed in as well: those with a reply in the last
+    `thread_active_days` are asked for their replies newer than the mark.
+    """
+    def __init__(self, client: WebClient, max_workers= 8, page_limit= 200, max_retries= 5, tier_rates: Dict= None,
+                 thread_active_days= 30):
+        self.client= client
+        self.max_workers= max_workers
+        self.page_limit= page_limit
+        self.max_retries= max_retries
+        self.thread_active_days= thread_active_days
+
+        self.tier_rates= {**TIER_RATES, **(tier_rates or {})}
+        self.buckets= {}
+        self._lock= threading.Lock()
+
+    def _bucket(self, method: str) -> TokenBucket:
+        # Slack applies its limits per method and workspace
+        with self._lock:
+            if method not in self.buckets:
+                per_min= self.tier_rates[METHOD_TIERS.get(method, "tier3")]
+                self.buckets[method]= TokenBucket(rate= per_min/ 60.0, capacity= max(1.0, per_min/ 10.0))
+            return self.buckets[method]
+
+    def _call(self, method: str, **kwargs) -> Dict:
+        bucket= self._bucket(method= method)
+
+        for attempt in range(self.max_retries+ 1):
+            bucket.acquire()
+            try:
+                return getattr(self.client, method)(**kwargs)
+            except SlackApiError as e:
+                if e.response.status_code!= 429 or attempt== self.max_retries:
+                    raise
+
+                retry_after= float(e.response.headers.get("Retry-After", 1))
+                print(f"Slack rate limited on {method}, retrying in {retry_after:.0f}s")
+                bucket.pause(seconds= retry_after)
+
+    def _paginate(self, method: str, key: str, **kwargs) -> Iterator[Dict]:
+        cursor= None
+        page= 1
+        while True:
+            params= dict(kwargs, limit= self.page_limit)
+            if cursor:
+                params["cursor"]= cursor
+            if method== "files_list":
+                # files.list still pages by number on many workspaces
+                params["page"]= page
+                params["count"]= self.page_limit
+
+            response= self._call(method, **params)
+            yield from response.get(key) or []
+
+            cursor= (response.get("response_metadata") or {}).get("next_cursor")
+            if cursor:
+                continue
+
+            paging= response.get("paging") or {}
+            if method== "files_list" and page< paging.get("pages", 0):
+                page+= 1
+                continue
+
+            return
+
+    def list_channels(self, types= "private_channel") -> List[Dict]:
+        return list(self._paginate("conversations_list", key= "channels", types= types, exclude_archived= True))
+
+    def list_files(self, **kwargs) -> List[Dict]:
+        files= {}
+        for f in self._paginate("files_list", key= "files", **kwargs):
+            files[f["id"]]= f # Page and cursor pagination can overlap on concurrent uploads
+        return list(files.values())
+
+    def iter_history(self, channel: str, oldest: str= "0") -> Iterator[Dict]:
+        yield from self._paginate("conversations_history", key= "messages", channel= channel, oldest= oldest)
+
+    def iter_replies(self, channel: str, thread_ts: str, oldest: str= "0") -> Iterator[Dict]:
+        for msg in self._paginate("conversations_replies", key= "messages", channel= channel, ts= thread_ts, oldest= oldest):
+            if msg.get("ts")!= thread_ts: # The parent is returned with every page of replies
+                yield msg
+
+    def crawl_channel(self, channel: Dict, oldest: str= "0", pool: ThreadPoolExecutor= None,
+                      known_threads: Dict[str, str]= None) -> Tuple[List[Tuple[Dict, Dict]], Dict[str, str]]:
+        """
+        All (channel, message) pairs newer than `oldest`, thread replies included,
+        also those in the still active `known_threads` (root ts -> latest reply ts).
+        Returns the pairs and the roots seen, with their latest reply ts.
+        """
+        messages= list(self.iter_history(channel= channel["id"], oldest= oldest))
+        roots= {m["ts"]: m.get("latest_reply", m["ts"]) for m in messages if m.get("reply_count")}
+
+        active_since= time.time()- self.thread_active_days* 86400
+        for ts, latest_reply in (known_threads or {}).items():
+            if ts not in roots and float(latest_reply)>= active_since:
+                roots[ts]= latest_reply
+
+        if roots:
+            fetch= lambda ts: list(self.iter_replies(channel= channel["id"], thread_ts= ts, oldest= oldest))
+            threads= list(roots)
+            replies= pool.map(fetch, threads) if pool else map(fetch, threads)
+
+            seen= {m["ts"] for m in messages} # Replies also sent to the channel show up twice
+            for ts, batch in zip(threads, replies):
+                for m in batch:
+                    roots[ts]= max(roots[ts], m["ts"], key= float)
+                    if m["ts"] not in seen:
+                        seen.add(m["ts"])
+                        messages.append(m)
+
+        return [(channel, m) for m in messages], roots
+
+    def crawl(self, channels: List[Dict], high_water: Dict[str, str]= None, default_oldest= "0",
+              threads: Dict[str, Dict[str, str]]= None) -> Tuple[List[Tuple[Dict, Dict]], Dict[str, str], Dict[str, Dict[str, str]]]:
+        """
+        Crawl `channels` concurrently, each from its own high-water mark, with
+        the known thread roots of each channel (see `crawl_channel`).
+        Returns the (channel, message) pairs, the updated high-water marks and
+        the thread roots seen per channel.
+        """
+        high_water= dict(high_water or {})
+        threads= threads or {}
+        roots= {}
+
+        # Channels and replies use separate pools so a channel task waiting on
+        # its replies can never starve them of workers
+        with ThreadPoolExecutor(max_workers= self.max_workers) as channel_pool, \
+             ThreadPoolExecutor(max_workers= self.max_workers) as reply_pool:
+            futures= {
+                ch["id"]: channel_pool.submit(
+                    self.crawl_channel, ch, high_water.get(ch["id"], default_oldest), reply_pool, threads.get(ch["id"])
+                )
+                for ch in channels
+            }
+
+            results= []
+            for channel_id, future in futures.items():
+                pairs, roots[channel_id]= future.result()
+                results.extend(pairs)
+
+                latest= max((m["ts"] for _, m in pairs), key= float, default= None)
+                if latest is not None and float(latest)> float(high_water.get(channel_id, default_oldest)):
+                    high_water[channel_id]= latest
+
+        return results, high_water, roots
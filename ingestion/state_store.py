@@ -0,0 +1,341 @@
+import os, json, time, sqlite3, threading
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+SCHEMA= """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS channels (channel_id TEXT PRIMARY KEY, last_ts TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS threads (
+    channel_id TEXT NOT NULL,
+    thread_ts TEXT NOT NULL,
+    latest_reply TEXT NOT NULL,
+    PRIMARY KEY (channel_id, thread_ts)
+);
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    path TEXT,
+    updated INTEGER,
+    size INTEGER,
+    sha256 TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE TABLE IF NOT EXISTS sources (
+    source_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    path TEXT,
+    kind TEXT NOT NULL DEFAULT 'file'
+);
+CREATE INDEX IF NOT EXISTS sources_path ON sources (path);
+CREATE TABLE IF NOT EXISTS chunks (
+    source_id TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (source_id, chunk_hash)
+);
+CREATE TABLE IF NOT EXISTS digests (
+    channel_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    last_ts TEXT NOT NULL,
+    files TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    n_messages INTEGER,
+    n_files INTEGER,
+    error TEXT
+);
+"""
+
+class StateStore:
+    """
+    Ingestion state in SQLite (WAL): message high-water marks, thread roots, file records,
+    per-source chunk hashes, per-channel KB digests and ingestion runs.
+
+    Every update is a small transaction on indexed rows instead of a rewrite
+    of the whole manifest, and WAL lets the bot and a batch orchestrator read
+    and write the same database concurrently. The legacy `manifest.json` and
+    `sync_state.json` are imported on first use.
+    """
+    def __init__(self, path= None, busy_timeout= 30):
+        BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+        self.path= Path(path) if path else BASE_DIR / "../data/state.db"
+        self.busy_timeout= busy_timeout
+        self._local= threading.local() # sqlite3 connections are per thread
+
+        self.db.executescript(SCHEMA)
+        self._upgrade()
+
+        self._migrate(
+            manifest_path= self.path.parent / "manifest.json",
+            sync_state_path= self.path.parent / "sync_state.json"
+        )
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        db= getattr(self._local, "db", None)
+        if db is None:
+            db= sqlite3.connect(self.path, timeout= self.busy_timeout, isolation_level= None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db= db
+        return db
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        wait (busy_timeout) instead of failing half-way.
+        """
+        db= self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # ---- migration ---------------------------------------------------------
+    def _upgrade(self):
+        columns= [c[1] for c in self.db.execute("PRAGMA table_info(sources)").fetchall()]
+        if "kind" not in columns:
+            self.db.execute("ALTER TABLE sources ADD COLUMN kind TEXT NOT NULL DEFAULT 'file'")
+
+    def _migrate(self, manifest_path: Path, sync_state_path: Path):
+        with self.transaction() as db:
+            if db.execute("SELECT 1 FROM kv WHERE key = 'migrated'").fetchone():
+                return
+
+            if os.path.exists(manifest_path):
+                with open(manifest_path, "r", encoding= "utf-8") as f:
+                    manifest= json.load(f)
+
+                db.execute(
+                    "INSERT OR REPLACE INTO kv VALUES ('last_message_ts', ?)",
+                    (manifest.get("last_message_ts", "0"),)
+                )
+                db.executemany(
+                    "INSERT OR REPLACE INTO channels VALUES (?, ?)",
+                    list(manifest.get("channel_ts", {}).items())
+                )
+                for file_id, record in manifest.get("files", {}).items():
+                    self._put_file(db= db, record= {"id": file_id, **record})
+
+            if os.path.exists(sync_state_path):
+                with open(sync_state_path, "r", encoding= "utf-8") as f:
+                    for source_id, record in json.load(f).items():
+                        self._put_source(
+                            db= db,
+                            source_id= source_id,
+                            content_hash= record["content_hash"],
+                            path= record.get("path"),
+                            chunks= record["chunks"]
+                        )
+
+            db.execute("INSERT INTO kv VALUES ('migrated', ?)", (str(time.time()),))
+
+        # Keep the old files around, renamed so nothing reads them by mistake
+        for legacy in (manifest_path, sync_state_path):
+            if os.path.exists(legacy):
+                os.replace(legacy, f"{legacy}.migrated")
+
+    # ---- messages ----------------------------------------------------------
+    def last_message_ts(self) -> str:
+        row= self.db.execute("SELECT value FROM kv WHERE key = 'last_message_ts'").fetchone()
+        return row[0] if row else "0"
+
+    def channel_marks(self) -> Dict[str, str]:
+        return dict(self.db.execute("SELECT channel_id, last_ts FROM channels").fetchall())
+
+    def update_channel_marks(self, marks: Dict[str, str]):
+        """
+        Raise per-channel high-water marks (never lowers them) and the global one.
+        """
+        if not marks:
+            return
+
+        with self.transaction() as db:
+            for channel_id, ts in marks.items():
+                db.execute(
+                    "INSERT INTO channels VALUES (?, ?) "
+                    "ON CONFLICT (channel_id) DO UPDATE SET last_ts = excluded.last_ts "
+                    "WHERE CAST(excluded.last_ts AS REAL) > CAST(channels.last_ts AS REAL)",
+                    (channel_id, ts)
+                )
+
+            latest= max(marks.values(), key= float)
+            db.execute(
+                "INSERT INTO kv VALUES ('last_message_ts', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value "
+                "WHERE CAST(excluded.value AS REAL) > CAST(kv.value AS REAL)",
+                (latest,)
+            )
+
+    def threads(self) -> Dict[str, Dict[str, str]]:
+        """
+        Known thread roots: channel id -> {root ts: latest reply ts}.
+        """
+        threads= {}
+        for channel_id, thread_ts, latest_reply in self.db.execute("SELECT channel_id, thread_ts, latest_reply FROM threads"):
+            threads.setdefault(channel_id, {})[thread_ts]= latest_reply
+        return threads
+
+    def update_threads(self, threads: Dict[str, Dict[str, str]]):
+        """
+        Add thread roots and raise their latest reply ts (never lowers it).
+        """
+        with self.transaction() as db:
+            db.executemany(
+                "INSERT INTO threads VALUES (?, ?, ?) "
+                "ON CONFLICT (channel_id, thread_ts) DO UPDATE SET latest_reply = excluded.latest_reply "
+                "WHERE CAST(excluded.latest_reply AS REAL) > CAST(threads.latest_reply AS REAL)",
+                [(channel_id, ts, latest_reply) for channel_id, roots in threads.items() for ts, latest_reply in roots.items()]
+            )
+
+    # ---- files -------------------------------------------------------------
+    @staticmethod
+    def _put_file(db: sqlite3.Connection, record: Dict):
+        db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                record["id"],
+                record.get("path"),
+                record.get("updated"),
+                record.get("size"),
+                record.get("sha256"),
+                json.dumps(record, ensure_ascii= False)
+            )
+        )
+
+    def get_file(self, file_id: str) -> Optional[Dict]:
+        row= self.db.execute("SELECT record FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def files(self) -> List[Dict]:
+        return [json.loads(r) for r, in self.db.execute("SELECT record FROM files").fetchall()]
+
+    def put_files(self, records: List[Dict]):
+        with self.transaction() as db:
+            for record in records:
+                self._put_file(db= db, record= record)
+
+    def delete_files(self, file_ids: List[str]):
+        with self.transaction() as db:
+            db.executemany("DELETE FROM files WHERE file_id = ?", [(file_id,) for file_id in file_ids])
+
+    def replace_files(self, records: List[Dict]):
+        """
+        Make `records` the complete set of known files, in one transaction.
+        """
+        with self.transaction() as db:
+            db.execute("DELETE FROM files")
+            for record in records:
+                self._put_file(db= db, record= record)
+
+    # ---- sync sources and chunks --------------------------------------------
+    @staticmethod
+    def _put_source(db: sqlite3.Connection, source_id: str, content_hash: str, path: str, chunks: Dict[str, str],
+                    kind: str= "file"):
+        db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)", (source_id, content_hash, path, kind))
+        db.execute("DELETE FROM chunks WHERE source_id = ?", (source_id,))
+        db.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?)",
+            [(source_id, h, doc_id) for h, doc_id in chunks.items()]
+        )
+
+    def get_source(self, source_id: str) -> Optional[Dict]:
+        row= self.db.execute(
+            "SELECT content_hash, path FROM sources WHERE source_id = ?", (source_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {"content_hash": row[0], "path": row[1], "chunks": self.source_chunks(source_id= source_id)}
+
+    def source_chunks(self, source_id: str) -> Dict[str, str]:
+        return dict(self.db.execute(
+            "SELECT chunk_hash, doc_id FROM chunks WHERE source_id = ?", (source_id,)
+        ).fetchall())
+
+    def source_ids(self, path: str= None, kind: str= None) -> List[str]:
+        query, params= "SELECT source_id FROM sources WHERE 1 = 1", []
+        if path is not None:
+            query+= " AND path = ?"
+            params.append(path)
+        if kind is not None:
+            query+= " AND kind = ?"
+            params.append(kind)
+        return [r for r, in self.db.execute(query, params).fetchall()]
+
+    def put_source(self, source_id: str, content_hash: str, path: str, chunks: Dict[str, str], kind: str= "file"):
+        with self.transaction() as db:
+            self._put_source(db= db, source_id= source_id, content_hash= content_hash, path= path, chunks= chunks, kind= kind)
+
+    def delete_sources(self, source_ids: List[str]):
+        with self.transaction() as db:
+            for source_id in source_ids:
+                db.execute("DELETE FROM sources WHERE source_id = ?", (source_id,))
+                db.execute("DELETE FROM chunks WHERE source_id = ?", (source_id,))
+
+    # ---- knowledge base digests --------------------------------------------
+    def get_digest(self, channel_id: str) -> Optional[Dict]:
+        """
+        The channel's KB digest: summary, ts of the last summarized message and
+        the sha256 of every summarized file by file id.
+        """
+        row= self.db.execute(
+            "SELECT summary, last_ts, files, updated_at FROM digests WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {"summary": row[0], "last_ts": row[1], "files": json.loads(row[2]), "updated_at": row[3]}
+
+    def put_digest(self, channel_id: str, summary: str, last_ts: str, files: Dict[str, str]):
+        with self.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)",
+                (channel_id, summary, last_ts, json.dumps(files), time.time())
+            )
+
+    # ---- ingestion runs ----------------------------------------------------
+    def start_run(self, kind: str) -> int:
+        with self.transaction() as db:
+            return db.execute(
+                "INSERT INTO runs (kind, started_at) VALUES (?, ?)", (kind, time.time())
+            ).lastrowid
+
+    def finish_run(self, run_id: int, n_messages: int= None, n_files: int= None, error: str= None):
+        with self.transaction() as db:
+            db.execute(
+                "UPDATE runs SET finished_at = ?, n_messages = ?, n_files = ?, error = ? WHERE run_id = ?",
+                (time.time(), n_messages, n_files, error, run_id)
+            )
+
+    @contextmanager
+    def run(self, kind: str) -> Iterator[Dict]:
+        """
+        Record an ingestion run; fill the yielded dict with n_messages / n_files.
+        """
+        run_id= self.start_run(kind= kind)
+        result= {}
+        try:
+            yield result
+        except Exception as e:
+            self.finish_run(run_id= run_id, error= str(e))
+            raise
+
+        self.finish_run(run_id= run_id, n_messages= result.get("n_messages"), n_files= result.get("n_files"))
+
+    def last_runs(self, limit= 10) -> List[Dict]:
+        cursor= self.db.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+        columns= [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,186 @@
+import numpy as np
+
+from typing import Dict, List, Tuple
+
+class ContextPacker:
+    """
+    Builds the RAG context from search hits under a token budget.
+
+    1. Hits scoring below `min_score` are dropped.
+    2. Hits from the same source (file path or conversation) that overlap,
+       i.e. one contains the other or one ends with the other's first words
+       (the chunker's sentence overlap), are merged into one passage.
+    3. Passages are picked by MMR (relevance vs. similarity to the passages
+       already picked) while they fit in `token_budget` tokens.
+    """
+    def __init__(self, tokenizer, token_budget= 2048, max_passages= 8, mmr_lambda= 0.7, min_score= 0.2,
+                 min_overlap_words= 8, separator= "\n\n"):
+        self.tokenizer= tokenizer
+        self.token_budget= token_budget
+        self.max_passages= max_passages
+        self.mmr_lambda= mmr_lambda
+        self.min_score= min_score
+        self.min_overlap_words= min_overlap_words
+        self.separator= separator
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+
+        encoded= self.tokenizer(
+            texts,
+            add_special_tokens= False,
+            return_attention_mask= False,
+            return_token_type_ids= False
+        )["input_ids"]
+
+        return [len(ids) for ids in encoded]
+
+    @staticmethod
+    def _source(payload: Dict) -> str:
+        return payload.get("path") or payload.get("conversation") or payload.get("name") or ""
+
+    def _join_overlap(self, a: List[str], b: List[str]) -> List[str]:
+        """
+        `a` followed by `b` without the words `a` ends with and `b` starts with,
+        or None if they share fewer than `min_overlap_words`.
+        """
+        if not b:
+            return None
+
+        first= b[0]
+        for i in range(max(0, len(a)- len(b)), len(a)):
+            k= len(a)- i
+            if k< self.min_overlap_words:
+                break
+            if a[i]== first and a[i:]== b[:k]:
+                return a+ b[k:]
+
+        return None
+
+    def _merge(self, a: Dict, b: Dict) -> Dict:
+        """
+        One passage covering both `a` and `b`, or None if they do not overlap.
+        """
+        if b["text"] in a["text"]:
+            text= a["text"]
+        elif a["text"] in b["text"]:
+            text= b["text"]
+        else:
+            wa, wb= a["text"].split(), b["text"].split()
+            words= self._join_overlap(a= wa, b= wb) or self._join_overlap(a= wb, b= wa)
+            if words is None:
+                return None
+            text= " ".join(words)
+
+        vector= a["vector"]+ b["vector"]
+        return {
+            "text": text,
+            "score": max(a["score"], b["score"]),
+            "vector": vector/ max(np.linalg.norm(vector), 1e-12),
+            "source": a["source"],
+            "n_hits": a["n_hits"]+ b["n_hits"]
+        }
+
+    def _merge_overlaps(self, passages: List[Dict]) -> List[Dict]:
+        by_source= {}
+        for p in passages:
+            by_source.setdefault(p["source"], []).append(p)
+
+        merged= []
+        for group in by_source.values():
+            result= []
+            for p in group:
+                # Keep folding until p overlaps none of the passages kept so far
+                i= 0
+                while i< len(result):
+                    joined= self._merge(a= result[i], b= p)
+                    if joined is None:
+                        i+= 1
+                    else:
+                        p= joined
+                        result.pop(i)
+                        i= 0
+                result.append(p)
+            merged.extend(result)
+
+        return sorted(merged, key= lambda p: -p["score"])
+
+    def _mmr(self, passages: List[Dict], query_vec: np.ndarray, tokens: List[int]) -> List[int]:
+        """
+        Indices of the passages picked by MMR within the token budget, in pick order.
+        """
+        vectors= np.stack([p["vector"] for p in passages])
+        relevance= vectors@ query_vec
+        similarity= vectors@ vectors.T
+        separator_tokens= self.count_tokens(texts= [self.separator])[0]
+
+        picked= []
+        used= 0
+        candidates= list(range(len(passages)))
+        while candidates and len(picked)< self.max_passages:
+            redundancy= similarity[np.ix_(candidates, picked)].max(axis= 1) if picked else np.zeros(len(candidates))
+            mmr= self.mmr_lambda* relevance[candidates]- (1- self.mmr_lambda)* redundancy
+
+            # Best passage by MMR that still fits; the ones that don't never will
+            fits= False
+            for j in np.argsort(-mmr):
+                i= candidates[j]
+                cost= tokens[i]+ (separator_tokens if picked else 0)
+                if used+ cost<= self.token_budget:
+                    fits= True
+                    break
+            if not fits:
+                break
+
+            candidates= [c for c in candidates if c!= i and used+ cost+ separator_tokens+ tokens[c]<= self.token_budget]
+            picked.append(i)
+            used+= cost
+
+        return picked
+
+    def pack(self, hits: List, query_vec, baseline_k= 5) -> Tuple[str, Dict]:
+        """
+        Context text for the prompt and a report, given hits (with `.score`,
+        `.payload` and `.vector`) ordered best first. Hits without vectors are
+        only merged and budgeted, in score order.
+
+        `tokens_saved` is measured against joining the top `baseline_k` hits as is.
+        """
+        query_vec= np.asarray(query_vec, dtype= np.float32)
+        query_vec= query_vec/ max(np.linalg.norm(query_vec), 1e-12)
+
+        passages= []
+        for hit in hits:
+            if hit.score< self.min_score or not hit.payload.get("text"):
+                continue
+
+            vector= np.asarray(hit.vector if hit.vector is not None else query_vec* hit.score, dtype= np.float32)
+            passages.append({
+                "text": hit.payload["text"],
+                "score": hit.score,
+                "vector": vector/ max(np.linalg.norm(vector), 1e-12),
+                "source": self._source(payload= hit.payload),
+                "n_hits": 1
+            })
+
+        n_kept= len(passages)
+        passages= self._merge_overlaps(passages= passages)
+        tokens= self.count_tokens(texts= [p["text"] for p in passages])
+        picked= self._mmr(passages= passages, query_vec= query_vec, tokens= tokens) if passages else []
+
+        context= self.separator.join(passages[i]["text"] for i in picked)
+        baseline= self.separator.join(hit.payload.get("text", "") for hit in hits[:baseline_k])
+        baseline_tokens, context_tokens= self.count_tokens(texts= [baseline, context])
+
+        report= {
+            "hits": len(hits),
+            "below_score": len(hits)- n_kept,
+            "merged": n_kept- len(passages),
+            "passages": len(picked),
+            "tokens": context_tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": baseline_tokens- context_tokens
+        }
+
+        return context, report
@@ -0,0 +1,116 @@
+import queue, threading, time
+
+from datetime import datetime
+
+class IngestionWorker:
+    """
+    Background ingestion service.
+
+    Runs `Orchestrator.run_incremental()` on its own thread, either when Slack
+    events (file_shared / message.*) are submitted or on a fixed schedule, so the
+    mention handler only has to read the index.
+    """
+    def __init__(self, orchestrator, interval= 300, debounce= 5):
+        self.orchestrator= orchestrator
+        self.interval= interval # Seconds between scheduled runs
+        self.debounce= debounce # Seconds to coalesce bursts of events
+
+        self.events= queue.Queue()
+        self._stop_event= threading.Event()
+        self._thread= None
+
+        self.last_run_at= None
+        self.last_result= (0, 0)
+        self.last_error= None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread= threading.Thread(
+            target= self._run,
+            name= "ingestion-worker",
+            daemon= True
+        )
+        self._thread.start()
+
+        # Catch up with anything that happened while the bot was offline
+        self.submit(event= {"type": "startup"})
+
+    def stop(self, timeout= None):
+        self._stop_event.set()
+        self.events.put(None)
+
+        if self._thread:
+            self._thread.join(timeout= timeout)
+
+    def submit(self, event: dict):
+        """
+        Queue a Slack event (or any trigger) for ingestion. Never blocks.
+        """
+        self.events.put(event)
+
+    def _drain(self):
+        """
+        Wait `debounce` seconds for more events so a burst triggers one run.
+        """
+        deadline= time.monotonic()+ self.debounce
+        while True:
+            remaining= deadline- time.monotonic()
+            if remaining<= 0:
+                return
+
+            try:
+                if self.events.get(timeout= remaining) is None:
+                    return
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                event= self.events.get(timeout= self.interval)
+                reason= event.get("type", "event") if event else "stop"
+            except queue.Empty:
+                reason= "schedule"
+
+            if self._stop_event.is_set():
+                break
+
+            if reason!= "schedule":
+                self._drain()
+
+            self._ingest(reason= reason)
+
+    def _ingest(self, reason: str):
+        try:
+            new_message_count, new_file_count= self.orchestrator.run_incremental()
+
+            self.last_result= (new_message_count, new_file_count)
+            self.last_error= None
+            print(f"[Ingestion:{reason}] {new_message_count} messages, {new_file_count} files.")
+        except Exception as e:
+            self.last_error= str(e)
+            print(f"[Ingestion:{reason}] Error: {e}")
+        finally:
+            self.last_run_at= time.time()
+
+    def last_ingested_ts(self) -> str:
+        return self.orchestrator.ingestor.state.last_message_ts()
+
+    def freshness(self) -> str:
+        """
+        Human readable freshness of the index (last ingested message ts).
+        """
+        last_ts= float(self.last_ingested_ts())
+        if last_ts<= 0:
+            return "Index not built yet."
+
+        as_of= datetime.fromtimestamp(last_ts).strftime("%Y-%m-%d %H:%M:%S")
+        status= f"Index fresh as of {as_of}."
+
+        if self.last_error:
+            status+= f" Last ingestion failed: {self.last_error}"
+
+        return status
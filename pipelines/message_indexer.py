@@ -0,0 +1,203 @@
+import time, hashlib
+import numpy as np
+
+from typing import Callable, Dict, List
+from process.message_windower import MessageWindower
+from process.telemetry import telemetry
+
+class MessageIndexer:
+    """
+    Indexes Slack conversations as token-bounded windows instead of one point
+    per message.
+
+    Conversations (threads and time-gap sessions) are read from the message
+    log, windowed, and synced through a `SyncEngine`: a conversation whose
+    windows did not change is skipped, and of a changed one only the new
+    windows are embedded (in batches) and upserted.
+    """
+    def __init__(self, message_log, windower: MessageWindower, embedder, store, sync, batch_size= 64,
+                 page_size= 200, on_upsert: Callable= None):
+        self.message_log= message_log
+        self.windower= windower
+        self.embedder= embedder
+        self.store= store
+        self.sync= sync
+        self.batch_size= batch_size
+        self.page_size= page_size # Messages per page when looking back for a session start
+        self.on_upsert= on_upsert
+
+    # ---- loading conversations -------------------------------------------------
+    def _session_start(self, channel_id: str, ts: str, thread_roots: set) -> str:
+        """
+        ts of the last top-level message before the session containing `ts`
+        (the exclusive lower bound to load it from), or None for the channel start.
+        """
+        previous= float(ts)
+        until= ts
+        while True:
+            page= self.message_log.range(channel_id= channel_id, until= until, limit= self.page_size, descending= True)
+            for m in page:
+                if m["ts"]== until or self.windower.is_thread_message(message= m, thread_roots= thread_roots):
+                    continue
+                if previous- float(m["ts"])> self.windower.gap_seconds:
+                    return m["ts"]
+                previous= float(m["ts"])
+
+            if len(page)< self.page_size:
+                return None
+            until= page[-1]["ts"]
+
+    def _affected(self, new_messages: List[Dict]) -> Dict[str, Dict[str, List[Dict]]]:
+        """
+        The conversations touched by `new_messages`, read whole from the log,
+        by channel.
+        """
+        by_channel= {}
+        for m in new_messages:
+            by_channel.setdefault(m["channel_id"], []).append(m)
+
+        affected= {}
+        for channel_id, messages in by_channel.items():
+            thread_roots= self.message_log.thread_roots(channel_id= channel_id)
+            conversations= {}
+
+            threads= {m.get("thread_ts") or m["ts"] for m in messages if self.windower.is_thread_message(message= m, thread_roots= thread_roots)}
+            for thread_ts in threads:
+                key= self.windower.thread_source_id(channel_id= channel_id, thread_ts= thread_ts)
+                conversations[key]= [
+                    m for m in self.message_log.thread(channel_id= channel_id, thread_ts= thread_ts) if m.get("text")
+                ]
+
+            # New top-level messages, and parents of threads not indexed yet (they
+            # just left their session), re-window every session from there on
+            touched= [m["ts"] for m in messages if not self.windower.is_thread_message(message= m, thread_roots= thread_roots)]
+            touched+= [
+                thread_ts for thread_ts in threads
+                if self.sync.state.get_source(source_id= self.windower.thread_source_id(channel_id= channel_id, thread_ts= thread_ts)) is None
+            ]
+
+            if touched:
+                since= self._session_start(channel_id= channel_id, ts= min(touched, key= float), thread_roots= thread_roots)
+
+                tail= self.message_log.range(channel_id= channel_id, since= since)
+                sessions= {
+                    key: msgs
+                    for key, msgs in self.windower.conversations(messages= tail, thread_roots= thread_roots).items()
+                    if key.startswith(f"msg:{channel_id}:s")
+                }
+                conversations.update(sessions)
+
+                # Sessions from that point whose boundaries moved no longer exist
+                stale= [
+                    sid for sid in self.sync.state.source_ids(kind= self.sync.kind)
+                    if sid.startswith(f"msg:{channel_id}:s") and sid not in sessions
+                    and (since is None or float(sid.rsplit(":s", 1)[1])> float(since))
+                ]
+                self.sync.remove(source_ids= stale)
+
+            affected[channel_id]= conversations
+
+        return affected
+
+    # ---- syncing ---------------------------------------------------------------
+    @staticmethod
+    def _meta(source_id: str, messages: List[Dict], window: Dict) -> Dict:
+        first= messages[0]
+        return {
+            "source": "slack",
+            "conversation": source_id,
+            "channel_id": first["channel_id"],
+            "channel_name": first.get("channel_name"),
+            "thread_ts": source_id.rsplit(":t", 1)[1] if ":t" in source_id else None,
+            "ts_start": window["ts_start"],
+            "ts_end": window["ts_end"],
+            "users": window["users"],
+            "n_messages": window["n_messages"]
+        }
+
+    def _flush(self, docs: List[Dict], stats: Dict):
+        for i in range(0, len(docs), self.batch_size):
+            batch= docs[i:i+ self.batch_size]
+            vectors= self.embedder.encode(texts= [d["text"] for d in batch], keys= [d["hash"] for d in batch])
+            with telemetry.span(stage= "upsert", n_points= len(batch)):
+                self.store.add_documents(embeddings= np.asarray(vectors), docs= batch)
+            telemetry.count(name= "points_upserted", value= len(batch))
+            stats["points"]+= len(batch)
+
+            if self.on_upsert:
+                self.on_upsert(len(batch))
+
+    def _sync(self, conversations: Dict[str, List[Dict]], stats: Dict):
+        docs, ready= [], []
+
+        for source_id, messages in conversations.items():
+            if not messages:
+                continue
+
+            windows= self.windower.windows(messages= messages)
+            content_hash= hashlib.sha256("\n".join(w["id"] for w in windows).encode()).hexdigest()
+
+            plan= self.sync.begin(source_id= source_id, content_hash= content_hash)
+            if plan is None:
+                stats["unchanged"]+= 1
+                continue
+
+            stats["conversations"]+= 1
+            for w in windows:
+                doc_id= self.sync.doc_id(source_id= source_id, chunk_hash= w["id"])
+                if plan.add(chunk_hash= w["id"], doc_id= doc_id):
+                    docs.append({
+                        "id": doc_id,
+                        "hash": w["id"],
+                        "text": w["text"],
+                        "meta": self._meta(source_id= source_id, messages= messages, window= w)
+                    })
+            ready.append(plan)
+
+            # A plan is committed only once all of its new windows are upserted
+            if len(docs)>= self.batch_size:
+                self._flush(docs= docs, stats= stats)
+                for p in ready:
+                    stats["deleted"]+= self.sync.commit(plan= p)
+                docs, ready= [], []
+
+        self._flush(docs= docs, stats= stats)
+        for p in ready:
+            stats["deleted"]+= self.sync.commit(plan= p)
+
+    @staticmethod
+    def _new_stats() -> Dict:
+        return {"conversations": 0, "unchanged": 0, "points": 0, "deleted": 0}
+
+    def index_new(self, new_messages: List[Dict]) -> Dict:
+        """
+        Re-window only the conversations touched by `new_messages`.
+        """
+        started= time.time()
+        stats= self._new_stats()
+        if new_messages:
+            for conversations in self._affected(new_messages= new_messages).values():
+                self._sync(conversations= conversations, stats= stats)
+
+        stats["elapsed"]= time.time()- started
+        return stats
+
+    def index_all(self) -> Dict:
+        """
+        Sync every conversation in the log and drop the ones that are gone.
+        """
+        started= time.time()
+        stats= self._new_stats()
+        active= set()
+
+        for channel_id in self.message_log.channels():
+            conversations= self.windower.conversations(
+                messages= list(self.message_log.scan(channel_id= channel_id)),
+                thread_roots= self.message_log.thread_roots(channel_id= channel_id)
+            )
+            active.update(conversations)
+            self._sync(conversations= conversations, stats= stats)
+
+        stats["deleted"]+= self.sync.prune(active_source_ids= active)
+        stats["elapsed"]= time.time()- started
+        return stats
@@ -1,10 +1,19 @@
-import os, json, configparser, glob
+import configparser
 
 from pathlib import Path
+from typing import Dict
 from ingestion.get_data_fromSlack import Ingestion
 from process.data_chunkning import DataChunker
 from process.embedding import Embedder
-from process.QD_client import QDrantDB
+from process.vector_store import get_vector_store
+from process.extraction import TextExtractor
+from pipelines.stream_pipeline import StreamingIngestPipeline
+from pipelines.sync import SyncEngine
+from pipelines.message_indexer import MessageIndexer
+from process.message_windower import MessageWindower
+from agent.kb_agent import ChannelKBAgent
+from process.telemetry import telemetry
+from openai import OpenAI
 
 class Orchestrator:
     def __init__(self):
@@ -13,142 +22,167 @@ class Orchestrator:
         self.config= configparser.ConfigParser()
         self.config.read(config_path)
 
-        self.messages_path= BASE_DIR / "../data/conversation.jsonl"
         self.file_dir= BASE_DIR / "../data/files"
 
         self.ingestor= Ingestion()
-        self.embedder= Embedder()
-        self.chunker= DataChunker()
-        self.qdrant= QDrantDB(collection= "rag_collection")
+        self.embedder= Embedder(
+            dim= self.config.getint("EMBEDDING", "DIM", fallback= 1024),
+            cache_capacity= self.config.getint("EMBEDDING", "CACHE_CAPACITY", fallback= 200_000),
+            cache_dtype= self.config.get("EMBEDDING", "CACHE_DTYPE", fallback= "float32")
+        )
+        self.chunker= DataChunker(
+            segmenter= self.config.get("CHUNKER", "SEGMENTER", fallback= "fast"),
+            per_section_lang= self.config.getboolean("CHUNKER", "PER_SECTION_LANG", fallback= False)
+        )
+        self.store= get_vector_store(collection= "rag_collection")
+
+        # Called with the number of upserted or deleted points, e.g. to invalidate query caches
+        self.change_listeners= []
+
+        self.extractor= TextExtractor(
+            max_workers= self.config.getint("EXTRACTION", "MAX_WORKERS", fallback= 0) or None,
+            pages_per_task= self.config.getint("EXTRACTION", "PAGES_PER_TASK", fallback= 16),
+            timeout= self.config.getfloat("EXTRACTION", "TIMEOUT", fallback= 300),
+            max_memory_mb= self.config.getint("EXTRACTION", "MAX_MEMORY_MB", fallback= 2048)
+        )
+
+        # Per-file content and chunk hashes, so re-ingestion only touches what changed;
+        # a different embedder (model, task, dimension) re-embeds everything
+        embedder_id= f"{self.embedder.cache_name}/{self.embedder.dim}"
+        self.sync= SyncEngine(store= self.store, state= self.ingestor.state, embedder_id= embedder_id,
+                              on_delete= self._notify_change)
+
+        self.pipeline= StreamingIngestPipeline(
+            chunker= self.chunker,
+            embedder= self.embedder,
+            store= self.store,
+            extractor= self.extractor,
+            embed_batch_size= self.config.getint("PIPELINE", "EMBED_BATCH_SIZE", fallback= 64),
+            upsert_batch_size= self.config.getint("PIPELINE", "UPSERT_BATCH_SIZE", fallback= 256),
+            queue_size= self.config.getint("PIPELINE", "QUEUE_SIZE", fallback= 4),
+            embed_workers= self.config.getint("PIPELINE", "EMBED_WORKERS", fallback= 1),
+            on_upsert= self._notify_change,
+            sync= self.sync
+        )
+
+        # Slack conversations: threads and time-gap sessions as token-bounded windows
+        self.message_indexer= MessageIndexer(
+            message_log= self.ingestor.message_log,
+            windower= MessageWindower(
+                chunker= self.chunker,
+                max_tokens= self.config.getint("MESSAGES", "WINDOW_TOKENS", fallback= 512),
+                overlap_ratio= self.config.getfloat("MESSAGES", "OVERLAP_RATIO", fallback= 0.1),
+                gap_seconds= self.config.getint("MESSAGES", "GAP_MINUTES", fallback= 30)* 60
+            ),
+            embedder= self.embedder,
+            store= self.store,
+            sync= SyncEngine(store= self.store, state= self.ingestor.state, kind= "message", embedder_id= embedder_id,
+                             on_delete= self._notify_change),
+            batch_size= self.config.getint("PIPELINE", "EMBED_BATCH_SIZE", fallback= 64),
+            on_upsert= self._notify_change
+        )
+
+        # Per-channel knowledge base digests
+        self.kb_agent= ChannelKBAgent(
+            slack_client= self.ingestor.client,
+            openai_client= OpenAI(api_key= self.config["AGENT"]["KEY"]),
+            state= self.ingestor.state,
+            extractor= self.extractor
+        )
+
+    def _notify_change(self, n_points: int):
+        for listener in self.change_listeners:
+            try:
+                listener(n_points)
+            except Exception as e:
+                print(f"Error in change listener: {e}")
     
-    def _get_conversation_file(self, file_path):
-        conversations= ""
-        try:
-            with open(file= file_path, mode= "r", encoding= "utf-8") as f:
-                for line in f:
-                    if f"@{self.config['SLACK']['BOT_ID']}" in line["text"] or \
-                        line["user"]== f"{self.config['SLACK']['BOT_ID']}":
-                    
-                        json_object= json.loads(line.strip())
-                        conversations+= f"Người dùng {json_object['user']}: {json_object['text']}\n"
-
-            return conversations
-
-        except FileNotFoundError:
-            print(f"Error: the file '{file_path}' was not found.")
-        except json.JSONDecodeError as je:
-            print(f"Error in decoding JSON on line: {line.strip()}. Error: {je}")
-        except Exception as e:
-            print(f"An expected error occured: {e}")
-
-    def _get_attachment_content(self, file_path):
-        all_file_paths= glob.glob(os.path.join(file_path, "*.pdf"))\
-            + glob.glob(os.path.join(file_path, "*.docx"))
-        
-        attachment_file_text= ""
-
-        for file in all_file_paths:
-            filename= os.path.basename(file)
-            file_content= self.chunker.file_text_extractor(file_path= file)
-
-            attachment_file_text+= f"Tệp: {filename}\nNội dung: {file_content}\n-----"
-
-        return attachment_file_text
-
     def run_kb_agent_full(self):
         """
-        Read all messages (chat) and files data to create new KnowLedge Base (Cơ sở Tri thức)
+        Read messages (chat) and files data of every channel to update its KnowLedge Base (Cơ sở Tri thức).
+        Only what is newer than a channel's last digest gets summarized.
         """
-
-        # Get all conversations
-        conversations= self._get_conversation_file(file_path= self.messages_path)
-        attachment_data= self._get_attachment_content(file_path= self.file_dir)
+        files_by_channel= {}
+        for f in self.ingestor.state.files():
+            for channel_id in f.get("channels", []):
+                files_by_channel.setdefault(channel_id, []).append(f)
+
+        for channel_id in sorted(set(self.ingestor.message_log.channels())| set(files_by_channel)):
+            digest= self.ingestor.state.get_digest(channel_id= channel_id)
+            try:
+                self.kb_agent.build_kb_for_channel(
+                    channel_id= channel_id,
+                    messages= self.ingestor.message_log.range(channel_id= channel_id, since= digest["last_ts"] if digest else None),
+                    files= files_by_channel.get(channel_id, [])
+                )
+            except Exception as e:
+                print(f"Error building knowledge base of {channel_id}: {e}")
+
+    @staticmethod
+    def _count_run(n_messages: int, n_files: int, message_stats: Dict, file_stats: Dict):
+        telemetry.count(name= "messages_fetched", value= n_messages)
+        telemetry.count(name= "files_fetched", value= n_files)
+        telemetry.count(name= "conversations_indexed", value= message_stats.get("conversations", 0))
+        telemetry.count(name= "files_indexed", value= file_stats.get("files", 0))
+        telemetry.count(name= "files_unchanged", value= file_stats.get("unchanged", 0))
+        telemetry.count(name= "files_incomplete", value= len(file_stats.get("incomplete", [])))
+        telemetry.count(name= "points_deleted", value= message_stats.get("deleted", 0)+ file_stats.get("deleted", 0))
+
+    def _forget_incomplete(self, file_stats: Dict):
+        """
+        Drop the records of files whose extraction failed, so the next
+        incremental run downloads and indexes them again.
+        """
+        if file_stats.get("incomplete"):
+            print(f"Will retry {len(file_stats['incomplete'])} partly extracted files")
+            self.ingestor.state.delete_files(file_ids= file_stats["incomplete"])
 
     def run_incremental(self):
         """
-        Call on each Slack event when bot is mentioned.
+        Called by the background IngestionWorker on Slack events and on schedule.
         """
 
-        new_messages= self.ingestor.ingest_messages_incremental()
-        new_files= self.ingestor.ingest_files_incremental()
-
-        docs= []
-
-        # Convert all messages into small documents
-        # for m in new_messages:
-        #     docs.append({
-        #         "id": f"msg_{m['ts']}",
-        #         "text": m['text'],
-        #         "meta": m
-        #     })
-
-        # Convert files into document text (File --> Extract --> Chunk --> Docs)
-        for f in new_files:
-            raw_text= self.chunker.file_text_extractor(filepath= f["path"])
-            chunks= self.chunker.chunk_text(text= raw_text)
-
-            for i, chunk in enumerate(chunks):
-                docs.append({
-                    "id": f"{f['name']}_chunk_{i}",
-                    "text": chunk["text"],
-                    "meta": f
-                })
-
-        
-        # Embedding text and QDrant upsert
-        if docs:
-            texts= [d["text"] for d in docs]
-            embeddings= self.embedder.encode(texts= texts)
-
-            self.qdrant.add_documents(
-                embeddings= embeddings,
-                docs= docs
-            )
+        with self.ingestor.state.run(kind= "incremental") as run, telemetry.span(stage= "ingest_incremental"):
+            with telemetry.span(stage= "fetch_messages"):
+                new_messages= self.ingestor.ingest_messages_incremental()
+            with telemetry.span(stage= "fetch_files"):
+                new_files= self.ingestor.ingest_files_incremental()
+
+            # Messages --> Conversations --> Windows --> Embed --> Upsert, only what they touched
+            with telemetry.span(stage= "index_messages"):
+                message_stats= self.message_indexer.index_new(new_messages= new_messages)
+
+            # File --> Extract --> Chunk --> Embed --> Upsert, streamed in batches
+            file_stats= {}
+            if new_files:
+                with telemetry.span(stage= "index_files"):
+                    file_stats= self.pipeline.run(files= new_files)
+                self._forget_incomplete(file_stats= file_stats)
+
+            self._count_run(n_messages= len(new_messages), n_files= len(new_files), message_stats= message_stats, file_stats= file_stats)
+            run.update(n_messages= len(new_messages), n_files= len(new_files))
 
         return len(new_messages), len(new_files)
     
     def run_full(self):
-        print("Fetching all data from channel")
-        all_messages= self.ingestor.ingest_messages_full()
-        all_files= self.ingestor.ingest_files_full()
-
-        docs= []
-
-        print("Converting messages and files in documents")
-        # Convert all messages into small documents
-        # for m in all_messages:
-        #     docs.append({
-        #         "id": f"msg_{m['ts']}",
-        #         "text": m['text'],
-        #         "meta": m
-        #     })
-
-        # Convert files into document text (File --> Extract --> Chunk --> Docs)
-        for f in all_files:
-            raw_text= self.chunker.file_text_extractor(filepath= f["path"])
-            chunks= self.chunker.chunk_text(text= raw_text)
-
-            for i, chunk in enumerate(chunks):
-                docs.append({
-                    "id": f"{f['name']}_chunk_{i}",
-                    "text": chunk["text"],
-                    "meta": f
-                })
-        
-        print("Updating QDrant Database")
-        # Embedding text and QDrant upsert
-        if docs:
-            texts= [d["text"] for d in docs]
-            embeddings= self.embedder.encode(texts= texts)
-            print(texts)
-            print(embeddings)
-
-            self.qdrant.add_documents(
-                embeddings= embeddings,
-                docs= docs
-            )
-
-        print("Done")
+        with self.ingestor.state.run(kind= "full") as run, telemetry.span(stage= "ingest_full"):
+            with telemetry.span(stage= "fetch_messages"):
+                all_messages= self.ingestor.ingest_messages_full()
+            with telemetry.span(stage= "fetch_files"):
+                all_files= self.ingestor.ingest_files_full()
+
+            # Messages --> Conversations --> Windows --> Embed --> Upsert
+            with telemetry.span(stage= "index_messages"):
+                message_stats= self.message_indexer.index_all()
+
+            # File --> Extract --> Chunk --> Embed --> Upsert, streamed in batches
+            with telemetry.span(stage= "index_files"):
+                file_stats= self.pipeline.run(files= all_files)
+                file_stats["deleted"]+= self.sync.prune(active_source_ids= {self.pipeline.file_key(f= f) for f in all_files})
+            self._forget_incomplete(file_stats= file_stats)
+
+            self._count_run(n_messages= len(all_messages), n_files= len(all_files), message_stats= message_stats, file_stats= file_stats)
+            run.update(n_messages= len(all_messages), n_files= len(all_files))
 
         return len(all_messages), len(all_files)
     
@@ -0,0 +1,107 @@
+import re, threading
+import numpy as np
+
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class QueryCache:
+    """
+    Two-layer query cache for RAG_Pipeline.
+
+    1. LRU of normalized query text -> query vector (skips re-embedding).
+    2. Semantic answer cache: a stored answer is returned when a new query vector
+       has cosine similarity >= `threshold` with a cached one.
+
+    Both layers are dropped by `invalidate()` whenever points are upserted or deleted.
+    """
+    def __init__(self, max_queries= 1024, max_answers= 256, threshold= 0.95):
+        self.max_queries= max_queries
+        self.max_answers= max_answers
+        self.threshold= threshold
+
+        self._lock= threading.Lock()
+        self._vectors= OrderedDict()
+        self._answer_vecs= None # (n, dim) matrix of normalized query vectors
+        self._answers= []
+
+        self.counters= {
+            "vector_hits": 0,
+            "vector_misses": 0,
+            "answer_hits": 0,
+            "answer_misses": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return re.sub(r"\s+", " ", query).strip().lower()
+
+    def get_vector(self, query: str) -> Optional[np.ndarray]:
+        key= self.normalize(query= query)
+        with self._lock:
+            vector= self._vectors.get(key)
+            if vector is None:
+                self.counters["vector_misses"]+= 1
+                return None
+
+            self._vectors.move_to_end(key)
+            self.counters["vector_hits"]+= 1
+            return vector
+
+    def put_vector(self, query: str, vector: np.ndarray):
+        key= self.normalize(query= query)
+        with self._lock:
+            self._vectors[key]= vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors)> self.max_queries:
+                self._vectors.popitem(last= False)
+
+    def get_answer(self, query_vec: np.ndarray) -> Optional[str]:
+        with self._lock:
+            if self._answer_vecs is None or not self._answers:
+                self.counters["answer_misses"]+= 1
+                return None
+
+            # Vectors are normalized, so the dot product is the cosine similarity
+            scores= self._answer_vecs@ np.asarray(query_vec, dtype= np.float32)
+            best= int(np.argmax(scores))
+
+            if scores[best]< self.threshold:
+                self.counters["answer_misses"]+= 1
+                return None
+
+            self.counters["answer_hits"]+= 1
+            return self._answers[best]
+
+    def put_answer(self, query_vec: np.ndarray, answer: str):
+        vec= np.asarray(query_vec, dtype= np.float32)[None, :]
+        with self._lock:
+            if self._answer_vecs is None:
+                self._answer_vecs= vec
+            else:
+                self._answer_vecs= np.vstack([self._answer_vecs, vec])
+            self._answers.append(answer)
+
+            # Oldest answers go first
+            overflow= len(self._answers)- self.max_answers
+            if overflow> 0:
+                self._answer_vecs= self._answer_vecs[overflow:]
+                self._answers= self._answers[overflow:]
+
+    def invalidate(self, *args, **kwargs):
+        """
+        Drop both layers. Registered as an orchestrator change listener.
+        """
+        with self._lock:
+            self._vectors.clear()
+            self._answer_vecs= None
+            self._answers= []
+            self.counters["invalidations"]+= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self.counters,
+                "cached_queries": len(self._vectors),
+                "cached_answers": len(self._answers)
+            }
@@ -1,47 +1,162 @@
 import configparser
 
 from pathlib import Path
+from typing import Iterator
 from process.embedding import Embedder
-from process.QD_client import QDrantDB
+from process.vector_store import get_vector_store
+from process.model_registry import registry
+from process.telemetry import telemetry
 from openai import OpenAI
+from transformers import AutoTokenizer
 from agent.prompt_db import RAG_USER_PROMPT
+from pipelines.query_cache import QueryCache
+from pipelines.context_packer import ContextPacker
 
 class RAG_Pipeline:
-    def __init__(self):
+    def __init__(self, openai_client= None, embedder= None, store= None, tokenizer= None):
+        """
+        Clients and models are built from creds.env unless given (e.g. offline
+        stand-ins in benchmarks).
+        """
         BASE_DIR= Path(__file__).resolve().parent # Get the current folder
         config_path= BASE_DIR / "../.config/creds.env"
         self.config= configparser.ConfigParser()
         self.config.read(config_path)
 
-        self.client= OpenAI(api_key= self.config["AGENT"]["KEY"])
-        self.embedder= Embedder()
-        self.db= QDrantDB()
+        self.client= openai_client or OpenAI(api_key= self.config["AGENT"]["KEY"])
+        self.embedder= embedder or Embedder(
+            dim= self.config.getint("EMBEDDING", "DIM", fallback= 1024),
+            priority= "interactive" # Ahead of ingestion on a shared embedding server
+        )
+        self.db= store or get_vector_store(collection= "rag_collection")
+
+        self.cache= QueryCache(
+            max_queries= self.config.getint("RAG", "QUERY_CACHE_SIZE", fallback= 1024),
+            max_answers= self.config.getint("RAG", "ANSWER_CACHE_SIZE", fallback= 256),
+            threshold= self.config.getfloat("RAG", "ANSWER_CACHE_THRESHOLD", fallback= 0.95)
+        )
+
+        # Same shared tokenizer as the chunker, so budgets match chunk sizes
+        tokenizer_name= "jinaai/jina-embeddings-v3"
+        tokenizer= tokenizer or registry.acquire(
+            key= ("tokenizer", tokenizer_name),
+            loader= lambda: AutoTokenizer.from_pretrained(
+                pretrained_model_name_or_path= tokenizer_name,
+                cache_dir= BASE_DIR / "../.cache/models"
+            )
+        )
+
+        self.top_k= self.config.getint("CONTEXT", "TOP_K", fallback= 5)
+        self.n_candidates= self.config.getint("CONTEXT", "CANDIDATES", fallback= 20)
+        self.packer= ContextPacker(
+            tokenizer= tokenizer,
+            token_budget= self.config.getint("CONTEXT", "TOKEN_BUDGET", fallback= 2048),
+            max_passages= self.config.getint("CONTEXT", "MAX_PASSAGES", fallback= 8),
+            mmr_lambda= self.config.getfloat("CONTEXT", "MMR_LAMBDA", fallback= 0.7),
+            min_score= self.config.getfloat("CONTEXT", "MIN_SCORE", fallback= 0.2),
+            min_overlap_words= self.config.getint("CONTEXT", "MIN_OVERLAP_WORDS", fallback= 8)
+        )
+
+    def embed_query(self, query: str):
+        query_vec= self.cache.get_vector(query= query)
+        if query_vec is None:
+            with telemetry.span(stage= "query_embed"):
+                query_vec= self.embedder.encode([query])[0]
+            self.cache.put_vector(query= query, vector= query_vec)
+
+        return query_vec
 
-    def retrieve(self, query: str, top_k= 5):
-        query_vec= self.embedder.encode([query])[0]
-        print(query_vec)
-        return self.db.search(query_vec= query_vec, top_k= top_k)
+    def retrieve(self, query: str, top_k= 5, query_vec= None, with_vectors= False):
+        if query_vec is None:
+            query_vec= self.embed_query(query= query)
+        with telemetry.span(stage= "vector_search", top_k= top_k):
+            return self.db.search(query_vec= query_vec, top_k= top_k, with_vectors= with_vectors)
     
+    def _build_prompt(self, query: str, query_vec) -> str:
+        # Over-fetch, then let the packer pick a diverse, budgeted subset
+        results= self.retrieve(query= query, top_k= max(self.n_candidates, self.top_k), query_vec= query_vec, with_vectors= True)
+
+        with telemetry.span(stage= "prompt_build") as span:
+            context, report= self.packer.pack(hits= results, query_vec= query_vec, baseline_k= self.top_k)
+            span.update(report)
+
+            user_input= RAG_USER_PROMPT\
+                .replace("{{context}}", context)\
+                .replace("{{query}}", query)
+
+        telemetry.count(name= "context_tokens", value= report["tokens"])
+        telemetry.count(name= "context_tokens_saved", value= report["tokens_saved"])
+        telemetry.count(name= "context_passages", value= report["passages"])
+
+        return user_input
+
+    @staticmethod
+    def _count_usage(usage):
+        if usage is None:
+            return
+
+        telemetry.count(name= "llm_tokens", value= usage.prompt_tokens, kind= "prompt")
+        telemetry.count(name= "llm_tokens", value= usage.completion_tokens, kind= "completion")
+
     def answer(self, query: str):
-        results= self.retrieve(query= query, top_k= 5)
+        query_vec= self.embed_query(query= query)
 
-        print(results)
+        # Semantically equivalent question answered recently
+        cached_answer= self.cache.get_answer(query_vec= query_vec)
+        if cached_answer is not None:
+            telemetry.count(name= "answer_cache_hits")
+            return cached_answer
 
-        context= "\n\n".join([
-            f"{r.payload.get('text', '')}" for r in results
-        ])
+        user_input= self._build_prompt(query= query, query_vec= query_vec)
 
-        user_input= RAG_USER_PROMPT\
-            .replace("{{context}}", context)\
-            .replace("{{query}}", query)
-        
-        print(user_input)
+        with telemetry.span(stage= "llm"):
+            completion= self.client.chat.completions.create(
+                model= f"{self.config['AGENT']['MODEL']}",
+                messages= [
+                    {"role": "user", "content": user_input}
+                ]
+            )
+        self._count_usage(usage= getattr(completion, "usage", None))
 
-        completion= self.client.chat.completions.create(
-            model= f"{self.config['AGENT']['MODEL']}",
-            messages= [
-                {"role": "user", "content": user_input}
-            ]
-        )
+        answer= completion.choices[0].message.content
+        self.cache.put_answer(query_vec= query_vec, answer= answer)
+
+        return answer
+
+    def answer_stream(self, query: str) -> Iterator[str]:
+        """
+        Same as `answer`, yielding the answer in pieces as the model generates it.
+        """
+        query_vec= self.embed_query(query= query)
+
+        cached_answer= self.cache.get_answer(query_vec= query_vec)
+        if cached_answer is not None:
+            telemetry.count(name= "answer_cache_hits")
+            yield cached_answer
+            return
+
+        user_input= self._build_prompt(query= query, query_vec= query_vec)
+
+        parts= []
+        # Includes the time the caller spends on each delta (posting it to Slack)
+        with telemetry.span(stage= "llm", stream= True):
+            stream= self.client.chat.completions.create(
+                model= f"{self.config['AGENT']['MODEL']}",
+                messages= [
+                    {"role": "user", "content": user_input}
+                ],
+                stream= True,
+                stream_options= {"include_usage": True}, # Usage arrives in a last chunk without choices
+                # Read timeout between chunks, so a stalled stream frees its worker
+                timeout= self.config.getfloat("STREAMING", "IDLE_TIMEOUT", fallback= 30)
+            )
+
+            for chunk in stream:
+                self._count_usage(usage= getattr(chunk, "usage", None))
+                delta= chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
 
-        return completion.choices[0].message.content
\ No newline at end of file
+        # Only complete answers go to the cache
+        self.cache.put_answer(query_vec= query_vec, answer= "".join(parts))
@@ -0,0 +1,298 @@
+import os, json, queue, logging, threading, time
+import numpy as np
+
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+from process.extraction import TextExtractor, ExtractionError
+from process.telemetry import telemetry, timed_iter
+
+# Progress per upsert batch is debug level; totals are in the returned stats
+logger= logging.getLogger(__name__)
+
+_DONE= object() # End-of-stream marker between stages
+
+class StreamingIngestPipeline:
+    """
+    extract -> chunk -> batch-embed -> batch-upsert as overlapping stages.
+
+    Stages run on their own threads and are connected by bounded queues, so at
+    most `queue_size` batches are held between two stages and peak memory does
+    not grow with the corpus. Fully upserted files are written to a checkpoint
+    so an interrupted run resumes where it stopped.
+
+    With a `SyncEngine`, unchanged files are skipped, only chunks that are not
+    indexed yet are embedded and upserted, and the points of chunks a file no
+    longer has are deleted once the file is done.
+    """
+    def __init__(self, chunker, embedder, store, extractor= None, embed_batch_size= 64, upsert_batch_size= 256,
+                 queue_size= 4, embed_workers= 1, checkpoint_path= None, on_upsert: Callable= None, sync= None):
+        BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+        self.chunker= chunker
+        self.extractor= extractor or TextExtractor()
+        self.embedder= embedder
+        self.store= store
+        self.embed_batch_size= embed_batch_size
+        self.upsert_batch_size= upsert_batch_size
+        self.queue_size= queue_size
+        self.embed_workers= embed_workers
+        self.on_upsert= on_upsert
+        self.sync= sync
+        self.checkpoint_path= Path(checkpoint_path) if checkpoint_path else BASE_DIR / "../data/ingest_checkpoint.json"
+
+    @staticmethod
+    def file_key(f: Dict) -> str:
+        return f.get("id") or f"{f['path']}:{f.get('timestamp')}"
+
+    def _load_checkpoint(self) -> set:
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding= "utf-8") as fp:
+                return set(json.load(fp).get("done", []))
+
+        return set()
+
+    def _save_checkpoint(self, done: set):
+        tmp_path= f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding= "utf-8") as fp:
+            json.dump({"done": sorted(done)}, fp, ensure_ascii= False)
+
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def iter_docs(self, f: Dict, parts: Iterator[str], plan= None) -> Iterator[Dict]:
+        """
+        Chunk one file's extracted text parts, yielding documents ready for embedding.
+        With a sync `plan`, chunks that are already indexed are left out.
+        """
+        for i, chunk in enumerate(self.chunker.iter_chunks_stream(parts= parts)):
+            if plan is not None:
+                doc_id= self.sync.doc_id(source_id= plan.source_id, chunk_hash= chunk["id"])
+                if not plan.add(chunk_hash= chunk["id"], doc_id= doc_id):
+                    continue
+            else:
+                doc_id= f"{f['name']}_chunk_{i}"
+
+            yield {
+                "id": doc_id,
+                "hash": chunk["id"],
+                "text": chunk["text"],
+                "meta": f
+            }
+
+    def _plan(self, files: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """
+        Diff `files` against the sync state. Returns the changed files and their plans.
+        """
+        changed, plans= [], {}
+        for f in files:
+            key= self.file_key(f= f)
+            try:
+                # The downloader already hashed the bytes it wrote
+                content_hash= f.get("sha256") or self.extractor.file_hash(filepath= f["path"])
+            except OSError as e:
+                print(f"Skipping {f['name']}: {e}")
+                continue
+
+            plan= self.sync.begin(source_id= key, content_hash= content_hash, path= f["path"])
+            if plan is not None:
+                changed.append(f)
+                plans[key]= plan
+
+        return changed, plans
+
+    def run(self, files: List[Dict], resume= True) -> Dict:
+        """
+        Stream `files` through the pipeline. Returns run statistics.
+        """
+        done= self._load_checkpoint() if resume else set()
+        todo= [f for f in files if self.file_key(f= f) not in done]
+
+        if len(todo)< len(files):
+            print(f"Resuming ingestion: skipping {len(files)- len(todo)} already indexed files")
+
+        plans= {}
+        n_unchanged= 0
+        if self.sync:
+            n_files= len(todo)
+            todo, plans= self._plan(files= todo)
+            n_unchanged= n_files- len(todo)
+
+        embed_q= queue.Queue(maxsize= self.queue_size)
+        upsert_q= queue.Queue(maxsize= self.queue_size)
+        failed= threading.Event()
+        errors= []
+
+        # Per-file bookkeeping: a file is checkpointed once it is sealed (fully
+        # chunked) and every one of its documents has been upserted
+        lock= threading.Lock()
+        pending= {}
+        sealed= set()
+        incomplete= set() # Files whose extraction failed: their sync state is kept as is
+        stats= {"files": 0, "chunks": 0, "points": 0, "unchanged": n_unchanged, "deleted": 0, "incomplete": []}
+
+        def _put(q, item):
+            while not failed.is_set():
+                try:
+                    q.put(item, timeout= 0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _get(q):
+            while not failed.is_set():
+                try:
+                    return q.get(timeout= 0.5)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def _checkpoint(keys):
+            finished= [k for k in keys if k in sealed and pending.get(k, 0)== 0]
+            if finished:
+                for k in finished:
+                    pending.pop(k, None)
+                    sealed.discard(k)
+                    plan= plans.pop(k, None)
+                    if plan is not None and k not in incomplete:
+                        stats["deleted"]+= self.sync.commit(plan= plan)
+
+                # A partly extracted file is not done: a resumed or later run retries it
+                complete= [k for k in finished if k not in incomplete]
+                stats["incomplete"]+= [k for k in finished if k in incomplete]
+                done.update(complete)
+                stats["files"]+= len(complete)
+                self._save_checkpoint(done= done)
+
+        def _fail(e):
+            errors.append(e)
+            failed.set()
+
+        def produce():
+            try:
+                batch= []
+                # The extractor pool works ahead on the next files while this one is chunked
+                extracted= self.extractor.iter_many(filepaths= [f["path"] for f in todo])
+
+                for f, (_, parts) in zip(todo, extracted):
+                    key= self.file_key(f= f)
+                    with lock:
+                        pending[key]= 0
+
+                    # Extraction (waiting on the pool) and chunking interleave, time them apart
+                    extract_clock, file_clock= {}, {}
+                    docs= self.iter_docs(f= f, parts= timed_iter(iterable= parts, clock= extract_clock), plan= plans.get(key))
+
+                    try:
+                        for doc in timed_iter(iterable= docs, clock= file_clock):
+                            with lock:
+                                pending[key]+= 1
+                                stats["chunks"]+= 1
+                            telemetry.count(name= "chunks")
+
+                            batch.append((key, doc))
+                            if len(batch)>= self.embed_batch_size:
+                                if not _put(embed_q, batch):
+                                    return
+                                batch= []
+                    except ExtractionError as e:
+                        # Chunks already queued still get indexed, the rest of the file is skipped
+                        print(f"Skipping rest of {f['name']}: {e}")
+                        with lock:
+                            incomplete.add(key)
+
+                    extract_s= extract_clock.get("seconds", 0.0)
+                    telemetry.observe(name= "stage_seconds", value= extract_s, stage= "extract")
+                    telemetry.observe(name= "stage_seconds", value= max(0.0, file_clock.get("seconds", 0.0)- extract_s), stage= "chunk")
+
+                    with lock:
+                        sealed.add(key)
+                        _checkpoint(keys= [key])
+
+                if batch:
+                    _put(embed_q, batch)
+            except Exception as e:
+                _fail(e)
+            finally:
+                for _ in range(self.embed_workers):
+                    _put(embed_q, _DONE)
+
+        def embed():
+            try:
+                while True:
+                    batch= _get(embed_q)
+                    if batch is _DONE:
+                        break
+
+                    docs= [doc for _, doc in batch]
+                    vectors= self.embedder.encode(
+                        texts= [d["text"] for d in docs],
+                        keys= [d["hash"] for d in docs]
+                    )
+
+                    if not _put(upsert_q, (batch, vectors)):
+                        break
+            except Exception as e:
+                _fail(e)
+            finally:
+                _put(upsert_q, _DONE)
+
+        def flush(keys, docs, vectors):
+            with telemetry.span(stage= "upsert", n_points= len(docs)):
+                self.store.add_documents(embeddings= np.asarray(vectors), docs= docs)
+            telemetry.count(name= "points_upserted", value= len(docs))
+            if self.on_upsert:
+                self.on_upsert(len(docs))
+
+            with lock:
+                stats["points"]+= len(docs)
+                for k in keys:
+                    pending[k]-= 1
+                _checkpoint(keys= set(keys))
+
+            logger.debug(f"Upserted {stats['points']}/{stats['chunks']} chunks ({stats['files']} files done)")
+
+        def upsert():
+            remaining= self.embed_workers
+            keys, docs, vectors= [], [], []
+            try:
+                while remaining> 0:
+                    item= _get(upsert_q)
+                    if item is _DONE:
+                        if failed.is_set():
+                            return
+                        remaining-= 1
+                        continue
+
+                    batch, batch_vectors= item
+                    keys.extend(k for k, _ in batch)
+                    docs.extend(doc for _, doc in batch)
+                    vectors.extend(batch_vectors)
+
+                    if len(docs)>= self.upsert_batch_size:
+                        flush(keys= keys, docs= docs, vectors= vectors)
+                        keys, docs, vectors= [], [], []
+
+                if docs:
+                    flush(keys= keys, docs= docs, vectors= vectors)
+            except Exception as e:
+                _fail(e)
+
+        started= time.time()
+        threads= [threading.Thread(target= produce, name= "ingest-extract")]
+        threads+= [threading.Thread(target= embed, name= f"ingest-embed-{i}") for i in range(self.embed_workers)]
+        threads+= [threading.Thread(target= upsert, name= "ingest-upsert")]
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if errors:
+            raise errors[0]
+
+        # Completed run, next one starts from scratch
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        stats["elapsed"]= time.time()- started
+        return stats
@@ -0,0 +1,133 @@
+from typing import Callable, Dict, List, Optional, Set
+from ingestion.state_store import StateStore
+
+class SyncPlan:
+    """
+    Diff of one source (file) between what is indexed and its new version.
+    """
+    def __init__(self, source_id: str, content_hash: str, old_chunks: Dict[str, str], path: str= None):
+        self.source_id= source_id
+        self.content_hash= content_hash
+        self.path= path
+        self.old_chunks= old_chunks # chunk hash -> doc id
+        self.new_chunks: Dict[str, str]= {}
+
+    def add(self, chunk_hash: str, doc_id: str) -> bool:
+        """
+        Register a chunk of the new version. True if it must be embedded and
+        upserted, False if it is already indexed (or a duplicate in this file).
+        """
+        if chunk_hash in self.new_chunks:
+            return False
+
+        self.new_chunks[chunk_hash]= doc_id
+        return chunk_hash not in self.old_chunks
+
+    def orphans(self) -> List[str]:
+        return [doc_id for h, doc_id in self.old_chunks.items() if h not in self.new_chunks]
+
+class SyncEngine:
+    """
+    Chunk-level delta sync between source files and the vector index.
+
+    Per source it records the content hash and the chunk hashes / point ids it
+    produced. A changed file only embeds and upserts its new chunks, and the
+    points of chunks that disappeared are deleted in one batch. Sources of
+    different `kind`s (files, message conversations) share the state store but
+    are pruned separately.
+
+    `embedder_id` (model, task, dimension) is stored with every content hash:
+    a source indexed by another embedder is re-embedded in full even when its
+    content did not change, so stored and query vectors share one space.
+
+    Every delete goes through here and calls `on_delete` with the number of
+    points deleted (0 when unknown), e.g. to invalidate query caches.
+    """
+    def __init__(self, store, state: StateStore= None, kind= "file", embedder_id: str= None,
+                 on_delete: Callable= None):
+        self.store= store
+        self.state= state or StateStore()
+        self.kind= kind
+        self.embedder_id= embedder_id
+        self.on_delete= on_delete
+
+    def _deleted(self, n_points: int):
+        if self.on_delete:
+            self.on_delete(n_points)
+
+    @staticmethod
+    def doc_id(source_id: str, chunk_hash: str) -> str:
+        # Content-addressed: an unchanged chunk keeps its point id across versions
+        return f"{source_id}:{chunk_hash}"
+
+    def begin(self, source_id: str, content_hash: str, path: str= None) -> Optional[SyncPlan]:
+        """
+        Start syncing a source. Returns None when its content is unchanged.
+        """
+        record= self.state.get_source(source_id= source_id)
+        if self.embedder_id:
+            content_hash= f"{content_hash}@{self.embedder_id}"
+
+        if record and record["content_hash"]== content_hash:
+            return None
+
+        if record is None and path:
+            # Points written before delta sync used positional ids we cannot
+            # rebuild, drop them by path before indexing the file. A tracked
+            # source stored at the same path was overwritten on disk and loses
+            # its points too, so forget it
+            self.store.delete_where(field= "path", value= path)
+            self._deleted(n_points= 0)
+            self.state.delete_sources(source_ids= self.state.source_ids(path= path, kind= self.kind))
+
+        old_chunks= record["chunks"] if record else {}
+        if record and self.embedder_id and not record["content_hash"].endswith(f"@{self.embedder_id}"):
+            # Point ids are content-addressed, so re-upserting every chunk replaces
+            # the old vectors in place and nothing is orphaned
+            old_chunks= {}
+
+        return SyncPlan(source_id= source_id, content_hash= content_hash, old_chunks= old_chunks, path= path)
+
+    def commit(self, plan: SyncPlan) -> int:
+        """
+        Called once every new chunk of the plan is upserted. Deletes orphaned
+        points and records the new version. Returns the number of deleted points.
+        """
+        orphans= plan.orphans()
+        if orphans:
+            self.store.delete(ids= orphans)
+            self._deleted(n_points= len(orphans))
+
+        self.state.put_source(
+            source_id= plan.source_id,
+            content_hash= plan.content_hash,
+            path= plan.path,
+            chunks= plan.new_chunks,
+            kind= self.kind
+        )
+
+        return len(orphans)
+
+    def remove(self, source_ids: List[str]) -> int:
+        """
+        Delete every point of the given sources and forget them.
+        """
+        n_deleted= 0
+        for source_id in source_ids:
+            doc_ids= list(self.state.source_chunks(source_id= source_id).values())
+            self.store.delete(ids= doc_ids)
+            self.state.delete_sources(source_ids= [source_id])
+            n_deleted+= len(doc_ids)
+
+        if source_ids:
+            self._deleted(n_points= n_deleted)
+
+        return n_deleted
+
+    def prune(self, active_source_ids: Set[str]) -> int:
+        """
+        Delete every point of sources (of this kind) that no longer exist.
+        """
+        return self.remove(source_ids= [
+            sid for sid in self.state.source_ids(kind= self.kind) if sid not in active_source_ids
+        ])
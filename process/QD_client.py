@@ -1,25 +1,69 @@
-import os, hashlib
+import os, time, logging, configparser
+import grpc, httpx
+import numpy as np
 
-from tqdm import tqdm
 from pathlib import Path
 from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 from qdrant_client.models import (
     VectorParams,
+    VectorParamsDiff,
     Distance,
-    PointStruct
+    Batch,
+    PointIdsList,
+    FilterSelector,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    SearchParams,
+    QuantizationSearchParams
 )
+from process.vector_store import VectorStore, make_int_id
+from process.telemetry import telemetry
 
-class QDrantDB:
-    def __init__(self, collection= "rag_collection"):
+# Per-batch messages are debug level: upserts run thousands of times per ingestion
+logger= logging.getLogger(__name__)
+
+class QDrantDB(VectorStore):
+    def __init__(self, collection= "rag_collection", client= None):
         BASE_DIR= Path(__file__).resolve().parent # Get the current folder
-        
+        config_path= BASE_DIR / "../.config/creds.env"
+        self.config= configparser.ConfigParser()
+        self.config.read(config_path)
+
         self.path= BASE_DIR / "../data/qdrant_storage"
         os.makedirs(self.path, exist_ok= True)
 
-        self.client= QdrantClient(host="localhost", port=6333)
+        # `client` replaces the server connection, e.g. with an in-memory stand-in
+        self.client= client or QdrantClient(
+            host= self.config.get("QDRANT", "HOST", fallback= "localhost"),
+            port= self.config.getint("QDRANT", "PORT", fallback= 6333),
+            grpc_port= self.config.getint("QDRANT", "GRPC_PORT", fallback= 6334),
+            prefer_grpc= self.config.getboolean("QDRANT", "PREFER_GRPC", fallback= False)
+        )
         self.collection= collection
 
+        # Bulk write settings
+        self.batch_size= self.config.getint("QDRANT", "UPSERT_BATCH_SIZE", fallback= 256)
+        self.parallel= self.config.getint("QDRANT", "UPSERT_PARALLEL", fallback= 4)
+        self.max_retries= self.config.getint("QDRANT", "UPSERT_RETRIES", fallback= 3)
+
+        # Vector size follows the (possibly Matryoshka-truncated) embedder output
+        self.dim= self.config.getint("EMBEDDING", "DIM", fallback= 1024)
+
+        # Quantized storage: "none", "int8" (scalar) or "binary". Quantized vectors
+        # stay in RAM, originals move to disk and are only read to rescore
+        self.quantization= self.config.get("QDRANT", "QUANTIZATION", fallback= "none")
+        self.oversampling= self.config.getfloat("QDRANT", "OVERSAMPLING", fallback= 2.0)
+        self.rescore= self.config.getboolean("QDRANT", "RESCORE", fallback= True)
+
         collection_list= self.client.get_collections().collections
         collection_names= [c.name for c in collection_list]
 
@@ -27,35 +71,168 @@ class QDrantDB:
             self.client.recreate_collection(
                 collection_name= self.collection,
                 vectors_config= VectorParams(
-                    size= 1024,
-                    distance= Distance.COSINE
+                    size= self.dim,
+                    distance= Distance.COSINE,
+                    on_disk= self.quantization!= "none"
+                ),
+                quantization_config= self._quantization_config()
+            )
+        else:
+            vectors= self.client.get_collection(collection_name= self.collection).config.params.vectors
+            if vectors.size!= self.dim:
+                raise ValueError(
+                    f"Collection {self.collection} holds {vectors.size}-dim vectors but [EMBEDDING] DIM is {self.dim}; "
+                    f"drop it or use another collection name, then re-ingest"
+                )
+
+            if self.quantization!= "none":
+                # Same layout as a new collection: quantized vectors in RAM, originals on disk
+                self.client.update_collection(
+                    collection_name= self.collection,
+                    vectors_config= {"": VectorParamsDiff(on_disk= True)} if not vectors.on_disk else None,
+                    quantization_config= self._quantization_config()
+                )
+
+    def _quantization_config(self):
+        if self.quantization== "int8":
+            return ScalarQuantization(
+                scalar= ScalarQuantizationConfig(
+                    type= ScalarType.INT8,
+                    quantile= 0.99,
+                    always_ram= True
                 )
             )
+        elif self.quantization== "binary":
+            return BinaryQuantization(
+                binary= BinaryQuantizationConfig(always_ram= True)
+            )
+        elif self.quantization== "none":
+            return None
+
+        raise ValueError(f"Unknown quantization: {self.quantization}")
 
     @staticmethod
     def _make_int_id(s: str) -> int:
-        return int(hashlib.md5(s.encode()).hexdigest()[:16], 16)
+        return make_int_id(s= s)
+
+    @staticmethod
+    def _is_transient(e: Exception) -> bool:
+        """
+        Only server-side and transport failures are worth retrying; client
+        errors (bad payload, wrong dimension, validation...) fail again.
+        """
+        if isinstance(e, ResponseHandlingException): # The REST client wraps transport errors
+            e= e.source
+        if isinstance(e, UnexpectedResponse):
+            return e.status_code is None or e.status_code>= 500 or e.status_code== 429
+        if isinstance(e, grpc.RpcError):
+            return e.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED,
+                                grpc.StatusCode.RESOURCE_EXHAUSTED)
+        return isinstance(e, (httpx.TransportError, ConnectionError, TimeoutError))
+
+    def _upsert_batch(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict], wait: bool):
+        batch= Batch(
+            ids= ids,
+            vectors= vectors.tolist(), # One C-level conversion per batch
+            payloads= payloads
+        )
+
+        for attempt in range(self.max_retries+ 1):
+            try:
+                return self.client.upsert(
+                    collection_name= self.collection,
+                    points= batch,
+                    wait= wait
+                )
+            except Exception as e:
+                if attempt== self.max_retries or not self._is_transient(e= e):
+                    raise
 
-    def add_documents(self, embeddings: List[List[float]], docs: List[Dict]):
+                delay= 0.5* (2** attempt)
+                telemetry.count(name= "upsert_retries")
+                logger.warning(f"Upsert batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def add_documents(self, embeddings: np.ndarray, docs: List[Dict], wait= True) -> Dict:
         """
         docs = [ {id: "...", meta: {...}} ]
+
+        Upserts in batches of `batch_size` with up to `parallel` batches in flight.
+        Batches are sent fire-and-forget (wait=False); with `wait` the last batch
+        is sent with wait=True after all others were acknowledged, which acts as
+        a barrier since Qdrant applies updates in order.
         """
-        points= []
-        for embedding, doc in tqdm(zip(embeddings, docs), total= len(docs), desc= "Creating points for upsert QDrantDB"):
-            points.append(PointStruct(
-                id= self._make_int_id(s= doc["id"]),
-                vector= embedding,
-                payload= {
-                    **doc["meta"],
-                    "text":doc["text"]
-                }
-            ))
-
-        self.client.upsert(collection_name= self.collection, points= points)
-    
-    def search(self, query_vec, top_k= 5):
+        if len(docs)== 0:
+            return {"points": 0, "seconds": 0.0, "points_per_sec": 0.0}
+
+        started= time.perf_counter()
+
+        vectors= np.asarray(embeddings, dtype= np.float32)
+        ids= [self._make_int_id(s= doc["id"]) for doc in docs]
+        payloads= [{**doc["meta"], "text": doc["text"]} for doc in docs]
+
+        bounds= [(i, min(i+ self.batch_size, len(docs))) for i in range(0, len(docs), self.batch_size)]
+        head, last= bounds[:-1], bounds[-1]
+
+        with ThreadPoolExecutor(max_workers= self.parallel) as pool:
+            futures= [
+                pool.submit(self._upsert_batch, ids[i:j], vectors[i:j], payloads[i:j], False)
+                for i, j in head
+            ]
+            for future in futures:
+                future.result()
+
+        i, j= last
+        self._upsert_batch(ids= ids[i:j], vectors= vectors[i:j], payloads= payloads[i:j], wait= wait)
+
+        seconds= time.perf_counter()- started
+        stats= {
+            "points": len(docs),
+            "seconds": seconds,
+            "points_per_sec": len(docs)/ seconds if seconds> 0 else 0.0
+        }
+        logger.debug(f"Upserted {stats['points']} points in {seconds:.2f}s ({stats['points_per_sec']:.0f} points/sec)")
+
+        return stats
+
+    def search(self, query_vec, top_k= 5, with_vectors= False):
+        search_params= None
+        if self.quantization!= "none":
+            # Search the quantized index for top_k * oversampling candidates,
+            # then rescore them with the full-precision vectors
+            search_params= SearchParams(
+                quantization= QuantizationSearchParams(
+                    rescore= self.rescore,
+                    oversampling= self.oversampling
+                )
+            )
+
         return self.client.search(
             collection_name= self.collection,
             query_vector= query_vec,
-            limit= top_k
-        )
\ No newline at end of file
+            limit= top_k,
+            search_params= search_params,
+            with_vectors= with_vectors
+        )
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+
+        self.client.delete(
+            collection_name= self.collection,
+            points_selector= PointIdsList(points= [self._make_int_id(s= i) for i in ids]),
+            wait= True
+        )
+
+    def delete_where(self, field: str, value):
+        self.client.delete(
+            collection_name= self.collection,
+            points_selector= FilterSelector(
+                filter= Filter(must= [FieldCondition(key= field, match= MatchValue(value= value))])
+            ),
+            wait= True
+        )
+
+    def count(self) -> int:
+        return self.client.count(collection_name= self.collection, exact= True).count
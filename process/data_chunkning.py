@@ -1,26 +1,71 @@
-import os, re, json, hashlib, spacy, underthesea
+import os, re, json, time, hashlib, itertools, spacy, underthesea
+import numpy as np
 
+from functools import lru_cache
 from pathlib import Path
-from langdetect import detect
+from langdetect import detect, DetectorFactory
 from PyPDF2 import PdfReader
 from docx import Document
 from transformers import AutoTokenizer
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Tuple
+from process.model_registry import registry
+
+# langdetect is randomized, seed it so the same text always gets the same language
+DetectorFactory.seed= 0
+
+@lru_cache(maxsize= 4096)
+def _detect_cached(sample: str) -> str:
+    try:
+        return detect(text= sample)
+    except:
+        return "vi"
+
+def _load_spacy(segmenter: str):
+    if segmenter== "fast":
+        # Rule-based sentence boundaries only, no tagger/parser/NER
+        nlp= spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+        nlp.max_length= 10_000_000
+        return nlp
+
+    return spacy.load(name= "en_core_web_sm")
 
 class DataChunker:
-    def __init__(self, max_tokens= 1024, overlap_ratio= 0.15):
+    def __init__(self, max_tokens= 1024, overlap_ratio= 0.15, tokenizer_name= "jinaai/jina-embeddings-v3",
+                 segmenter= "full", per_section_lang= False, lang_sample_chars= 2000):
         BASE_DIR= Path(__file__).resolve().parent # Get the current folder
         self.max_tokens= max_tokens
         self.overlap_ratio= overlap_ratio
 
-        print(BASE_DIR / "../.cache/models")
+        # "full": en_core_web_sm parser sentences, "fast": sentencizer-only pipeline
+        self.segmenter= segmenter
+        self.per_section_lang= per_section_lang
+        self.lang_sample_chars= lang_sample_chars
 
-        self.tokenizer= AutoTokenizer.from_pretrained(
-            pretrained_model_name_or_path= "jinaai/jina-embeddings-v3",
-            cache_dir= BASE_DIR / "../.cache/models"
+        cache_dir= BASE_DIR / "../.cache/models"
+
+        # Tokenizer and spaCy pipeline are shared with every other chunker in the process
+        self.tokenizer_key= ("tokenizer", tokenizer_name)
+        self.tokenizer= registry.acquire(
+            key= self.tokenizer_key,
+            loader= lambda: AutoTokenizer.from_pretrained(
+                pretrained_model_name_or_path= tokenizer_name,
+                cache_dir= cache_dir
+            )
+        )
+
+        self.nlp_en_key= ("spacy", "en_core_web_sm", segmenter)
+        self.nlp_en= registry.acquire(
+            key= self.nlp_en_key,
+            loader= lambda: _load_spacy(segmenter= segmenter)
         )
-        self.nlp_en= spacy.load(name= "en_core_web_sm")
         self.nlp_vi= None
+
+        # Per-stage timings, see throughput()
+        self.stats= {
+            stage: {"seconds": 0.0, "sentences": 0, "calls": 0}
+            for stage in ("detect_lang", "segment", "tokenize")
+        }
     
     def file_text_extractor(self, filepath: str):
         """
@@ -35,6 +80,13 @@ class DataChunker:
         else:
             return open(filepath, encoding= "utf-8", errors= "ignore").read()
         
+    def close(self):
+        """
+        Release this chunker's handles on the shared tokenizer and spaCy pipeline.
+        """
+        registry.release(key= self.tokenizer_key)
+        registry.release(key= self.nlp_en_key)
+
     def _count_tokens(self, text: str) -> int:
         return len(self.tokenizer.tokenize(text))
     
@@ -42,58 +94,206 @@ class DataChunker:
         return hashlib.sha256(text.encode()).hexdigest()
     
 
+    def _record(self, stage: str, seconds: float, sentences= 0):
+        self.stats[stage]["seconds"]+= seconds
+        self.stats[stage]["sentences"]+= sentences
+        self.stats[stage]["calls"]+= 1
+
+    def throughput(self) -> Dict[str, float]:
+        """
+        Sentences per second for each stage so far.
+        """
+        segmented= self.stats["segment"]["sentences"]
+        return {
+            stage: round((stat["sentences"] or segmented)/ stat["seconds"], 1) if stat["seconds"]> 0 else 0.0
+            for stage, stat in self.stats.items()
+        }
+
+    def _lang_sample(self, text: str) -> str:
+        """
+        Bounded sample (head + middle) so detection cost doesn't grow with the file.
+        """
+        n= self.lang_sample_chars
+        if len(text)<= n:
+            return text
+
+        mid= len(text)// 2
+        return text[:n// 2]+ "\n"+ text[mid: mid+ n// 2]
+
     def detect_lang(self, text: str) -> str:
-        try:
-            return detect(text= text)
-        except:
-            return "vi"
+        started= time.perf_counter()
+        lang= _detect_cached(sample= self._lang_sample(text= text))
+        self._record(stage= "detect_lang", seconds= time.perf_counter()- started)
+
+        return lang
         
     def split_sentences(self, text: str, lang: str) -> List[str]:
-        if lang.startswith("en"):
-            return [s.text for s in self.nlp_en(text).sents]
-        else:
-            return underthesea.sent_tokenize(text= text)
+        return next(self.iter_split_sentences(sections= [text], langs= [lang]))
+
+    def iter_split_sentences(self, sections: List[str], langs: List[str]) -> Iterator[List[str]]:
+        """
+        Sentences of every section, in order. Consecutive English sections go
+        through `nlp.pipe` as one batch, Vietnamese ones through underthesea.
+        """
+        runs= itertools.groupby(zip(sections, langs), key= lambda pair: pair[1].startswith("en"))
+
+        for is_en, run in runs:
+            texts= [sec for sec, _ in run]
+
+            if is_en:
+                docs= self.nlp_en.pipe(texts, batch_size= 32)
+                split= lambda: [s.text for s in next(docs).sents]
+            else:
+                it= iter(texts)
+                split= lambda: underthesea.sent_tokenize(text= next(it))
+
+            for _ in texts:
+                started= time.perf_counter()
+                sentences= split()
+                self._record(stage= "segment", seconds= time.perf_counter()- started, sentences= len(sentences))
+                yield sentences
         
     def heading_split(self, text: str) -> List[str]:
         parts= re.split(r"\n(?=# )", text)
         return parts if len(parts)> 1 else [text]
+
+    def iter_sections(self, parts: Iterable[str]) -> Iterator[str]:
+        """
+        Same sections as `heading_split("\\n".join(parts))`, but only the current
+        section is held in memory.
+        """
+        pending= None # Parts of the current section, joined with "\n" when it ends
+        for part in parts:
+            # Boundaries are "\n# ": inside the new part, or at the "\n" joining it
+            # to the previous one. Earlier text never needs scanning again.
+            pieces= re.split(r"\n(?=# )", part)
+            if pending is None:
+                pending= [pieces[0]]
+            elif part.startswith("# "):
+                yield "\n".join(pending)
+                pending= [pieces[0]]
+            else:
+                pending.append(pieces[0])
+
+            for piece in pieces[1:]:
+                yield "\n".join(pending)
+                pending= [piece]
+
+        if pending is not None:
+            yield "\n".join(pending)
     
-    def chunk_text(self, text: str) -> List[Dict]:
-        lang= self.detect_lang(text= text)
+    def _count_tokens_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Token count of every text in one batched (fast) tokenizer call.
+        """
+        if not texts:
+            return np.zeros(0, dtype= np.int64)
+
+        encoded= self.tokenizer(
+            texts,
+            add_special_tokens= False,
+            return_attention_mask= False,
+            return_token_type_ids= False
+        )["input_ids"]
+
+        return np.fromiter((len(ids) for ids in encoded), dtype= np.int64, count= len(texts))
+
+    def _make_chunk(self, sentences: List[str], lang: str) -> Dict:
+        chunk_text= " ".join(sentences)
+        return {
+            "id": self._hash(text= chunk_text),
+            "text": chunk_text,
+            "lang": lang
+        }
+
+    def iter_section_chunks(self, sentences: List[str], lang: str) -> Iterator[Dict]:
+        """
+        Token-bounded, overlapping windows over the sentences of one section.
+
+        Sentences are tokenized once; window and overlap sizes come from prefix
+        sums of the per-sentence counts, so the cost is linear in the section.
+        """
+        started= time.perf_counter()
+        counts= self._count_tokens_batch(texts= sentences)
+        self._record(stage= "tokenize", seconds= time.perf_counter()- started, sentences= len(sentences))
+        prefix= np.concatenate([[0], np.cumsum(counts)])
+
+        start= 0 # The current group is sentences[start:i]
+        current_token= 0
+
+        for i, sent_token_count in enumerate(counts):
+            if current_token+ sent_token_count> self.max_tokens:
+                yield self._make_chunk(sentences= sentences[start:i], lang= lang)
+
+                # Overlap handling (overlap_n == 0 keeps the whole group, as
+                # `current_group[-0:]` always did)
+                overlap_n= int((i- start)* self.overlap_ratio)
+                if overlap_n> 0:
+                    start= i- overlap_n
+                current_token= int(prefix[i]- prefix[start])
+
+            current_token+= int(sent_token_count)
+
+        if start< len(sentences):
+            yield self._make_chunk(sentences= sentences[start:], lang= lang)
+
+    def iter_windows(self, counts: np.ndarray, max_tokens= None, overlap_ratio= None) -> Iterator[Tuple[int, int]]:
+        """
+        (start, end) bounds of token-bounded, overlapping windows over items with
+        the given token counts. Unlike `iter_section_chunks`, an item that does
+        not fit next to the overlap drops it, and an over-long item is a window
+        of its own.
+        """
+        max_tokens= max_tokens or self.max_tokens
+        overlap_ratio= self.overlap_ratio if overlap_ratio is None else overlap_ratio
+        prefix= np.concatenate([[0], np.cumsum(counts)])
+
+        start= 0
+        for i in range(len(counts)):
+            if i> start and prefix[i+ 1]- prefix[start]> max_tokens:
+                yield start, i
+
+                start= i- int((i- start)* overlap_ratio)
+                while start< i and prefix[i+ 1]- prefix[start]> max_tokens:
+                    start+= 1
+
+        if start< len(counts):
+            yield start, len(counts)
+
+    def iter_chunks(self, text: str) -> Iterator[Dict]:
         sections= self.heading_split(text= text)
 
-        all_chunks= []
-        for sec in sections:
-            sentences= self.split_sentences(text= sec, lang= lang)
-            current_group= []
-            current_token= 0
-
-            for sent in sentences:
-                sent_token_count= self._count_tokens(text= sent)
-
-                if current_token+ sent_token_count> self.max_tokens:
-                    chunk_text= " ".join(current_group)
-                    all_chunks.append({
-                        "id": self._hash(text= chunk_text),
-                        "text": chunk_text,
-                        "lang": lang
-                    })
-
-                    # Overlap handling
-                    overlap_n= int(len(current_group)* self.overlap_ratio)
-                    current_group= current_group[-overlap_n:]
-                    current_token= self._count_tokens(" ".join(current_group))
-
-                current_group.append(sent)
-                current_token+= sent_token_count
-
-            if current_group:
-                chunk_text= " ".join(current_group)
-                all_chunks.append({
-                    "id": self._hash(text= chunk_text),
-                    "text": chunk_text,
-                    "lang": lang
-                })
-
-        return all_chunks
-                
\ No newline at end of file
+        # Mixed-language files: detect each section on its own
+        if self.per_section_lang:
+            langs= [self.detect_lang(text= sec) for sec in sections]
+        else:
+            langs= [self.detect_lang(text= text)]* len(sections)
+
+        for sentences, lang in zip(self.iter_split_sentences(sections= sections, langs= langs), langs):
+            yield from self.iter_section_chunks(sentences= sentences, lang= lang)
+
+    def iter_chunks_stream(self, parts: Iterable[str]) -> Iterator[Dict]:
+        """
+        Chunk a stream of text parts (e.g. PDF pages from TextExtractor) without
+        joining the whole document. The document language is detected on its
+        first `lang_sample_chars` characters.
+        """
+        parts= iter(parts)
+
+        head= []
+        size= 0
+        for part in parts:
+            head.append(part)
+            size+= len(part)
+            if size>= self.lang_sample_chars:
+                break
+
+        doc_lang= None if self.per_section_lang else self.detect_lang(text= "\n".join(head))
+
+        for sec in self.iter_sections(parts= itertools.chain(head, parts)):
+            lang= doc_lang or self.detect_lang(text= sec)
+            sentences= next(self.iter_split_sentences(sections= [sec], langs= [lang]))
+            yield from self.iter_section_chunks(sentences= sentences, lang= lang)
+
+    def chunk_text(self, text: str) -> List[Dict]:
+        return list(self.iter_chunks(text= text))
@@ -1,25 +1,181 @@
+import configparser
 import numpy as np
 
 from typing import List
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from process.model_registry import registry
+from process.embedding_cache import EmbeddingCache
+from process.telemetry import telemetry
 
 class Embedder:
-    def __init__(self, model_name= "jinaai/jina-embeddings-v3"):
+    def __init__(self, model_name= "jinaai/jina-embeddings-v3", device= None, precision= "float32",
+                 dim= None, cache_capacity= 0, cache_dtype= "float32", backend= None, priority= "bulk"):
         BASE_DIR= Path(__file__).resolve().parent # Get the current folder
         cache_dir= BASE_DIR / "../.cache/models"
-        self.model= SentenceTransformer(
+
+        config= configparser.ConfigParser()
+        config.read(BASE_DIR / "../.config/creds.env")
+
+        self.model_name= model_name
+
+        # "sentence_transformers" (default), "onnx" (int8, CPU only) or "remote"
+        # (the host's process.embedding_server), from [EMBEDDING] BACKEND unless given
+        self.backend= backend or config.get("EMBEDDING", "BACKEND", fallback= "sentence_transformers")
+
+        # jina-embeddings-v3 LoRA adapter, the same on every local backend so
+        # switching backends keeps the vector space; empty for models without tasks
+        self.task= config.get("EMBEDDING", "TASK", fallback= "text-matching") or None
+
+        if self.backend== "sentence_transformers":
+            # One model per (model, device, precision) for the whole process
+            self.key= ("sentence_transformer", model_name, device or "auto", precision)
+            cache_name= f"{model_name}-{self.task}" if self.task else model_name
+            loader= lambda: self._load(
+                model_name= model_name,
+                cache_dir= cache_dir,
+                device= device,
+                precision= precision
+            )
+        elif self.backend== "onnx":
+            threads= config.getint("EMBEDDING", "ONNX_THREADS", fallback= 0)
+            quantize= config.getboolean("EMBEDDING", "ONNX_QUANTIZE", fallback= True)
+            self.key= ("onnx_encoder", model_name, threads, quantize, self.task)
+            # int8 vectors differ slightly, never mix them with full precision ones in the cache
+            cache_name= f"{model_name}-{self.task}" if self.task else model_name
+            cache_name= f"{cache_name}-onnx-int8" if quantize else f"{cache_name}-onnx"
+            loader= lambda: self._load_onnx(
+                model_name= model_name,
+                cache_dir= cache_dir,
+                threads= threads,
+                quantize= quantize,
+                task= self.task,
+                max_length= config.getint("EMBEDDING", "ONNX_MAX_LENGTH", fallback= 512),
+                max_batch_tokens= config.getint("EMBEDDING", "ONNX_MAX_BATCH_TOKENS", fallback= 8192)
+            )
+        elif self.backend== "remote":
+            # `priority` is "interactive" for user queries, "bulk" for ingestion
+            socket_path= config.get("EMBEDDING_SERVER", "SOCKET", fallback= str(BASE_DIR / "../data/embedding.sock"))
+            self.key= ("remote_encoder", socket_path, priority)
+            loader= lambda: self._load_remote(
+                socket_path= socket_path,
+                priority= priority,
+                timeout= config.getfloat("EMBEDDING_SERVER", "TIMEOUT", fallback= 60.0)
+            )
+        else:
+            raise ValueError(f"Unknown embedding backend: {self.backend}")
+
+        self.model= registry.acquire(key= self.key, loader= loader)
+        if self.backend== "remote":
+            if self.model.model_name!= model_name:
+                registry.release(key= self.key)
+                raise ValueError(f"Embedding server runs {self.model.model_name}, not {model_name}")
+            cache_name= self.model.cache_name # Whatever backend the server runs
+        self.cache_name= cache_name
+        self.full_dim= self.model.get_sentence_embedding_dimension()
+
+        # Matryoshka truncation: jina-embeddings-v3 keeps most of its quality at
+        # 512/256/128 dims, the same model instance serves every output size
+        self.dim= min(dim or self.full_dim, self.full_dim)
+
+        # Optional persistent cache keyed by chunk hash (ingestion side only)
+        self.cache= None
+        if cache_capacity> 0:
+            self.cache= EmbeddingCache(
+                model_name= cache_name,
+                dim= self.dim,
+                dtype= cache_dtype,
+                capacity= cache_capacity
+            )
+
+    @staticmethod
+    def _load(model_name, cache_dir, device, precision):
+        # Imported here so ONNX-only hosts never load torch
+        from sentence_transformers import SentenceTransformer
+
+        model= SentenceTransformer(
             model_name,
             cache_folder= cache_dir,
+            device= device,
             trust_remote_code= True
         )
 
-    def encode(self, texts: List[str]):
-        vectors= self.model.encode(
-            sentences= texts,
-            normalize_embeddings= True,
-            convert_to_numpy= True,
-            show_progress_bar= False
+        if precision== "float16":
+            model.half()
+
+        return model
+
+    @staticmethod
+    def _load_onnx(model_name, cache_dir, threads, quantize, task, max_length, max_batch_tokens):
+        from process.onnx_embedding import OnnxEncoder
+
+        return OnnxEncoder(
+            model_name= model_name,
+            cache_dir= cache_dir,
+            threads= threads,
+            quantize= quantize,
+            task= task,
+            max_length= max_length,
+            max_batch_tokens= max_batch_tokens
         )
 
-        return vectors
\ No newline at end of file
+    @staticmethod
+    def _load_remote(socket_path, priority, timeout):
+        from process.embedding_server import RemoteEncoder
+
+        return RemoteEncoder(socket_path= socket_path, priority= priority, timeout= timeout)
+
+    def _encode(self, texts: List[str]):
+        # The ONNX encoder fixes its task when loaded, the server uses its own
+        kwargs= {"task": self.task} if self.backend== "sentence_transformers" and self.task else {}
+        with telemetry.span(stage= "embed", n_texts= len(texts)):
+            vectors= self.model.encode(
+                sentences= texts,
+                normalize_embeddings= True,
+                convert_to_numpy= True,
+                show_progress_bar= False,
+                **kwargs
+            )
+        telemetry.count(name= "texts_embedded", value= len(texts))
+
+        if self.dim< self.full_dim:
+            vectors= self.truncate(vectors= vectors, dim= self.dim)
+
+        return vectors
+
+    @staticmethod
+    def truncate(vectors: np.ndarray, dim: int) -> np.ndarray:
+        """
+        Keep the first `dim` Matryoshka dimensions and re-normalize.
+        """
+        vectors= np.ascontiguousarray(vectors[:, :dim], dtype= np.float32)
+        norms= np.linalg.norm(vectors, axis= 1, keepdims= True)
+        return vectors/ np.maximum(norms, 1e-12)
+
+    def encode(self, texts: List[str], keys: List[str]= None):
+        """
+        Encode texts. When content `keys` (chunk hashes) are given and the cache
+        is enabled, cached vectors are reused and only misses go to the model.
+        """
+        if self.cache is None or keys is None:
+            return self._encode(texts= texts)
+
+        hit_mask, cached= self.cache.get_many(keys= keys)
+        telemetry.count(name= "embedding_cache_hits", value= int(hit_mask.sum()))
+        vectors= np.empty((len(texts), self.dim), dtype= np.float32)
+        vectors[hit_mask]= cached
+
+        miss_idx= np.flatnonzero(~hit_mask)
+        if len(miss_idx)> 0:
+            computed= self._encode(texts= [texts[i] for i in miss_idx])
+            vectors[miss_idx]= computed
+            self.cache.put_many(keys= [keys[i] for i in miss_idx], vectors= computed)
+
+        return vectors
+
+    def close(self):
+        """
+        Release this handle on the shared model.
+        """
+        if self.model is not None:
+            registry.release(key= self.key)
+            self.model= None
@@ -0,0 +1,221 @@
+import os, re, json, time, sqlite3, threading
+import numpy as np
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+from process.mmap_matrix import MmapMatrix
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+
+    Vectors live in a memory-mapped (rows, dim) matrix (float32 or int8) and the
+    chunk hash -> (row, last used time) mapping in a SQLite index next to it,
+    together with the row count and the free rows. One cache directory per
+    (model name, dimension, dtype). When `capacity` rows are used the least
+    recently used entries are evicted and their rows reused.
+
+    The bot and the ingestion orchestrator share the same files, so rows are
+    handed out in a BEGIN IMMEDIATE transaction on the index, never from
+    per-process state, and lookups always go to the index.
+    """
+    def __init__(self, model_name: str, dim: int, dtype= "float32", capacity= 200_000, cache_dir= None,
+                 busy_timeout= 30):
+        BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported cache dtype: {dtype}")
+
+        self.model_name= model_name
+        self.dim= dim
+        self.dtype= dtype
+        self.capacity= capacity
+
+        safe_name= re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        root= Path(cache_dir) if cache_dir else BASE_DIR / "../.cache/embeddings"
+        self.path= root / f"{safe_name}_{dim}_{dtype}"
+        os.makedirs(self.path, exist_ok= True)
+
+        self.vectors_path= self.path / "vectors.dat"
+        self.index_path= self.path / "index.sqlite"
+
+        # One connection, used under `_lock`
+        self._lock= threading.Lock()
+        self.db= sqlite3.connect(self.index_path, timeout= busy_timeout, isolation_level= None, check_same_thread= False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER, tick REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_tick ON entries (tick)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+
+        self._migrate(json_path= self.path / "index.json")
+        self.matrix= MmapMatrix(
+            path= self.vectors_path,
+            dim= dim,
+            dtype= dtype,
+            rows= min(self.capacity, max(self._n_rows(), 1024)),
+            max_rows= capacity
+        )
+
+        self.hits= 0
+        self.misses= 0
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        BEGIN IMMEDIATE takes the write lock up front, so other processes wait
+        (busy_timeout) instead of allocating the same rows.
+        """
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def _n_rows(self) -> int:
+        row= self.db.execute("SELECT value FROM meta WHERE name = 'n_rows'").fetchone()
+        return row[0] if row else 0
+
+    def _migrate(self, json_path: Path):
+        """
+        Import the JSON index written by earlier versions, once, and fill the
+        free row list of indexes that had none.
+        """
+        with self._transaction() as db:
+            if os.path.exists(json_path):
+                with open(json_path, "r", encoding= "utf-8") as f:
+                    index= json.load(f)
+
+                db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    [(key, row, tick) for key, (row, tick) in index["entries"].items()]
+                )
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('n_rows', ?)", (index["n_rows"],))
+
+            if not db.execute("SELECT 1 FROM meta WHERE name = 'free_rows'").fetchone():
+                used= {row for row, in db.execute("SELECT row FROM entries")}
+                db.executemany(
+                    "INSERT OR IGNORE INTO free_rows VALUES (?)",
+                    [(r,) for r in range(self._n_rows()) if r not in used]
+                )
+                db.execute("INSERT INTO meta VALUES ('free_rows', 1)")
+
+        if os.path.exists(json_path):
+            os.remove(json_path)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dtype== "int8":
+            return np.clip(np.rint(vectors* 127.0), -127, 127).astype(np.int8)
+        return vectors.astype(np.float32, copy= False)
+
+    def _decode(self, stored: np.ndarray) -> np.ndarray:
+        if self.dtype== "int8":
+            vectors= stored.astype(np.float32)/ 127.0
+            norms= np.linalg.norm(vectors, axis= 1, keepdims= True)
+            return vectors/ np.maximum(norms, 1e-12)
+        return np.array(stored, dtype= np.float32)
+
+    def _rows(self, keys: List[str]) -> Dict[str, int]:
+        rows= {}
+        for i in range(0, len(keys), 500): # SQLite caps the bound parameters
+            part= keys[i:i+ 500]
+            rows.update(self.db.execute(
+                f"SELECT key, row FROM entries WHERE key IN ({','.join('?'* len(part))})", part
+            ).fetchall())
+        return rows
+
+    def get_many(self, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bulk lookup. Returns (hit_mask, vectors for the hits in key order).
+        """
+        with self._lock:
+            found= self._rows(keys= list(keys))
+            hit_mask= np.array([key in found for key in keys], dtype= bool)
+            if not hit_mask.any():
+                self.misses+= len(keys)
+                return hit_mask, np.empty((0, self.dim), dtype= np.float32)
+
+            hit_keys= [key for key in keys if key in found]
+            rows= np.asarray([found[key] for key in hit_keys])
+            if rows.max()>= self.matrix.rows:
+                self.matrix.reopen() # Grown by another process
+
+            vectors= self._decode(self.matrix.array[rows])
+
+            # Writers drop the entries of rows they reuse before overwriting them,
+            # so rows still mapped to the same keys were read intact
+            current= self._rows(keys= hit_keys)
+            intact= np.array([current.get(key)== found[key] for key in hit_keys], dtype= bool)
+            if not intact.all():
+                hit_mask[np.flatnonzero(hit_mask)[~intact]]= False
+                vectors= vectors[intact]
+
+            self.hits+= int(hit_mask.sum())
+            self.misses+= len(keys)- int(hit_mask.sum())
+
+            # Keep the LRU order across processes and restarts
+            now= time.time()
+            with self._transaction() as db:
+                db.executemany(
+                    "UPDATE entries SET tick = ? WHERE key = ?",
+                    [(now, key) for key, ok in zip(hit_keys, intact) if ok]
+                )
+
+            return hit_mask, vectors
+
+    def _allocate(self, keys: List[str]) -> List[Tuple[str, int]]:
+        """
+        Rows for the `keys` not cached yet: free rows, then new ones, then rows
+        of at least `capacity // 10` evicted least recently used entries.
+        """
+        with self._transaction() as db:
+            cached= self._rows(keys= keys)
+            keys= [key for key in keys if key not in cached]
+            if not keys:
+                return []
+
+            n_rows= self._n_rows()
+            missing= len(keys)- db.execute("SELECT COUNT(*) FROM free_rows").fetchone()[0]- (self.capacity- n_rows)
+            if missing> 0:
+                oldest= db.execute(
+                    "SELECT key, row FROM entries ORDER BY tick LIMIT ?", (max(missing, self.capacity// 10),)
+                ).fetchall()
+                db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in oldest])
+                db.executemany("INSERT INTO free_rows VALUES (?)", [(row,) for _, row in oldest])
+
+            free= [row for row, in db.execute("SELECT row FROM free_rows LIMIT ?", (len(keys),))]
+            db.executemany("DELETE FROM free_rows WHERE row = ?", [(row,) for row in free])
+
+            rows= free+ list(range(n_rows, n_rows+ len(keys)- len(free)))
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('n_rows', ?)", (max(n_rows, max(rows)+ 1),))
+
+        return list(zip(keys, rows))
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        with self._lock:
+            new= {}
+            for key, vector in zip(keys, vectors):
+                new.setdefault(key, vector)
+
+            # Claimed rows belong to no entry until their vectors are written
+            allocated= self._allocate(keys= list(new)[-self.capacity:])
+            if not allocated:
+                return
+
+            rows= np.asarray([row for _, row in allocated])
+            self.matrix.ensure_rows(rows= int(rows.max())+ 1)
+            self.matrix.array[rows]= self._encode(np.asarray([new[key] for key, _ in allocated]))
+            self.matrix.flush()
+
+            now= time.time()
+            with self._transaction() as db:
+                for key, row in allocated:
+                    if not db.execute("INSERT OR IGNORE INTO entries VALUES (?, ?, ?)", (key, row, now)).rowcount:
+                        db.execute("INSERT INTO free_rows VALUES (?)", (row,)) # Cached by another process meanwhile
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
@@ -0,0 +1,284 @@
+"""
+Local embedding server: one model copy per host, shared by the bot and the
+ingestion orchestrator over a Unix socket.
+
+Requests from all connections go through one queue. A batcher thread takes
+what arrives within a short window (up to `max_batch` texts), interactive
+queries before bulk ingestion, and encodes it as one batch. Vectors go back
+as raw float32 bytes, not JSON.
+
+    python -m process.embedding_server
+
+Clients use `Embedder(...)` with [EMBEDDING] BACKEND = remote.
+"""
+import os, json, time, heapq, socket, struct, itertools, threading, configparser, socketserver
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+from process.telemetry import telemetry
+
+PRIORITIES= {"interactive": 0, "bulk": 1}
+BATCH_BUCKETS= (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# ---- wire format: 4-byte header length, JSON header, then `nbytes` raw bytes --
+def send_message(sock: socket.socket, header: Dict, payload: bytes= b""):
+    header= json.dumps({**header, "nbytes": len(payload)}, ensure_ascii= False).encode()
+    sock.sendall(struct.pack(">I", len(header))+ header+ payload)
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf= bytearray()
+    while len(buf)< n:
+        part= sock.recv(n- len(buf))
+        if not part:
+            raise ConnectionError("Embedding server connection closed")
+        buf+= part
+    return bytes(buf)
+
+def recv_message(sock: socket.socket) -> Tuple[Dict, bytes]:
+    (size,)= struct.unpack(">I", _recv_exact(sock= sock, n= 4))
+    header= json.loads(_recv_exact(sock= sock, n= size))
+    return header, _recv_exact(sock= sock, n= header["nbytes"]) if header["nbytes"] else b""
+
+class _Piece:
+    """
+    Up to `max_batch` texts of one request, waiting for their vectors.
+    """
+    def __init__(self, texts: List[str]):
+        self.texts= texts
+        self.done= threading.Event()
+        self.vectors= None
+        self.error= None
+
+class EmbeddingServer:
+    """
+    Micro-batching front of a local `Embedder` (full dimension, no cache:
+    clients truncate and cache on their side).
+    """
+    def __init__(self, embedder, socket_path, max_batch= 64, window_ms= 5.0):
+        self.embedder= embedder
+        self.socket_path= str(socket_path)
+        self.max_batch= max_batch
+        self.window= window_ms/ 1000
+
+        self._heap= []
+        self._seq= itertools.count()
+        self._queued_texts= 0
+        self._cond= threading.Condition()
+        self._running= False
+        self._server= None
+
+    # ---- queue -------------------------------------------------------------
+    def submit(self, texts: List[str], priority= "bulk") -> np.ndarray:
+        """
+        Encode `texts` along with whatever else is queued; blocks until done.
+        Large requests are split so interactive queries can pass them.
+        """
+        if not texts:
+            return np.zeros((0, self.embedder.dim), dtype= np.float32)
+
+        rank= PRIORITIES.get(priority, PRIORITIES["bulk"])
+        pieces= [_Piece(texts= texts[i:i+ self.max_batch]) for i in range(0, len(texts), self.max_batch)]
+
+        with self._cond:
+            for piece in pieces:
+                heapq.heappush(self._heap, (rank, next(self._seq), piece))
+                self._queued_texts+= len(piece.texts)
+            self._cond.notify()
+
+        for piece in pieces:
+            piece.done.wait()
+            if piece.error is not None:
+                raise piece.error
+
+        return np.concatenate([piece.vectors for piece in pieces])
+
+    def _next_batch(self) -> List[_Piece]:
+        with self._cond:
+            while self._running and not self._heap:
+                self._cond.wait()
+
+            # Give concurrent callers one window to join the batch
+            deadline= time.monotonic()+ self.window
+            while self._running and self._queued_texts< self.max_batch:
+                remaining= deadline- time.monotonic()
+                if remaining<= 0:
+                    break
+                self._cond.wait(timeout= remaining)
+
+            batch, n_texts= [], 0
+            while self._heap and (not batch or n_texts+ len(self._heap[0][2].texts)<= self.max_batch):
+                piece= heapq.heappop(self._heap)[2]
+                batch.append(piece)
+                n_texts+= len(piece.texts)
+            self._queued_texts-= n_texts
+
+            return batch
+
+    def _batch_loop(self):
+        while self._running:
+            batch= self._next_batch()
+            if not batch:
+                continue
+
+            texts= [t for piece in batch for t in piece.texts]
+            telemetry.observe(name= "embedding_server_batch_texts", value= len(texts), buckets= BATCH_BUCKETS)
+            try:
+                vectors= self.embedder.encode(texts= texts)
+            except Exception as e:
+                print(f"[EmbeddingServer] Error encoding {len(texts)} texts: {e}")
+                for piece in batch:
+                    piece.error= e
+                    piece.done.set()
+                continue
+
+            start= 0
+            for piece in batch:
+                piece.vectors= vectors[start:start+ len(piece.texts)]
+                start+= len(piece.texts)
+                piece.done.set()
+
+    # ---- socket ------------------------------------------------------------
+    def info(self) -> Dict:
+        return {
+            "model": self.embedder.model_name,
+            "cache_name": self.embedder.cache_name,
+            "dim": self.embedder.dim
+        }
+
+    def _handle(self, sock: socket.socket):
+        while True:
+            try:
+                header, _= recv_message(sock= sock)
+            except (ConnectionError, OSError):
+                return
+
+            if header.get("op")== "info":
+                send_message(sock= sock, header= self.info())
+                continue
+
+            try:
+                vectors= self.submit(texts= header["texts"], priority= header.get("priority", "bulk"))
+            except Exception as e:
+                send_message(sock= sock, header= {"error": f"{type(e).__name__}: {e}"})
+                continue
+
+            vectors= np.ascontiguousarray(vectors, dtype= np.float32)
+            send_message(sock= sock, header= {"shape": list(vectors.shape), "dtype": "float32"}, payload= vectors.tobytes())
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path) # Left behind by a previous run
+
+        server= self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle(sock= self.request)
+
+        class _Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads= True
+            request_queue_size= 128 # Every bot and ingestion thread connects at once on startup
+
+        self._running= True
+        threading.Thread(target= self._batch_loop, name= "embedding-batcher", daemon= True).start()
+
+        self._server= _Server(self.socket_path, _Handler)
+        threading.Thread(target= self._server.serve_forever, name= "embedding-server", daemon= True).start()
+        print(f"[EmbeddingServer] Serving {self.embedder.model_name} on {self.socket_path}")
+
+    def shutdown(self):
+        with self._cond:
+            self._running= False
+            self._cond.notify_all()
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server= None
+            os.remove(self.socket_path)
+
+class RemoteEncoder:
+    """
+    Client of `EmbeddingServer`, a drop-in for the parts of
+    `SentenceTransformer` that `Embedder` uses. One connection per thread.
+    """
+    def __init__(self, socket_path, priority= "bulk", timeout= 60.0):
+        self.socket_path= str(socket_path)
+        self.priority= priority
+        self.timeout= timeout
+        self._local= threading.local()
+
+        info= self._call(header= {"op": "info"})[0]
+        self.model_name= info["model"]
+        self.cache_name= info["cache_name"]
+        self.dim= info["dim"]
+
+    def _connect(self) -> socket.socket:
+        sock= socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _call(self, header: Dict) -> Tuple[Dict, bytes]:
+        # Reconnect once, e.g. after the server restarted
+        for attempt in range(2):
+            sock= getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock= self._local.sock= self._connect()
+                send_message(sock= sock, header= header)
+                response, payload= recv_message(sock= sock)
+                break
+            except (ConnectionError, OSError):
+                if sock is not None:
+                    sock.close()
+                self._local.sock= None
+                if attempt== 1:
+                    raise
+
+        if "error" in response:
+            raise RuntimeError(f"Embedding server: {response['error']}")
+        return response, payload
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences: List[str], normalize_embeddings= True, convert_to_numpy= True,
+               show_progress_bar= False, **kwargs) -> np.ndarray:
+        """
+        Vectors come back L2-normalized at the server's full dimension.
+        """
+        response, payload= self._call(header= {"op": "encode", "texts": list(sentences), "priority": self.priority})
+        return np.frombuffer(payload, dtype= np.float32).reshape(response["shape"]).copy()
+
+def main():
+    from process.embedding import Embedder
+
+    BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+    config= configparser.ConfigParser()
+    config.read(BASE_DIR / "../.config/creds.env")
+
+    backend= config.get("EMBEDDING_SERVER", "BACKEND", fallback= "sentence_transformers")
+    if backend== "remote":
+        raise ValueError("The embedding server needs a local backend")
+
+    server= EmbeddingServer(
+        embedder= Embedder(backend= backend),
+        socket_path= config.get("EMBEDDING_SERVER", "SOCKET", fallback= str(BASE_DIR / "../data/embedding.sock")),
+        max_batch= config.getint("EMBEDDING_SERVER", "MAX_BATCH", fallback= 64),
+        window_ms= config.getfloat("EMBEDDING_SERVER", "WINDOW_MS", fallback= 5.0)
+    )
+    server.start()
+
+    metrics_port= config.getint("EMBEDDING_SERVER", "METRICS_PORT", fallback= 0)
+    if metrics_port:
+        telemetry.serve(port= metrics_port)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__== "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os, json, time, hashlib, multiprocessing
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource= None
+
+class ExtractionError(Exception):
+    pass
+
+# ---- worker side (module level so the process pool can pickle them) ---------
+def _init_worker(max_memory_mb: int):
+    if resource and max_memory_mb:
+        limit= max_memory_mb* 1024* 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _extract_pdf_pages(filepath: str, start: int, end: int) -> List[str]:
+    from PyPDF2 import PdfReader
+
+    pdf= PdfReader(filepath)
+    return [pdf.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _extract_docx(filepath: str) -> List[str]:
+    from docx import Document
+
+    doc= Document(filepath)
+    return [p.text for p in doc.paragraphs]
+
+def _extract_plain(filepath: str) -> List[str]:
+    with open(filepath, encoding= "utf-8", errors= "ignore") as f:
+        return [f.read()]
+
+# ---- parent side ------------------------------------------------------------
+class TextExtractor:
+    """
+    Parallel document extraction.
+
+    Files, and page ranges of large PDFs, are fanned out across a process pool.
+    Text comes back as an ordered stream of parts (PDF pages, DOCX paragraphs)
+    whose "\\n".join is what `DataChunker.file_text_extractor` returns. Each file
+    has a time limit, each worker a memory limit, and extracted parts are cached
+    by file content hash so unchanged files are never parsed again.
+    """
+    def __init__(self, max_workers= None, pages_per_task= 16, timeout= 300, max_memory_mb= 2048, cache_dir= None):
+        BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+        self.max_workers= max_workers or max(1, (os.cpu_count() or 2)- 1)
+        self.pages_per_task= pages_per_task
+        self.timeout= timeout
+        self.max_memory_mb= max_memory_mb
+
+        self.cache_dir= Path(cache_dir) if cache_dir else BASE_DIR / "../.cache/extracted"
+        os.makedirs(self.cache_dir, exist_ok= True)
+
+        self._pool= None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the bot process runs threads, forking it is not safe
+            self._pool= ProcessPoolExecutor(
+                max_workers= self.max_workers,
+                mp_context= multiprocessing.get_context("spawn"),
+                initializer= _init_worker,
+                initargs= (self.max_memory_mb,)
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait= False, cancel_futures= True)
+            self._pool= None
+
+    def _recycle(self, pool: ProcessPoolExecutor):
+        """
+        Kill the workers of `pool` (e.g. one stuck past its timeout) so the
+        next task starts a fresh pool. Tasks still running in it fail with
+        BrokenProcessPool and are resubmitted by their file's stream.
+        """
+        if self._pool is not pool:
+            return # Already replaced by another stream
+
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait= False, cancel_futures= True)
+        self._pool= None
+
+    @staticmethod
+    def file_hash(filepath: str) -> str:
+        h= hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def _cache_path(self, content_hash: str) -> Path:
+        return self.cache_dir / f"{content_hash}.jsonl"
+
+    def _tasks(self, filepath: str) -> List[Tuple]:
+        """
+        The extraction tasks (function, *args) of one file, in part order.
+        """
+        if filepath.endswith(".pdf"):
+            from PyPDF2 import PdfReader
+
+            n_pages= len(PdfReader(filepath).pages)
+            return [
+                (_extract_pdf_pages, filepath, start, min(start+ self.pages_per_task, n_pages))
+                for start in range(0, n_pages, self.pages_per_task)
+            ]
+        elif filepath.endswith(".docx"):
+            return [(_extract_docx, filepath)]
+        else:
+            return [(_extract_plain, filepath)]
+
+    def _submit(self, tasks: List[Tuple]) -> List[Tuple]:
+        """
+        (pool, future) of each task, submitted in order.
+        """
+        pool= self.pool
+        return [(pool, pool.submit(*task)) for task in tasks]
+
+    def _stream(self, filepath: str, content_hash: str, tasks: List[Tuple], futures: List[Tuple]) -> Iterator[str]:
+        """
+        Yield parts as their tasks finish (in order) and write them to the cache.
+        """
+        cache_path= self._cache_path(content_hash= content_hash)
+        tmp_path= f"{cache_path}.tmp"
+        deadline= time.monotonic()+ self.timeout
+        retried= False
+
+        try:
+            with open(tmp_path, "w", encoding= "utf-8") as cache:
+                i= 0
+                while i< len(futures):
+                    pool, future= futures[i]
+                    try:
+                        parts= future.result(timeout= max(0.0, deadline- time.monotonic()))
+                    except FutureTimeoutError:
+                        # Abandoning the future would leave the worker parsing, kill it
+                        self._recycle(pool= pool)
+                        raise ExtractionError(f"Extraction of {filepath} exceeded {self.timeout}s")
+                    except MemoryError:
+                        raise ExtractionError(f"Extraction of {filepath} exceeded {self.max_memory_mb}MB")
+                    except BrokenProcessPool:
+                        # A worker died (killed by the memory limit, or recycled after
+                        # another file's timeout): retry the rest once on a fresh pool
+                        self._recycle(pool= pool)
+                        if retried:
+                            raise ExtractionError(f"Worker crashed while extracting {filepath}")
+                        retried= True
+                        futures[i:]= self._submit(tasks= tasks[i:])
+                        continue
+
+                    i+= 1
+                    for part in parts:
+                        cache.write(json.dumps(part, ensure_ascii= False)+ "\n")
+                        yield part
+
+            os.replace(tmp_path, cache_path)
+        finally:
+            for _, future in futures:
+                future.cancel()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _from_cache(self, cache_path: Path) -> Iterator[str]:
+        with open(cache_path, "r", encoding= "utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    @staticmethod
+    def _failed(filepath: str, error: Exception) -> Iterator[str]:
+        raise ExtractionError(f"Cannot extract {filepath}: {error}")
+        yield # Makes this a generator, so the error surfaces when the file is read
+
+    def _open(self, filepath: str) -> Iterator[str]:
+        try:
+            content_hash= self.file_hash(filepath= filepath)
+            cache_path= self._cache_path(content_hash= content_hash)
+
+            if os.path.exists(cache_path):
+                return self._from_cache(cache_path= cache_path)
+
+            tasks= self._tasks(filepath= filepath)
+            futures= self._submit(tasks= tasks)
+        except Exception as e:
+            return self._failed(filepath= filepath, error= e)
+
+        return self._stream(filepath= filepath, content_hash= content_hash, tasks= tasks, futures= futures)
+
+    def iter_file_text(self, filepath: str) -> Iterator[str]:
+        """
+        Ordered text parts of one file.
+        """
+        yield from self._open(filepath= filepath)
+
+    def iter_many(self, filepaths: List[str], prefetch= None) -> Iterator[Tuple[str, Iterator[str]]]:
+        """
+        Yield (filepath, parts) in order while the next `prefetch` files are
+        already being extracted by the pool.
+        """
+        prefetch= prefetch or self.max_workers
+        pending= deque()
+        paths= iter(filepaths)
+
+        def _fill():
+            while len(pending)< prefetch:
+                filepath= next(paths, None)
+                if filepath is None:
+                    return
+                pending.append((filepath, self._open(filepath= filepath)))
+
+        _fill()
+        while pending:
+            filepath, parts= pending.popleft()
+            _fill()
+            yield filepath, parts
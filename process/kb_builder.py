@@ -14,7 +14,7 @@ class KBBuilder:
         """
         out= []
         for sec in sections:
-            out.append(f"# {sec["title"]}")
+            out.append(f"# {sec['title']}")
             out.append(sec["content"])
             out.append("\n")
 
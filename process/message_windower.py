@@ -0,0 +1,73 @@
+from typing import Dict, List
+
+class MessageWindower:
+    """
+    Groups Slack messages into conversations and cuts them into token-bounded
+    windows for embedding.
+
+    A conversation is either a thread (parent + replies) or a session of
+    top-level messages without gaps longer than `gap_seconds`. Windows reuse
+    the chunker's batched token counts and window bounds.
+    """
+    def __init__(self, chunker, max_tokens= 512, overlap_ratio= 0.1, gap_seconds= 1800):
+        self.chunker= chunker
+        self.max_tokens= max_tokens
+        self.overlap_ratio= overlap_ratio
+        self.gap_seconds= gap_seconds
+
+    @staticmethod
+    def thread_source_id(channel_id: str, thread_ts: str) -> str:
+        return f"msg:{channel_id}:t{thread_ts}"
+
+    @staticmethod
+    def session_source_id(channel_id: str, start_ts: str) -> str:
+        return f"msg:{channel_id}:s{start_ts}"
+
+    @staticmethod
+    def format(message: Dict) -> str:
+        return f"{message.get('user') or 'unknown'}: {message.get('text') or ''}"
+
+    def is_thread_message(self, message: Dict, thread_roots: set) -> bool:
+        return bool(message.get("thread_ts")) or message["ts"] in thread_roots
+
+    def conversations(self, messages: List[Dict], thread_roots: set) -> Dict[str, List[Dict]]:
+        """
+        Messages of one channel grouped by conversation source id, each in ts order.
+        `thread_roots` are the ts of messages that have replies.
+        """
+        messages= sorted((m for m in messages if m.get("text")), key= lambda m: float(m["ts"]))
+        result= {}
+        session= None
+
+        for m in messages:
+            if self.is_thread_message(message= m, thread_roots= thread_roots):
+                key= self.thread_source_id(channel_id= m["channel_id"], thread_ts= m.get("thread_ts") or m["ts"])
+                result.setdefault(key, []).append(m)
+            elif session and float(m["ts"])- float(session[-1]["ts"])<= self.gap_seconds:
+                session.append(m)
+            else:
+                session= [m]
+                result[self.session_source_id(channel_id= m["channel_id"], start_ts= m["ts"])]= session
+
+        return result
+
+    def windows(self, messages: List[Dict]) -> List[Dict]:
+        """
+        Token-bounded windows over one conversation, with their ts range and users.
+        """
+        lines= [self.format(message= m) for m in messages]
+        counts= self.chunker._count_tokens_batch(texts= lines)
+
+        windows= []
+        for start, end in self.chunker.iter_windows(counts= counts, max_tokens= self.max_tokens, overlap_ratio= self.overlap_ratio):
+            text= "\n".join(lines[start:end])
+            windows.append({
+                "id": self.chunker._hash(text= text),
+                "text": text,
+                "ts_start": messages[start]["ts"],
+                "ts_end": messages[end- 1]["ts"],
+                "users": sorted({m.get("user") for m in messages[start:end] if m.get("user")}),
+                "n_messages": end- start
+            })
+
+        return windows
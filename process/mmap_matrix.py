@@ -0,0 +1,63 @@
+import os
+import numpy as np
+
+from pathlib import Path
+
+class MmapMatrix:
+    """
+    Growable (rows, dim) matrix backed by a raw memory-mapped file.
+
+    The file is extended in place (doubling) when more rows are needed, so
+    existing rows are never copied through Python.
+    """
+    def __init__(self, path, dim: int, dtype= "float32", rows= 1024, max_rows= None):
+        self.path= Path(path)
+        self.dim= dim
+        self.dtype= np.dtype(dtype)
+        self.max_rows= max_rows
+        self._open(rows= rows)
+
+    def _open(self, rows: int):
+        needed= rows* self.dim* self.dtype.itemsize
+
+        if os.path.exists(self.path):
+            # Never shrink: another writer may already have grown the file
+            rows= max(rows, os.path.getsize(self.path)// (self.dim* self.dtype.itemsize))
+            if os.path.getsize(self.path)< needed:
+                with open(self.path, "r+b") as f:
+                    f.truncate(needed)
+            mode= "r+"
+        else:
+            mode= "w+"
+
+        self.array= np.memmap(self.path, dtype= self.dtype, mode= mode, shape= (rows, self.dim))
+
+    @property
+    def rows(self) -> int:
+        return self.array.shape[0]
+
+    def ensure_rows(self, rows: int):
+        """
+        Make sure at least `rows` rows exist (doubling, capped at max_rows).
+        """
+        if rows<= self.rows:
+            return
+
+        new_rows= max(rows, self.rows* 2)
+        if self.max_rows:
+            new_rows= min(self.max_rows, new_rows)
+
+        self.array.flush()
+        del self.array
+        self._open(rows= new_rows)
+
+    def reopen(self):
+        """
+        Re-map the file, picking up growth done by another process.
+        """
+        rows= self.rows
+        del self.array
+        self._open(rows= rows)
+
+    def flush(self):
+        self.array.flush()
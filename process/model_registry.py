@@ -0,0 +1,98 @@
+import gc, threading, time
+
+from typing import Any, Callable, Dict, Hashable, List
+
+class ModelRegistry:
+    """
+    Process-wide, thread-safe registry of heavy models (embedding models,
+    tokenizers, spaCy pipelines).
+
+    Every key, e.g. ("sentence_transformer", model_name, device, precision), is
+    loaded exactly once and shared by all callers. Callers `acquire` and `release`
+    instances. Models no one holds can be dropped with `unload_idle`.
+    """
+    def __init__(self):
+        self._lock= threading.Lock()
+        self._entries: Dict[Hashable, Dict]= {}
+        self._loading: Dict[Hashable, threading.Lock]= {}
+
+    def acquire(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the shared instance for `key`, calling `loader()` only on first use.
+        """
+        with self._lock:
+            entry= self._entries.get(key)
+            if entry is not None:
+                entry["refs"]+= 1
+                entry["last_used"]= time.time()
+                return entry["model"]
+
+            # One lock per key so two threads never load the same model twice,
+            # while different models can still load in parallel
+            key_lock= self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry= self._entries.get(key)
+                if entry is not None:
+                    entry["refs"]+= 1
+                    entry["last_used"]= time.time()
+                    return entry["model"]
+
+            print(f"[ModelRegistry] Loading {key}")
+            model= loader()
+
+            with self._lock:
+                self._entries[key]= {
+                    "model": model,
+                    "refs": 1,
+                    "last_used": time.time()
+                }
+                self._loading.pop(key, None)
+
+        return model
+
+    def release(self, key: Hashable):
+        with self._lock:
+            entry= self._entries.get(key)
+            if entry is None:
+                return
+
+            entry["refs"]= max(0, entry["refs"]- 1)
+            entry["last_used"]= time.time()
+
+    def unload_idle(self, max_idle: float= 0) -> List[Hashable]:
+        """
+        Drop models with no holders that have been idle for at least `max_idle` seconds.
+        """
+        now= time.time()
+        unloaded= []
+
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["refs"]== 0 and now- entry["last_used"]>= max_idle:
+                    del self._entries[key]
+                    unloaded.append(key)
+
+        if unloaded:
+            gc.collect()
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+            print(f"[ModelRegistry] Unloaded {unloaded}")
+
+        return unloaded
+
+    def stats(self) -> Dict[Hashable, int]:
+        """
+        Loaded keys and their current reference counts.
+        """
+        with self._lock:
+            return {key: entry["refs"] for key, entry in self._entries.items()}
+
+# Shared by the whole process
+registry= ModelRegistry()
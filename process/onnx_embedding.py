@@ -0,0 +1,168 @@
+import os, re, json
+import numpy as np
+import onnxruntime as ort
+
+from pathlib import Path
+from typing import Dict, List
+from huggingface_hub import snapshot_download
+from transformers import AutoTokenizer
+from process.telemetry import telemetry
+
+class OnnxEncoder:
+    """
+    CPU sentence encoder on ONNX Runtime, a drop-in for the parts of
+    `SentenceTransformer` that `Embedder` uses (`encode`,
+    `get_sentence_embedding_dimension`).
+
+    Uses the ONNX export shipped in the model repo (`onnx/model.onnx`), with its
+    weights dynamically quantized to int8 once and cached next to it. Inputs are
+    sorted by token length and cut into batches of similar length, each padded
+    only to its own longest text. Batches are capped by padded tokens as well as
+    by count, so short texts go through in large batches and long ones in small.
+    """
+    def __init__(self, model_name: str, cache_dir, threads= 0, quantize= True, max_length= 512,
+                 max_batch_tokens= 8192, task= "text-matching"):
+        self.model_name= model_name
+        self.max_batch_tokens= max_batch_tokens
+
+        self.model_dir= Path(snapshot_download(
+            repo_id= model_name,
+            cache_dir= cache_dir,
+            allow_patterns= ["*.json", "*.txt", "*.model", "1_Pooling/*", "onnx/model.onnx", "onnx/model.onnx_data"]
+        ))
+
+        onnx_path= self.model_dir / "onnx/model.onnx"
+        if not onnx_path.exists():
+            raise FileNotFoundError(
+                f"{model_name} has no onnx/model.onnx, export one first "
+                f"(e.g. `optimum-cli export onnx --model {model_name} <dir>`)"
+            )
+
+        if quantize:
+            safe_name= re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+            onnx_path= self._quantize(
+                source= onnx_path,
+                target= Path(cache_dir) / "onnx" / safe_name / "model_int8.onnx"
+            )
+
+        self.tokenizer= AutoTokenizer.from_pretrained(self.model_dir)
+        self.max_length= min(max_length, self._read_json(name= "sentence_bert_config.json").get("max_seq_length", max_length))
+        self.pooling= "cls" if self._read_json(name= "1_Pooling/config.json").get("pooling_mode_cls_token") else "mean"
+
+        options= ort.SessionOptions()
+        options.intra_op_num_threads= threads or os.cpu_count()
+        options.inter_op_num_threads= 1
+        options.graph_optimization_level= ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session= ort.InferenceSession(str(onnx_path), sess_options= options, providers= ["CPUExecutionProvider"])
+        self.input_names= {i.name for i in self.session.get_inputs()}
+
+        # jina-embeddings-v3 selects its LoRA adapter with a task id input; `Embedder`
+        # passes the same [EMBEDDING] TASK to sentence-transformers
+        self.task_id= None
+        if "task_id" in self.input_names:
+            adaptations= self._read_json(name= "config.json").get("lora_adaptations", [])
+            if task not in adaptations:
+                raise ValueError(f"{model_name} has no task {task!r}, expected one of {adaptations}")
+            self.task_id= np.array(adaptations.index(task), dtype= np.int64)
+
+        self.dim= self._embed_batch(texts= ["dimension probe"]).shape[1]
+
+    def _read_json(self, name: str) -> Dict:
+        path= self.model_dir / name
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding= "utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _quantize(source: Path, target: Path) -> Path:
+        """
+        int8 dynamic quantization of the MatMul weights, done once per model.
+        """
+        if target.exists():
+            return target
+
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        os.makedirs(target.parent, exist_ok= True)
+        print(f"[OnnxEncoder] Quantizing {source} to int8")
+        quantize_dynamic(
+            model_input= str(source),
+            model_output= str(target),
+            weight_type= QuantType.QInt8,
+            use_external_data_format= (source.parent / "model.onnx_data").exists(),
+            extra_options= {"MatMulConstBOnly": True}
+        )
+        return target
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encoded= self.tokenizer(
+            texts,
+            padding= True,
+            truncation= True,
+            max_length= self.max_length,
+            return_tensors= "np"
+        )
+        inputs= {name: encoded[name].astype(np.int64) for name in ("input_ids", "attention_mask", "token_type_ids")
+                 if name in self.input_names and name in encoded}
+        if self.task_id is not None:
+            inputs["task_id"]= self.task_id
+
+        output= self.session.run(None, inputs)[0]
+        if output.ndim== 2: # Already pooled
+            return output.astype(np.float32)
+
+        if self.pooling== "cls":
+            return output[:, 0].astype(np.float32)
+
+        mask= encoded["attention_mask"][:, :, None].astype(np.float32)
+        return ((output* mask).sum(axis= 1)/ np.maximum(mask.sum(axis= 1), 1e-9)).astype(np.float32)
+
+    def _buckets(self, lengths: List[int], batch_size: int) -> List[List[int]]:
+        """
+        Indices of the texts grouped by length (shortest first), each group at
+        most `batch_size` texts and `max_batch_tokens` once padded.
+        """
+        order= np.argsort(lengths, kind= "stable")
+        batches, current= [], []
+
+        for i in order:
+            # Sorted ascending, so the newest text sets the padded length
+            padded= (len(current)+ 1)* lengths[i]
+            if current and (len(current)>= batch_size or padded> self.max_batch_tokens):
+                batches.append(current)
+                current= []
+            current.append(int(i))
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def encode(self, sentences: List[str], batch_size= 128, normalize_embeddings= False, convert_to_numpy= True,
+               show_progress_bar= False) -> np.ndarray:
+        if not sentences:
+            return np.zeros((0, self.dim), dtype= np.float32)
+
+        lengths= [
+            len(ids)
+            for ids in self.tokenizer(list(sentences), truncation= True, max_length= self.max_length)["input_ids"]
+        ]
+
+        vectors= np.empty((len(sentences), self.dim), dtype= np.float32)
+        padded_tokens= 0
+        for batch in self._buckets(lengths= lengths, batch_size= batch_size):
+            vectors[batch]= self._embed_batch(texts= [sentences[i] for i in batch])
+            padded_tokens+= len(batch)* max(lengths[i] for i in batch)
+
+        # How much padding the bucketing leaves
+        telemetry.count(name= "embedding_tokens", value= sum(lengths), kind= "text")
+        telemetry.count(name= "embedding_tokens", value= padded_tokens- sum(lengths), kind= "padding")
+
+        if normalize_embeddings:
+            vectors/= np.maximum(np.linalg.norm(vectors, axis= 1, keepdims= True), 1e-12)
+
+        return vectors
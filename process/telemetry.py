@@ -0,0 +1,232 @@
+import os, json, time, bisect, threading, contextvars
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets, +Inf is implicit
+LATENCY_BUCKETS= (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans of the trace being recorded in the current context (one Slack request)
+_current_trace: contextvars.ContextVar= contextvars.ContextVar("trace", default= None)
+_current_span: contextvars.ContextVar= contextvars.ContextVar("span", default= None)
+
+def timed_iter(iterable: Iterable, clock: Dict) -> Iterator:
+    """
+    Yield from `iterable`, adding the time spent producing each item (not the
+    time the consumer holds it) to clock["seconds"].
+    """
+    it= iter(iterable)
+    while True:
+        started= time.perf_counter()
+        try:
+            item= next(it)
+        except StopIteration:
+            return
+        finally:
+            clock["seconds"]= clock.get("seconds", 0.0)+ time.perf_counter()- started
+        yield item
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets= buckets
+        self.counts= [0]* (len(buckets)+ 1)
+        self.sum= 0.0
+        self.count= 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)]+= 1
+        self.sum+= value
+        self.count+= 1
+
+class Telemetry:
+    """
+    Process-wide counters, latency histograms and per-request traces.
+
+    `span(stage)` times a block into the `stage_seconds` histogram and, inside
+    `trace(...)`, records it (nested under the enclosing span) in that request's
+    trace, which is written as one JSON line when trace logging is enabled.
+    Metrics are rendered in the Prometheus text format and can be served on a
+    local endpoint with `serve`.
+    """
+    def __init__(self, namespace= "slack_rag"):
+        self.namespace= namespace
+        self._lock= threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float]= {}
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram]= {}
+
+        self.trace_dir: Optional[Path]= None
+        self._server= None
+
+    def configure(self, trace_dir= None):
+        """
+        Write a JSON trace per request to `trace_dir` (None disables).
+        """
+        self.trace_dir= Path(trace_dir) if trace_dir else None
+        if self.trace_dir:
+            os.makedirs(self.trace_dir, exist_ok= True)
+
+    # ---- metrics -----------------------------------------------------------
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def count(self, name: str, value: float= 1, **labels):
+        key= self._key(name= name, labels= labels)
+        with self._lock:
+            self._counters[key]= self._counters.get(key, 0)+ value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...]= LATENCY_BUCKETS, **labels):
+        key= self._key(name= name, labels= labels)
+        with self._lock:
+            histogram= self._histograms.get(key)
+            if histogram is None:
+                histogram= self._histograms[key]= _Histogram(buckets= buckets)
+            histogram.observe(value= value)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(self._key(name= name, labels= labels), 0)
+
+    # ---- spans and traces --------------------------------------------------
+    @contextmanager
+    def span(self, stage: str, **attrs) -> Iterator[Dict]:
+        """
+        Time a block as `stage`. The yielded dict's entries are added to the
+        span in the trace (e.g. sizes only known at the end).
+        """
+        trace= _current_trace.get()
+        parent= _current_span.get()
+        record= {"stage": stage, "parent": parent["stage"] if parent else None, **attrs}
+        token= _current_span.set(record) if trace is not None else None
+
+        started= time.perf_counter()
+        error= None
+        try:
+            yield record
+        except BaseException as e:
+            error= type(e).__name__
+            raise
+        finally:
+            seconds= time.perf_counter()- started
+            self.observe(name= "stage_seconds", value= seconds, stage= stage)
+            if error:
+                self.count(name= "stage_errors", stage= stage, error= error)
+
+            if trace is not None:
+                _current_span.reset(token)
+                record["start_ms"]= round((started- trace["_started"])* 1000, 3)
+                record["ms"]= round(seconds* 1000, 3)
+                if error:
+                    record["error"]= error
+                trace["spans"].append(record)
+
+    @contextmanager
+    def trace(self, request_id: str= None, **attrs) -> Iterator[Dict]:
+        """
+        Collect the spans of one request (in this thread/context).
+        """
+        trace= {
+            "request_id": request_id,
+            "timestamp": time.time(),
+            **attrs,
+            "spans": [],
+            "_started": time.perf_counter()
+        }
+        token= _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace["ms"]= round((time.perf_counter()- trace.pop("_started"))* 1000, 3)
+            if self.trace_dir:
+                self._write_trace(trace= trace)
+
+    def _write_trace(self, trace: Dict):
+        path= self.trace_dir / f"traces-{time.strftime('%Y-%m-%d')}.jsonl"
+        line= json.dumps(trace, ensure_ascii= False, default= str)
+        try:
+            with self._lock, open(path, "a", encoding= "utf-8") as f:
+                f.write(line+ "\n")
+        except OSError as e:
+            print(f"[Telemetry] Could not write trace: {e}")
+
+    # ---- export ------------------------------------------------------------
+    @staticmethod
+    def _labels(labels: Tuple, extra: Tuple= ()) -> str:
+        pairs= list(labels)+ list(extra)
+        if not pairs:
+            return ""
+        escaped= (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{"+ ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped))+ "}"
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters= sorted(self._counters.items())
+            histograms= sorted(
+                (key, (h.buckets, list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+
+        lines: List[str]= []
+        typed= set()
+        for (name, labels), value in counters:
+            metric= f"{self.namespace}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._labels(labels= labels)} {value}")
+
+        for (name, labels), (buckets, counts, total, n) in histograms:
+            metric= f"{self.namespace}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+
+            cumulative= 0
+            for bound, c in zip(list(buckets)+ ["+Inf"], counts):
+                cumulative+= c
+                lines.append(f"{metric}_bucket{self._labels(labels= labels, extra= (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{self._labels(labels= labels)} {total}")
+            lines.append(f"{metric}_count{self._labels(labels= labels)} {n}")
+
+        return "\n".join(lines)+ "\n"
+
+    def serve(self, port: int, host= "127.0.0.1"):
+        """
+        Serve `render()` on http://host:port/metrics from a daemon thread.
+        """
+        if self._server is not None:
+            return
+
+        telemetry= self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0]!= "/metrics":
+                    self.send_error(404)
+                    return
+
+                body= telemetry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass # Scrapes every few seconds would flood the console
+
+        self._server= ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target= self._server.serve_forever, name= "metrics-server", daemon= True).start()
+        print(f"[Telemetry] Serving metrics on http://{host}:{port}/metrics")
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server= None
+
+telemetry= Telemetry()
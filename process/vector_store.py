@@ -0,0 +1,414 @@
+import os, json, time, hashlib, sqlite3, threading, configparser
+import numpy as np
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from process.mmap_matrix import MmapMatrix
+
+def make_int_id(s: str) -> int:
+    return int(hashlib.md5(s.encode()).hexdigest()[:16], 16)
+
+@dataclass
+class SearchHit:
+    """
+    Same shape as qdrant_client's ScoredPoint for the fields we use.
+    """
+    id: int
+    score: float
+    payload: Dict= field(default_factory= dict)
+    vector: Optional[List[float]]= None
+
+class VectorStore(ABC):
+    """
+    Interface shared by every vector store backend.
+    """
+    collection: str
+
+    @abstractmethod
+    def add_documents(self, embeddings: np.ndarray, docs: List[Dict], wait= True) -> Dict:
+        """
+        docs = [ {id: "...", text: "...", meta: {...}} ]
+        """
+
+    @abstractmethod
+    def search(self, query_vec, top_k= 5, with_vectors= False) -> List:
+        """
+        Top-k hits with `.id`, `.score` and `.payload` (and `.vector` with
+        `with_vectors`), best first.
+        """
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """
+        Delete points by document id (the same ids given to add_documents).
+        """
+
+    @abstractmethod
+    def delete_where(self, field: str, value):
+        """
+        Delete every point whose payload `field` equals `value`.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+class NumpyVectorStore(VectorStore):
+    """
+    Embedded, in-process vector store for offline and single-node deployments.
+
+    Vectors live in a memory-mapped float32/int8 matrix, payloads in a SQLite
+    sidecar. Search is an exact top-k (block-wise matrix-vector products and
+    `argpartition`), or an IVF index (k-means coarse quantizer probed with
+    `nprobe` lists) once the collection has `ivf_min_points` points.
+    """
+    def __init__(self, collection= "rag_collection", dim= 1024, dtype= "float32",
+                 index= "exact", ivf_min_points= 50_000, nprobe= 8, storage_dir= None):
+        BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+        self.collection= collection
+        self.dim= dim
+        self.dtype= dtype
+        self.index= index
+        self.ivf_min_points= ivf_min_points
+        self.nprobe= nprobe
+
+        root= Path(storage_dir) if storage_dir else BASE_DIR / "../data/vector_storage"
+        self.path= root / collection
+        os.makedirs(self.path, exist_ok= True)
+
+        self._lock= threading.RLock()
+        self.db= sqlite3.connect(self.path / "payloads.sqlite", timeout= 30, check_same_thread= False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS points (row INTEGER PRIMARY KEY, id TEXT UNIQUE, payload TEXT)")
+        self.db.commit()
+
+        self.vectors= MmapMatrix(path= self.path / f"vectors_{dtype}.dat", dim= dim, dtype= dtype)
+        self.meta_path= self.path / "meta.json"
+
+        # IVF index: centroids, the rows of each list, and the list of each row (-1: none)
+        self.centroids= None
+        self.lists= None
+        self.list_of= np.empty(0, dtype= np.int64)
+        self.row_of= {}
+        self._load()
+
+    # ---- state -------------------------------------------------------------
+    def _load(self):
+        """
+        (Re)build the in-memory row bookkeeping from disk. A trained IVF index
+        is kept: only rows that changed since the last load are re-assigned.
+        """
+        previous= self.row_of
+        rows= self.db.execute("SELECT row, id FROM points").fetchall()
+
+        self.n_rows= max([r for r, _ in rows], default= -1)+ 1
+        self.row_of= {int(pid): r for r, pid in rows} # ids are unsigned 64-bit, stored as TEXT
+        self.live= np.zeros(max(self.n_rows, 1), dtype= bool)
+        self.live[[r for r, _ in rows]]= True
+        self.free_rows= [r for r in range(self.n_rows) if not self.live[r]]
+
+        self.vectors.ensure_rows(rows= self.n_rows)
+        self.vectors.reopen()
+        self._norms= self._row_norms(self.vectors.array[:self.n_rows])
+
+        if self.lists is not None:
+            changed= np.asarray([r for pid, r in self.row_of.items() if previous.get(pid)!= r], dtype= np.int64)
+            removed= np.asarray([r for pid, r in previous.items() if self.row_of.get(pid)!= r], dtype= np.int64)
+            self._unassign(rows= np.union1d(changed, removed))
+            if len(changed):
+                self._assign(rows= changed)
+
+        self._data_version= self._db_version()
+
+    def _db_version(self) -> int:
+        # Changes whenever another connection commits to the payload database
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self):
+        """
+        Pick up points written by another process (e.g. the batch orchestrator).
+        """
+        if self._db_version()!= self._data_version:
+            self._load()
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Row allocation and writes under the database write lock (BEGIN
+        IMMEDIATE), on bookkeeping reloaded inside it, so another process
+        writing the same collection can never be handed the same rows.
+        """
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                yield self.db
+            except BaseException:
+                self.db.rollback()
+                self._load() # The in-memory bookkeeping may be half updated
+                raise
+            self.db.commit()
+            self._touch_meta()
+
+    def _touch_meta(self):
+        with open(self.meta_path, "w", encoding= "utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "n_rows": self.n_rows, "updated": time.time()}, f)
+
+    def _row_norms(self, stored: np.ndarray) -> np.ndarray:
+        if self.dtype== "int8":
+            return np.linalg.norm(stored.astype(np.float32), axis= 1)
+        return np.ones(len(stored), dtype= np.float32)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dtype== "int8":
+            return np.clip(np.rint(vectors* 127.0), -127, 127).astype(np.int8)
+        return vectors.astype(np.float32, copy= False)
+
+    # ---- writes ------------------------------------------------------------
+    def add_documents(self, embeddings: np.ndarray, docs: List[Dict], wait= True) -> Dict:
+        started= time.perf_counter()
+        vectors= np.asarray(embeddings, dtype= np.float32)
+        vectors= vectors/ np.maximum(np.linalg.norm(vectors, axis= 1, keepdims= True), 1e-12)
+
+        with self._write():
+            rows= []
+            for doc in docs:
+                pid= make_int_id(s= doc["id"])
+                row= self.row_of.get(pid)
+                if row is None:
+                    if self.free_rows:
+                        row= self.free_rows.pop()
+                    else:
+                        row= self.n_rows
+                        self.n_rows+= 1
+                    self.row_of[pid]= row
+                rows.append(row)
+
+            self.vectors.ensure_rows(rows= self.n_rows)
+            rows_arr= np.asarray(rows)
+            self.vectors.array[rows_arr]= self._encode(vectors= vectors)
+            self.vectors.flush()
+
+            if len(self.live)< self.n_rows:
+                self.live= np.concatenate([self.live, np.zeros(self.n_rows- len(self.live), dtype= bool)])
+            if len(self._norms)< self.n_rows:
+                self._norms= np.concatenate([self._norms, np.ones(self.n_rows- len(self._norms), dtype= np.float32)])
+            self.live[rows_arr]= True
+            self._norms[rows_arr]= self._row_norms(self.vectors.array[rows_arr])
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO points (row, id, payload) VALUES (?, ?, ?)",
+                [
+                    (row, str(make_int_id(s= doc["id"])), json.dumps({**doc["meta"], "text": doc["text"]}, ensure_ascii= False))
+                    for row, doc in zip(rows, docs)
+                ]
+            )
+
+            if self.lists is not None:
+                self._assign(rows= rows_arr)
+
+        seconds= time.perf_counter()- started
+        return {
+            "points": len(docs),
+            "seconds": seconds,
+            "points_per_sec": len(docs)/ seconds if seconds> 0 else 0.0
+        }
+
+    def _delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+
+        self.live[rows]= False
+        self.free_rows.extend(rows)
+        if self.lists is not None:
+            self._unassign(rows= np.asarray(rows, dtype= np.int64))
+        self.db.executemany("DELETE FROM points WHERE row = ?", [(r,) for r in rows])
+
+    def delete(self, ids: List[str]):
+        with self._write():
+            rows= []
+            for doc_id in ids:
+                pid= make_int_id(s= doc_id)
+                row= self.row_of.pop(pid, None)
+                if row is not None:
+                    rows.append(row)
+
+            self._delete_rows(rows= rows)
+
+    def delete_where(self, field: str, value):
+        with self._write():
+            matches= self.db.execute(
+                "SELECT row, id FROM points WHERE json_extract(payload, ?) = ?",
+                (f"$.{field}", value)
+            ).fetchall()
+
+            for _, pid in matches:
+                self.row_of.pop(int(pid), None)
+
+            self._delete_rows(rows= [r for r, _ in matches])
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.row_of)
+
+    # ---- approximate index -------------------------------------------------
+    def build_index(self, n_lists= None, iterations= 10, sample_size= 100_000, seed= 0):
+        """
+        Train an IVF coarse quantizer (spherical k-means) over the live vectors.
+        """
+        with self._lock:
+            live_rows= np.flatnonzero(self.live[:self.n_rows])
+            if len(live_rows)== 0:
+                return
+
+            n_lists= n_lists or max(1, int(np.sqrt(len(live_rows))))
+            rng= np.random.default_rng(seed)
+            sample= rng.choice(live_rows, size= min(sample_size, len(live_rows)), replace= False)
+            data= self._decode(rows= np.sort(sample))
+
+            centroids= data[rng.choice(len(data), size= min(n_lists, len(data)), replace= False)]
+            for _ in range(iterations):
+                assign= np.argmax(data@ centroids.T, axis= 1)
+                for c in range(len(centroids)):
+                    members= data[assign== c]
+                    if len(members):
+                        mean= members.sum(axis= 0)
+                        centroids[c]= mean/ max(np.linalg.norm(mean), 1e-12)
+
+            self.centroids= centroids.astype(np.float32)
+            self.lists= [np.empty(0, dtype= np.int64) for _ in range(len(self.centroids))]
+            self.list_of= np.full(self.n_rows, -1, dtype= np.int64)
+            self._assign(rows= live_rows)
+
+    def _unassign(self, rows: np.ndarray):
+        """
+        Take `rows` out of their IVF lists (deleted, or about to be re-assigned).
+        """
+        rows= rows[rows< len(self.list_of)]
+        current= self.list_of[rows]
+        for c in np.unique(current[current>= 0]):
+            self.lists[c]= np.setdiff1d(self.lists[c], rows[current== c], assume_unique= True)
+        self.list_of[rows]= -1
+
+    def _assign(self, rows: np.ndarray):
+        # A reused or overwritten row must leave its old list first
+        self._unassign(rows= rows)
+        if len(self.list_of)< self.n_rows:
+            self.list_of= np.concatenate([self.list_of, np.full(self.n_rows- len(self.list_of), -1, dtype= np.int64)])
+
+        assign= np.argmax(self._decode(rows= rows)@ self.centroids.T, axis= 1)
+        for c in np.unique(assign):
+            self.lists[c]= np.union1d(self.lists[c], rows[assign== c])
+        self.list_of[rows]= assign
+
+    # ---- reads -------------------------------------------------------------
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        stored= self.vectors.array[rows]
+        if self.dtype== "int8":
+            return stored.astype(np.float32)/ np.maximum(self._norms[rows, None], 1e-12)
+        return np.asarray(stored, dtype= np.float32)
+
+    def _scores(self, rows: np.ndarray, query: np.ndarray, block= 65_536) -> np.ndarray:
+        """
+        Cosine scores of `rows` against `query`, computed block by block so the
+        int8 -> float32 conversion never materializes the whole matrix.
+        """
+        out= np.empty(len(rows), dtype= np.float32)
+        for i in range(0, len(rows), block):
+            out[i:i+ block]= self._decode(rows= rows[i:i+ block])@ query
+        return out
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        use_ivf= self.index== "ivf" and len(self.row_of)>= self.ivf_min_points
+        if use_ivf and self.lists is None:
+            self.build_index()
+
+        if not use_ivf or self.lists is None:
+            return np.flatnonzero(self.live[:self.n_rows])
+
+        probe= np.argsort(-(self.centroids@ query))[:self.nprobe]
+        rows= np.unique(np.concatenate([self.lists[c] for c in probe]))
+        return rows[self.live[rows]]
+
+    def search(self, query_vec, top_k= 5, with_vectors= False) -> List[SearchHit]:
+        query= np.asarray(query_vec, dtype= np.float32)
+        query= query/ max(np.linalg.norm(query), 1e-12)
+
+        with self._lock:
+            self._refresh()
+
+            rows= self._candidates(query= query)
+            if len(rows)== 0:
+                return []
+
+            scores= self._scores(rows= rows, query= query)
+            k= min(top_k, len(rows))
+            top= np.argpartition(-scores, k- 1)[:k]
+            top= top[np.argsort(-scores[top])]
+            top_rows= rows[top]
+
+            placeholders= ",".join("?"* len(top_rows))
+            found= dict(
+                (row, (pid, payload)) for row, pid, payload in self.db.execute(
+                    f"SELECT row, id, payload FROM points WHERE row IN ({placeholders})",
+                    [int(r) for r in top_rows]
+                )
+            )
+
+            hits= []
+            for row, score in zip(top_rows, scores[top]):
+                pid, payload= found[int(row)]
+                hits.append(SearchHit(
+                    id= int(pid),
+                    score= float(score),
+                    payload= json.loads(payload),
+                    vector= self._decode(rows= np.asarray([row]))[0].tolist() if with_vectors else None
+                ))
+
+            return hits
+
+_stores: Dict= {}
+_stores_lock= threading.Lock()
+
+def get_vector_store(collection= "rag_collection") -> VectorStore:
+    """
+    Build the backend selected by [VECTOR_STORE] BACKEND in creds.env
+    ("qdrant" by default, or "numpy"). One shared instance per collection, so
+    the orchestrator and the RAG pipeline see the same in-process store.
+    """
+    BASE_DIR= Path(__file__).resolve().parent # Get the current folder
+    config= configparser.ConfigParser()
+    config.read(BASE_DIR / "../.config/creds.env")
+
+    backend= config.get("VECTOR_STORE", "BACKEND", fallback= "qdrant")
+
+    with _stores_lock:
+        key= (backend, collection)
+        if key in _stores:
+            return _stores[key]
+
+        if backend== "qdrant":
+            from process.QD_client import QDrantDB
+            store= QDrantDB(collection= collection)
+        elif backend== "numpy":
+            store= NumpyVectorStore(
+                collection= collection,
+                dim= config.getint("EMBEDDING", "DIM", fallback= 1024),
+                dtype= config.get("VECTOR_STORE", "DTYPE", fallback= "float32"),
+                index= config.get("VECTOR_STORE", "INDEX", fallback= "exact"),
+                ivf_min_points= config.getint("VECTOR_STORE", "IVF_MIN_POINTS", fallback= 50_000),
+                nprobe= config.getint("VECTOR_STORE", "NPROBE", fallback= 8)
+            )
+        else:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+
+        _stores[key]= store
+        return store